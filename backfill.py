@@ -0,0 +1,62 @@
+"""Load years of daily stock history for many tickers at once, instead of one day per daily run.
+
+Tickers default to the latest holdings of every sector in config/spdr_sectors.txt, read from sector_holdings, so main.py
+must have run once. Stock history is written in the STOCK_HISTORY_LAYOUT used by main.py. An interrupted backfill resumes
+with the chunks it had not loaded when it is run again with the same dates.
+
+    python backfill.py --start-date 2015-01-01 [--end-date 2025-06-30] [--tickers aapl brk.b] [--max-workers 8]
+"""
+
+import argparse
+import datetime
+from typing import List
+
+from stock_data_pipeline import (
+    PostgreSQLConnection,
+    SectorHoldingsTable,
+    StockHistoryBackfill,
+    StockHistoryLayout,
+    Ticker,
+    get_database_parameters,
+    get_engine_parameters,
+    get_environment_variable,
+    get_todays_date,
+    make_ticker_sql_compatible,
+    metrics,
+)
+from stock_data_pipeline.daily_pipeline import sectors_file_path
+from stock_data_pipeline.definitions import BACKFILL_CHUNK_MONTHS, BACKFILL_MAX_WORKERS
+
+
+def get_sector_tickers(postgresql_connection: PostgreSQLConnection) -> List[str]:
+    sector_holdings_table = SectorHoldingsTable(postgresql_connection)
+    with open(sectors_file_path, "r", encoding="utf-8") as file:
+        sector_symbols = [make_ticker_sql_compatible(sector_ticker.rstrip("\n")) for sector_ticker in file]
+    return sorted({ticker for sector_symbol in sector_symbols for ticker in sector_holdings_table.get_tickers(sector_symbol)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start-date", type=datetime.date.fromisoformat, required=True)
+    parser.add_argument("--end-date", type=datetime.date.fromisoformat, help="Included. Defaults to the latest NYSE session before today.")
+    parser.add_argument("--tickers", nargs="+", help="Defaults to the latest holdings of all sectors.")
+    parser.add_argument("--max-workers", type=int, default=BACKFILL_MAX_WORKERS)
+    parser.add_argument("--chunk-months", type=int, default=BACKFILL_CHUNK_MONTHS)
+    args = parser.parse_args()
+    end_date = args.end_date or get_todays_date().date()
+
+    database_parameters = get_database_parameters()
+    postgresql_connection = PostgreSQLConnection(database_parameters, get_engine_parameters(database_parameters))
+    postgresql_connection.create_watermarks_table()
+    stock_history_layout = StockHistoryLayout(get_environment_variable("STOCK_HISTORY_LAYOUT", alternative_name="per_ticker"))
+    ticker_symbols = args.tickers or get_sector_tickers(postgresql_connection)
+    if not ticker_symbols:
+        raise NameError("No tickers to backfill. Pass --tickers, or run main.py first to load sector holdings.")
+    tickers = [Ticker(ticker_symbol, postgresql_connection, stock_history_layout=stock_history_layout) for ticker_symbol in ticker_symbols]
+    backfill = StockHistoryBackfill(postgresql_connection, max_workers=args.max_workers, chunk_months=args.chunk_months)
+    backfill.run(tickers, args.start_date, end_date + datetime.timedelta(days=1))
+    print(f"yfinance downloads: {metrics.get_report()['latencies'].get('yfinance.download')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Compare DataFrame.to_sql with PostgreSQLConnection.bulk_load (COPY) on synthetic pipeline-shaped tables.
+Uses the same POSTGRESQL_* environment variables as main.py. Tables are written to and dropped from that database.
+
+    python benchmarks/bulk_load.py [--repeats 3]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd  # type: ignore
+import sqlalchemy
+
+from stock_data_pipeline import (
+    PostgreSQLConnection,
+    SQLOperation,
+    get_database_parameters,
+    get_engine_parameters,
+)
+
+
+def make_sector_history(rows: int = 180, columns: int = 70) -> tuple[pd.DataFrame, dict]:
+    dates = pd.bdate_range(end="2025-06-30", periods=rows)
+    data_frame = pd.DataFrame(
+        np.random.default_rng(0).uniform(10, 500, size=(rows, columns)).round(2),
+        index=pd.Index(dates.strftime("%Y-%m-%d"), name="date"),
+        columns=[f"ticker{column}_price" for column in range(columns)],
+    )
+    data_types = {"date": sqlalchemy.DATE}
+    data_types.update({column: sqlalchemy.types.Numeric(10, 2) for column in data_frame.columns})
+    return data_frame, data_types
+
+
+def make_stock_history(years: int = 10) -> tuple[pd.DataFrame, dict]:
+    dates = pd.bdate_range(end="2025-06-30", periods=252 * years)
+    random = np.random.default_rng(1)
+    data_frame = pd.DataFrame(
+        {
+            "open": random.uniform(10, 500, len(dates)),
+            "high": random.uniform(10, 500, len(dates)),
+            "low": random.uniform(10, 500, len(dates)),
+            "close": random.uniform(10, 500, len(dates)),
+            "volume": random.integers(10**5, 10**8, len(dates)),
+        },
+        index=pd.DatetimeIndex(dates, name="date"),
+    )
+    data_types = {
+        "date": sqlalchemy.DATE,
+        "open": sqlalchemy.types.Numeric(10, 2),
+        "high": sqlalchemy.types.Numeric(10, 2),
+        "low": sqlalchemy.types.Numeric(10, 2),
+        "close": sqlalchemy.types.Numeric(10, 2),
+        "volume": sqlalchemy.types.BigInteger,
+    }
+    return data_frame, data_types
+
+
+def time_write(write, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        write()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    database_parameters = get_database_parameters()
+    postgresql_connection = PostgreSQLConnection(database_parameters, get_engine_parameters(database_parameters))
+    cases = {
+        "sector history 180 x 70": make_sector_history(),
+        "stock history 10 years": make_stock_history(years=10),
+        "stock history 10 years x 50 tickers": (
+            pd.concat([make_stock_history(years=10)[0]] * 50),
+            make_stock_history(years=1)[1],
+        ),
+    }
+    table_name = "bulk_load_benchmark"
+    print(f"{'case':<40}{'to_sql (s)':>12}{'bulk_load (s)':>15}{'speedup':>10}")
+    for case_name, (data_frame, data_types) in cases.items():
+        to_sql_time = time_write(
+            lambda: data_frame.to_sql(
+                table_name,
+                con=postgresql_connection.engine,
+                if_exists="replace",
+                index=True,
+                index_label="date",
+                dtype=data_types,
+            ),
+            args.repeats,
+        )
+        bulk_load_time = time_write(
+            lambda: postgresql_connection.bulk_load(data_frame, table_name, data_types=data_types, if_exists="replace"),
+            args.repeats,
+        )
+        print(f"{case_name:<40}{to_sql_time:>12.3f}{bulk_load_time:>15.3f}{to_sql_time / bulk_load_time:>9.1f}x")
+    postgresql_connection.execute_query(f"DROP TABLE IF EXISTS {table_name}", operation=SQLOperation.COMMIT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Run the daily pipeline stages of main.py against local stand-ins, and report the seconds and peak memory of every stage.
+
+S3 is an in-memory FakeS3Client seeded with synthetic exports of earlier runs, yfinance returns SyntheticMarket frames, and
+SSGA pages and holdings workbooks are served from localhost. Each configuration runs in an empty temporary working
+directory, so all caches are cold, and in an empty database:
+
+    --postgres scratch     create {POSTGRESQL_DB}_benchmark next to the database of the POSTGRESQL_* environment variables
+                           used by main.py, and drop it afterwards.
+    --postgres temporary   initdb a throwaway cluster on a Unix socket with initdb and pg_ctl from --postgres-bin, e.g.
+                           /usr/lib/postgresql/14/bin. Needs no running server, but cannot run as root.
+
+Every combination of --sectors, --tickers-per-sector and --years is run, to show how the stages scale:
+
+    python benchmarks/pipeline.py [--sectors 11 22 44] [--tickers-per-sector 70] [--years 1 5] [--postgres scratch]
+
+Charts are built and hashed but not rendered unless --render-charts, which needs Chrome for kaleido. Peak memory is the
+most memory allocated by Python and NumPy above the stage's start, measured with tracemalloc, which slows stages down;
+--no-trace-memory gives undisturbed timings. Memory of the holdings parser's worker processes is not included.
+"""
+
+import argparse
+from contextlib import ExitStack, contextmanager
+import datetime
+from itertools import product
+import json
+import os
+from pathlib import Path
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from typing import Any, Dict, Iterator
+from unittest.mock import patch
+
+REPOSITORY_DIRECTORY = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPOSITORY_DIRECTORY))  # Import stock_data_pipeline from the repository.
+
+import psycopg2  # type: ignore  # noqa: E402
+
+from stand_ins import FakeS3Client, SSGAServer, SyntheticMarket  # noqa: E402
+from stock_data_pipeline import daily_pipeline  # noqa: E402
+from stock_data_pipeline import (  # noqa: E402
+    ChartRenderer,
+    CollectDailyData,
+    PipelineRunner,
+    PostgreSQLConnection,
+    S3Connection,
+    S3ObjectCache,
+    Sector,
+    StockHistoryLayout,
+    STOCK_WEIGHT_DIRECTORY,
+    get_database_parameters,
+    get_engine_parameters,
+    get_todays_date,
+    metrics,
+)
+from stock_data_pipeline.load_yfinance_data import YFinance  # noqa: E402
+
+BUCKET_NAME = "stock-data-pipeline-benchmark"
+MEBIBYTE = 1024**2
+
+
+@contextmanager
+def scratch_database() -> Iterator[tuple[Dict[str, str | int], str]]:
+    """Create an empty database next to the configured one. Yield its parameters and engine parameters, then drop it."""
+    database_parameters = get_database_parameters()
+    scratch_parameters = dict(database_parameters, dbname=f"{database_parameters['dbname']}_benchmark")
+    connection = psycopg2.connect(**database_parameters)
+    connection.autocommit = True  # CREATE DATABASE cannot run in a transaction.
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {scratch_parameters['dbname']} WITH (FORCE)")
+            cursor.execute(f"CREATE DATABASE {scratch_parameters['dbname']}")
+        yield scratch_parameters, get_engine_parameters(scratch_parameters)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {scratch_parameters['dbname']} WITH (FORCE)")
+        connection.close()
+
+
+@contextmanager
+def temporary_cluster(bin_directory: Path) -> Iterator[tuple[Dict[str, str | int], str]]:
+    """Create and start a PostgreSQL cluster that only listens on a Unix socket in a temporary directory, and remove it afterwards."""
+    with tempfile.TemporaryDirectory(prefix="pg") as cluster_directory:  # Short path, Unix socket paths are limited to 107 bytes.
+        data_directory = Path(cluster_directory, "data")
+        subprocess.run(
+            [Path(bin_directory, "initdb"), "-D", data_directory, "-U", "postgres", "--auth=trust", "--no-sync"],
+            check=True,
+            capture_output=True,
+        )
+        pg_ctl = [Path(bin_directory, "pg_ctl"), "-D", data_directory, "-w"]
+        server_options = f"-c listen_addresses='' -k {cluster_directory} -c fsync=off"
+        subprocess.run(pg_ctl + ["-o", server_options, "-l", Path(cluster_directory, "server.log"), "start"], check=True, capture_output=True)
+        try:
+            database_parameters: Dict[str, str | int] = {
+                "host": cluster_directory,
+                "port": "5432",
+                "dbname": "postgres",
+                "user": "postgres",
+                "password": "",
+            }
+            yield database_parameters, "postgresql+psycopg2://"  # Connections come from psycopg2.connect(**database_parameters).
+        finally:
+            subprocess.run(pg_ctl + ["-m", "fast", "stop"], check=True, capture_output=True)
+
+
+class StageProfiler:
+    """Wrap the functions of a PipelineRunner's stages to record the peak memory traced while each stage runs."""
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.peak_bytes: Dict[str, int] = {}
+
+    def wrap(self, runner: PipelineRunner) -> None:
+        for stage in runner.stages.values():
+            stage.function = self._profile(stage.name, stage.function)
+
+    def _profile(self, stage_name, function):
+        def profiled_function(results: Dict[str, Any]) -> Any:
+            if not self.trace_memory:
+                return function(results)
+            start_bytes, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            try:
+                return function(results)
+            finally:
+                _, peak_bytes = tracemalloc.get_traced_memory()
+                self.peak_bytes[stage_name] = peak_bytes - start_bytes
+
+        return profiled_function
+
+
+async def skip_render(chart_renderer: ChartRenderer, charts) -> list[float]:
+    return [0.0] * len(charts)
+
+
+def create_s3_connection(fake_s3_client: FakeS3Client) -> S3Connection:
+    s3_connection = S3Connection(
+        stock_weight_directory=STOCK_WEIGHT_DIRECTORY,
+        data_directory=daily_pipeline.DATA_DIRECTORY,
+        AWS_ACCESS_KEY="benchmark",
+        AWS_SECRET_ACCESS_KEY="benchmark",
+        STOCK_DATA_PIPELINE_BUCKET_NAME=BUCKET_NAME,
+        STOCK_DATA_PIPELINE_BUCKET_REGION_NAME="us-east-1",
+        AWS_USERNAME="benchmark",
+        cache=S3ObjectCache(),
+        write_local_copy=True,
+    )
+    s3_connection.s3_connection = fake_s3_client
+    return s3_connection
+
+
+def run_benchmark(
+    sector_count: int, tickers_per_sector: int, years: int, todays_date: datetime.datetime, args: argparse.Namespace
+) -> Dict[str, Any]:
+    market = SyntheticMarket(sector_count, tickers_per_sector, years, todays_date, new_tickers_per_sector=args.new_tickers)
+    fake_s3_client = FakeS3Client()
+    for s3_file_name, body in market.create_s3_exports().items():
+        fake_s3_client.put_object(BUCKET_NAME, s3_file_name, body)
+    responses = {}
+    for sector_symbol in market.get_sector_symbols():
+        responses[f"/shares/{sector_symbol}"] = market.create_shares_outstanding_page(sector_symbol).encode()
+        responses[f"/holdings/{sector_symbol}.xlsx"] = market.create_holdings_workbook(sector_symbol)
+    if args.postgres == "scratch":
+        database = scratch_database()
+    else:
+        database = temporary_cluster(args.postgres_bin)
+
+    metrics.reset()
+    stage_profiler = StageProfiler(args.trace_memory)
+    working_directory = os.getcwd()
+    with ExitStack() as stack:
+        database_parameters, engine_parameters = stack.enter_context(database)
+        ssga_server = stack.enter_context(SSGAServer(responses))
+        os.chdir(stack.enter_context(tempfile.TemporaryDirectory(prefix="stock_data_pipeline_benchmark_")))
+        stack.callback(os.chdir, working_directory)  # Runs before the temporary directory is removed.
+
+        initialize_sector = Sector.__init__
+
+        def initialize_sector_with_local_urls(sector: Sector, *sector_args, **sector_kwargs) -> None:
+            initialize_sector(sector, *sector_args, **sector_kwargs)
+            sector.url_shares_outstanding = f"{ssga_server.url}/shares/{sector.sector_symbol}"
+            sector.url_xlsx = f"{ssga_server.url}/holdings/{sector.sector_symbol}.xlsx"
+
+        stack.enter_context(patch.object(Sector, "__init__", initialize_sector_with_local_urls))
+        stack.enter_context(patch.object(YFinance, "get_stock_data_single", market.get_stock_data_single))
+        stack.enter_context(patch.object(YFinance, "get_stock_data_batch", market.get_stock_data_batch))
+        if not args.render_charts:
+            stack.enter_context(patch.object(ChartRenderer, "_render_charts", skip_render))
+
+        daily_pipeline.sectors_file_path.parent.mkdir(parents=True)
+        daily_pipeline.sectors_file_path.write_text("".join(f"{sector_symbol.upper()}\n" for sector_symbol in market.get_sector_symbols()))
+        daily_pipeline.DATA_DIRECTORY.mkdir()
+        postgresql_connection = stack.enter_context(PostgreSQLConnection(database_parameters, engine_parameters))
+        runner = PipelineRunner("benchmark", max_workers=args.max_workers)
+        daily_pipeline.add_stages(
+            runner,
+            todays_date,
+            postgresql_connection,
+            create_s3_connection(fake_s3_client),
+            StockHistoryLayout(args.layout),
+            backfill_new_ticker_history=args.new_tickers > 0,
+        )
+
+        def collect_daily_data(results: Dict[str, Any]) -> int:
+            """Download the full history of every ticker one by one, like a first run without stock history tables."""
+            rows = 0
+            for ticker in market.get_tickers():
+                stock_history = CollectDailyData(ticker, todays_date=market.sessions[0]).get_ticker_history()
+                rows += 0 if stock_history is None else len(stock_history)
+            return rows
+
+        runner.add_stage("collect_daily_data", collect_daily_data)
+        stage_profiler.wrap(runner)
+        if args.trace_memory:
+            tracemalloc.start()
+        try:
+            runner.run()
+        finally:
+            tracemalloc.stop()
+    report = metrics.get_report()
+    return {
+        "sectors": sector_count,
+        "tickers_per_sector": tickers_per_sector,
+        "years": years,
+        "stages": {
+            stage_name: {"seconds": seconds, "peak_mib": round(stage_profiler.peak_bytes[stage_name] / MEBIBYTE, 1) if args.trace_memory else None}
+            for stage_name, seconds in report["stages"].items()
+        },
+        "s3": fake_s3_client.get_statistics(),
+        "metrics": report,
+    }
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    print(f"\n{result['sectors']} sectors x {result['tickers_per_sector']} tickers x {result['years']} years")
+    print(f"{'stage':<30}{'seconds':>10}{'peak MiB':>12}")
+    for stage_name, stage in result["stages"].items():
+        peak_mib = "-" if stage["peak_mib"] is None else f"{stage['peak_mib']:.1f}"
+        print(f"{stage_name:<30}{stage['seconds']:>10.3f}{peak_mib:>12}")
+    print(f"{'total':<30}{sum(stage['seconds'] for stage in result['stages'].values()):>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sectors", type=int, nargs="+", default=[11])
+    parser.add_argument("--tickers-per-sector", type=int, nargs="+", default=[70])
+    parser.add_argument("--years", type=int, nargs="+", default=[1])
+    parser.add_argument("--new-tickers", type=int, default=0, help="Tickers per sector that joined today, which are backfilled.")
+    parser.add_argument("--postgres", choices=["scratch", "temporary"], default="scratch")
+    parser.add_argument("--postgres-bin", type=Path, default=Path(shutil.which("initdb") or "initdb").parent)
+    parser.add_argument("--layout", choices=[layout.value for layout in StockHistoryLayout], default=StockHistoryLayout.PER_TICKER.value)
+    parser.add_argument("--max-workers", type=int, default=1, help="Stage concurrency. Above 1, peak memory of concurrent stages overlaps.")
+    parser.add_argument("--render-charts", action="store_true")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false")
+    parser.add_argument("--output", type=Path, default=Path(REPOSITORY_DIRECTORY, ".cache", "benchmarks", "pipeline.json"))
+    args = parser.parse_args()
+    args.output = args.output.resolve()  # Stages run in a temporary working directory.
+
+    todays_date = get_todays_date()
+    results = []
+    for sector_count, tickers_per_sector, years in product(args.sectors, args.tickers_per_sector, args.years):
+        result = run_benchmark(sector_count, tickers_per_sector, years, todays_date, args)
+        results.append(result)
+    for result in results:
+        print_result(result)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(
+            {"todays_date": todays_date.strftime("%Y-%m-%d"), "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "results": results},
+            file,
+            indent=2,
+            default=str,
+        )
+    print(f"\nResults written to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Local stand-ins for the pipeline's external services, used by benchmarks/pipeline.py.
+
+FakeS3Client keeps objects in memory, SyntheticMarket generates yfinance frames, SSGA pages and workbooks and the S3 exports
+of earlier runs, and SSGAServer serves the pages and workbooks over HTTP on localhost.
+"""
+
+import datetime
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from itertools import product
+from pathlib import Path
+from string import ascii_lowercase
+import threading
+from typing import Dict, List
+import zlib
+
+from botocore.exceptions import ClientError
+import numpy as np
+import pandas as pd  # type: ignore
+
+from stock_data_pipeline import get_trading_calendar
+
+
+def make_symbols(prefix: str, count: int) -> List[str]:
+    """Make count symbols of prefix plus lower-case letters. Digits are not used, read_holdings_workbook drops tickers with a 6."""
+    length = 1
+    while len(ascii_lowercase) ** length < count:
+        length += 1
+    return [prefix + "".join(letters) for letters in product(ascii_lowercase, repeat=length)][:count]
+
+
+class FakeS3Client:
+    """In-memory stand-in for the boto3 S3 client calls S3Connection and S3MultipartWriter make. Thread-safe."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.objects: Dict[str, bytes] = {}
+        self.last_modified: Dict[str, datetime.datetime] = {}
+        self.multipart_uploads: Dict[str, Dict[int, bytes]] = {}
+
+    @staticmethod
+    def _get_etag(body: bytes) -> str:
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def _get_object(self, key: str) -> bytes:
+        with self.lock:
+            if key not in self.objects:
+                raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+            return self.objects[key]
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes) -> Dict[str, str]:
+        with self.lock:
+            self.objects[Key] = bytes(Body)
+            self.last_modified[Key] = datetime.datetime.now(datetime.timezone.utc)
+        return {"ETag": self._get_etag(Body)}
+
+    def upload_file(self, Filename: str | Path, Bucket: str, Key: str) -> None:
+        with open(Filename, "rb") as file:
+            self.put_object(Bucket, Key, file.read())
+
+    def download_file(self, Bucket: str, Key: str, Filename: str | Path) -> None:
+        body = self._get_object(Key)
+        with open(Filename, "wb") as file:
+            file.write(body)
+
+    def head_object(self, Bucket: str, Key: str) -> Dict[str, str | int | datetime.datetime]:
+        body = self._get_object(Key)
+        return {"ETag": self._get_etag(body), "ContentLength": len(body), "LastModified": self.last_modified[Key]}
+
+    def create_multipart_upload(self, Bucket: str, Key: str) -> Dict[str, str]:
+        upload_id = hashlib.md5(f"{Key}{datetime.datetime.now()}".encode()).hexdigest()
+        with self.lock:
+            self.multipart_uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes) -> Dict[str, str]:
+        with self.lock:
+            self.multipart_uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": self._get_etag(Body)}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: Dict[str, List[Dict]]) -> Dict[str, str]:
+        with self.lock:
+            parts = self.multipart_uploads.pop(UploadId)
+        body = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+        self.put_object(Bucket, Key, body)
+        return {"ETag": f'"{hashlib.md5(body).hexdigest()}-{len(parts)}"'}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str) -> None:
+        with self.lock:
+            self.multipart_uploads.pop(UploadId, None)
+
+    def get_statistics(self) -> Dict[str, int]:
+        with self.lock:
+            return {"objects": len(self.objects), "bytes": sum(len(body) for body in self.objects.values())}
+
+
+class SyntheticMarket:
+    """Sectors of tickers with random-walk prices and constant holdings, from years before todays_date up to todays_date.
+
+    Every ticker's prices come from a generator seeded by its name, so the same ticker has the same history in every run.
+    The last new_tickers_per_sector tickers of every sector are left out of the S3 exports, as if they joined on todays_date.
+    """
+
+    def __init__(self, sector_count: int, tickers_per_sector: int, years: int, todays_date: datetime.datetime, new_tickers_per_sector: int = 0):
+        self.todays_date = pd.Timestamp(todays_date)
+        sector_symbols = make_symbols("x", sector_count)
+        ticker_symbols = make_symbols("t", sector_count * tickers_per_sector)
+        self.sectors: Dict[str, List[str]] = {
+            sector_symbol: ticker_symbols[index * tickers_per_sector : (index + 1) * tickers_per_sector]
+            for index, sector_symbol in enumerate(sector_symbols)
+        }
+        self.previous_sectors = {sector_symbol: tickers[: len(tickers) - new_tickers_per_sector] for sector_symbol, tickers in self.sectors.items()}
+        self.sessions = pd.DatetimeIndex(
+            get_trading_calendar().sessions_between(self.todays_date - pd.DateOffset(years=years), self.todays_date), name="date"
+        )
+        self.close_prices = pd.DataFrame(
+            {ticker: self._make_random_walk(ticker) for ticker in ticker_symbols}, index=self.sessions
+        )  # sessions x tickers.
+        self.shares_held = pd.Series(
+            {ticker: int(self._get_generator(ticker).integers(10**5, 10**7)) for ticker in ticker_symbols}, dtype="int64"
+        )
+        self.shares_outstanding = pd.Series(
+            {sector: int(self.shares_held[tickers].sum() // 10) for sector, tickers in self.sectors.items()}, dtype="int64"
+        )
+
+    @staticmethod
+    def _get_generator(name: str) -> np.random.Generator:
+        return np.random.default_rng(zlib.crc32(name.encode()))
+
+    def _make_random_walk(self, ticker: str) -> np.ndarray:
+        generator = self._get_generator(ticker)
+        returns = generator.normal(0.0003, 0.015, len(self.sessions))
+        return (generator.uniform(10, 500) * np.exp(np.cumsum(returns))).round(2)
+
+    def get_sector_symbols(self) -> List[str]:
+        return list(self.sectors)
+
+    def get_tickers(self) -> List[str]:
+        return list(self.close_prices.columns)
+
+    def _get_ohlcv(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """Daily bars of ticker from start_date up to, not including, end_date, like yfinance. Dates are New York midnights."""
+        close = self.close_prices[ticker]
+        close = close[(close.index >= pd.Timestamp(start_date)) & (close.index < pd.Timestamp(end_date))]
+        spread = self._get_generator(f"{ticker}_spread").uniform(0.001, 0.02, len(close))
+        history = pd.DataFrame(
+            {
+                "Open": (close * (1 - spread / 2)).round(2),
+                "High": (close * (1 + spread)).round(2),
+                "Low": (close * (1 - spread)).round(2),
+                "Close": close,
+                "Volume": (self.shares_held[ticker] // 10 + np.arange(len(close)) % 1000).astype("int64"),
+            }
+        )
+        history.index = pd.DatetimeIndex(close.index.tz_localize("America/New_York"), name="Date")
+        return history
+
+    def get_stock_data_single(self, ticker: str, resolution: str, date_range: List[str], raise_errors: bool = False) -> pd.DataFrame:
+        """Stand-in for YFinance.get_stock_data_single."""
+        history = self._get_ohlcv(ticker, date_range[0], date_range[1])
+        history["Dividends"] = 0.0
+        history["Stock Splits"] = 0.0
+        return history
+
+    def get_stock_data_batch(self, tickers: List[str], resolution: str, date_range: List[str]) -> pd.DataFrame:
+        """Stand-in for YFinance.get_stock_data_batch. Unknown tickers are left out, like tickers yfinance has no data for."""
+        histories = {ticker: self._get_ohlcv(ticker, date_range[0], date_range[1]) for ticker in tickers if ticker in self.close_prices}
+        if not histories:
+            return pd.DataFrame()
+        return pd.concat(histories, axis=1)
+
+    def create_holdings_workbook(self, sector_symbol: str) -> bytes:
+        """SSGA daily holdings workbook of sector_symbol: four rows of fund details, then one row per holding and a cash row."""
+        tickers = self.sectors[sector_symbol]
+        market_values = self.shares_held[tickers] * self.close_prices[tickers].iloc[-1]
+        holdings = pd.DataFrame(
+            {
+                "Name": [f"{ticker.upper()} INC" for ticker in tickers] + ["US DOLLAR"],
+                "Ticker": [ticker.upper() for ticker in tickers] + ["-"],
+                "Identifier": [f"ID{index:07d}" for index in range(len(tickers))] + ["-"],
+                "Weight": list((market_values * 100 / market_values.sum()).round(6)) + [0.01],
+                "Sector": ["Synthetic"] * len(tickers) + ["-"],
+                "Shares Held": list(self.shares_held[tickers]) + [100000],
+                "Local Currency": ["USD"] * (len(tickers) + 1),
+            }
+        )
+        fund_details = pd.DataFrame(
+            [
+                ["Fund Name:", f"The {sector_symbol.upper()} Select Sector SPDR Fund"],
+                ["Ticker Symbol:", sector_symbol.upper()],
+                ["Holdings:", f"As of {self.todays_date.strftime('%d-%b-%Y')}"],
+            ]
+        )
+        buffer = BytesIO()
+        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+            fund_details.to_excel(writer, index=False, header=False)
+            holdings.to_excel(writer, index=False, startrow=4)
+        return buffer.getvalue()
+
+    def create_shares_outstanding_page(self, sector_symbol: str) -> str:
+        """Minimal SSGA fund page with the shares outstanding table cell SectorScraper parses."""
+        shares_outstanding_millions = self.shares_outstanding[sector_symbol] / 10**6
+        return (
+            f"<html><head><title>{sector_symbol.upper()}</title></head><body><table>"
+            f"<tr><td>Shares Outstanding</td><td class=\"data\">{shares_outstanding_millions:,.2f} M</td></tr>"
+            "</table></body></html>"
+        )
+
+    def create_s3_exports(self) -> Dict[str, bytes]:
+        """CSV exports of the sector tables from the runs before todays_date, keyed by S3 object name."""
+        history_dates = self.sessions[self.sessions < self.todays_date]
+        date_strings = history_dates.strftime("%Y-%m-%d")
+        exports = {}
+        shares_outstanding = pd.DataFrame(
+            {sector: self.shares_outstanding[sector] for sector in self.sectors}, index=pd.Index(date_strings, name="date")
+        )
+        exports["sector_shares_outstanding.csv"] = self._to_csv(shares_outstanding)
+        for sector, tickers in self.previous_sectors.items():
+            shares = pd.DataFrame(
+                np.broadcast_to(self.shares_held[tickers].to_numpy(), (len(history_dates), len(tickers))),
+                index=pd.Index(date_strings, name="date"),
+                columns=[f"{ticker}_shares" for ticker in tickers],
+            )
+            prices = self.close_prices.loc[history_dates, tickers]
+            sector_history = pd.DataFrame(prices.to_numpy(), index=shares.index, columns=[f"{ticker}_price" for ticker in tickers])
+            sector_history[f"{sector}_calculated_price"] = (
+                (prices.to_numpy() * shares.to_numpy()).sum(axis=1) / self.shares_outstanding[sector]
+            ).round(2)
+            exports[f"{sector}_shares.csv"] = self._to_csv(shares)
+            exports[f"{sector}_sector_history.csv"] = self._to_csv(sector_history)
+        return exports
+
+    @staticmethod
+    def _to_csv(data_frame: pd.DataFrame) -> bytes:
+        buffer = StringIO()
+        data_frame.to_csv(buffer)
+        return buffer.getvalue().encode()
+
+
+class SSGAServer:
+    """Serve pages and workbooks, keyed by URL path, over HTTP on a free localhost port in a daemon thread.
+
+    Responses carry an ETag of the body, and a request with a matching If-None-Match is answered with 304 Not Modified.
+    """
+
+    def __init__(self, responses: Dict[str, bytes]):
+        self.responses = responses
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                body = self.responses.get(handler.path)
+                if body is None:
+                    handler.send_error(404)
+                    return
+                etag = f'"{hashlib.sha256(body).hexdigest()}"'
+                if handler.headers.get("If-None-Match") == etag:
+                    handler.send_response(304)
+                    handler.send_header("ETag", etag)
+                    handler.end_headers()
+                    return
+                handler.send_response(200)
+                handler.send_header("ETag", etag)
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "SSGAServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.server.shutdown()
+        self.server.server_close()
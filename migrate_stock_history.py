@@ -0,0 +1,29 @@
+"""Copy every {ticker}_stock_history table into the single partitioned stock_history table.
+
+Run once before setting STOCK_HISTORY_LAYOUT=partitioned. Rows already migrated are skipped, so it can be run again.
+
+    python migrate_stock_history.py [--drop]
+"""
+
+import argparse
+
+from stock_data_pipeline import (
+    PostgreSQLConnection,
+    StockHistoryTable,
+    get_database_parameters,
+    get_engine_parameters,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drop", action="store_true", help="Drop the per-ticker tables after copying them.")
+    args = parser.parse_args()
+
+    database_parameters = get_database_parameters()
+    postgresql_connection = PostgreSQLConnection(database_parameters, get_engine_parameters(database_parameters))
+    StockHistoryTable(postgresql_connection).migrate_per_ticker_tables(drop_per_ticker_tables=args.drop)
+
+
+if __name__ == "__main__":
+    main()
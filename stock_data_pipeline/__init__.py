@@ -1,29 +1,80 @@
 # TODO: Add import of CollectDailyData and YFinance
+"""Names are imported from their modules on first access, so e.g. the CLI's light subcommands do not import pandas, plotly,
+boto3 or yfinance.
+"""
 
-from .definitions import (
-    DataTypes,
-    SQLOperation,
-    TickerColumnType,
-    STOCK_WEIGHT_DIRECTORY,
-)
-from .functions import (
-    check_table_append_compatibility,
-    convert_sql_data_type_into_string,
-    create_directory,
-    get_environment_variable,
-    get_market_day,
-    get_s3_table,
-    get_sql_table_latest_date,
-    get_todays_date,
-    initialize_table,
-    make_ticker_sql_compatible,
-    make_ticker_yfinance_compatible,
-    set_table_primary_key,
-)
-from .load_yfinance_data import CollectDailyData
-from .postgresql_connection import PostgreSQLConnection
-from .s3_connection import S3Connection
-from .sector import Sector
-from .sectors import Sectors
-from .ticker import Ticker
-from .tickers import Tickers
+from importlib import import_module
+from typing import Any, Dict, List
+
+
+_exports: Dict[str, List[str]] = {
+    ".definitions": [
+        "DataTypes",
+        "FileFormat",
+        "SQLOperation",
+        "StockHistoryLayout",
+        "TickerColumnType",
+        "BACKFILL_NEW_TICKER_YEARS",
+        "CACHE_DIRECTORY",
+        "RUN_REPORT_DIRECTORY",
+        "STOCK_HISTORY",
+        "STOCK_WEIGHT_DIRECTORY",
+    ],
+    ".backfill": ["StockHistoryBackfill"],
+    ".chart_renderer": ["ChartRenderer"],
+    ".functions": [
+        "check_table_append_compatibility",
+        "convert_sql_data_type_into_string",
+        "create_directory",
+        "get_database_parameters",
+        "get_engine_parameters",
+        "get_environment_variable",
+        "get_market_day",
+        "get_s3_table",
+        "get_sql_table_latest_date",
+        "get_todays_date",
+        "initialize_table",
+        "make_ticker_sql_compatible",
+        "make_ticker_yfinance_compatible",
+        "read_table_file",
+        "set_table_primary_key",
+    ],
+    ".holdings_parser": ["HoldingsParser", "read_holdings_workbook"],
+    ".http_client": ["HttpClient", "HttpResponse"],
+    ".intraday": ["IntradaySectorPrices"],
+    ".instrumentation": ["RunMetrics", "metrics", "profile"],
+    ".load_yfinance_data": ["CollectBatchData", "CollectDailyData"],
+    ".pipeline_runner": ["PipelineRunner", "Stage"],
+    ".pipeline_watermarks": ["PipelineWatermarks"],
+    ".postgresql_connection": ["PostgreSQLConnection"],
+    ".relative_performance": ["calculate_relative_performance", "create_sector_price_frame"],
+    ".s3_cache": ["S3ObjectCache"],
+    ".s3_connection": ["S3Connection"],
+    ".s3_stream": ["S3MultipartWriter"],
+    ".schema_manager": ["SchemaManager"],
+    ".scraper": ["HostRateLimiter", "SectorScraper", "TokenBucket"],
+    ".sector": ["Sector"],
+    ".sector_holdings": ["SectorHoldingsTable"],
+    ".sector_index": ["SectorIndexEngine"],
+    ".sectors": ["Sectors"],
+    ".stock_history": ["StockHistoryTable"],
+    ".ticker": ["Ticker"],
+    ".tickers": ["Tickers"],
+    ".trading_calendar": ["TradingCalendar", "get_trading_calendar"],
+}
+_modules = {name: module_name for module_name, names in _exports.items() for name in names}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _modules.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value  # Later accesses do not call __getattr__.
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import datetime
+from typing import Dict, List, Set, Tuple
+
+
+import pandas as pd  # type: ignore
+from psycopg2.extras import execute_values  # type: ignore
+from yfinance.exceptions import YFPricesMissingError
+
+
+from .definitions import (
+    BACKFILL_CHUNK_MONTHS,
+    BACKFILL_LOAD_ROWS,
+    BACKFILL_MAX_WORKERS,
+    BACKFILL_PROGRESS,
+    SQLOperation,
+    StockHistoryLayout,
+)
+from .instrumentation import metrics
+from .load_yfinance_data import CollectBatchData, YFinance
+from .postgresql_connection import PostgreSQLConnection
+from .stock_history import StockHistoryTable, stock_history_dtypes
+from .ticker import Ticker
+
+
+per_ticker_stock_history_dtypes = {column: data_type for column, data_type in stock_history_dtypes.items() if column != "ticker"}
+
+BackfillTask = Tuple[Ticker, datetime.date, datetime.date]  # Ticker, chunk start, chunk end (not included).
+
+
+class StockHistoryBackfill:
+    """Load daily stock history of many tickers over a date range, e.g. years of history for the whole universe or a new ticker.
+
+    The range is split into (ticker, chunk) tasks of chunk_months calendar months, which are downloaded in a thread pool of
+    max_workers. Downloaded chunks are loaded in batches of about load_rows rows, skipping rows that already exist, and each
+    loaded chunk is recorded in backfill_progress, so an interrupted backfill resumes with the chunks it had not loaded.
+    """
+
+    def __init__(
+        self,
+        postgresql_connection: PostgreSQLConnection,
+        max_workers: int = BACKFILL_MAX_WORKERS,
+        chunk_months: int = BACKFILL_CHUNK_MONTHS,
+        load_rows: int = BACKFILL_LOAD_ROWS,
+        table_name: str = BACKFILL_PROGRESS,
+    ):
+        self.postgresql_connection = postgresql_connection
+        self.max_workers = max_workers
+        self.chunk_months = chunk_months
+        self.load_rows = load_rows
+        self.table_name = table_name
+        self.stock_history_table: StockHistoryTable | None = None
+        self.statistics: Dict[str, int] = {"tasks": 0, "resumed": 0, "loaded": 0, "failed": 0, "rows": 0}
+
+    def create_table(self) -> None:
+        self.postgresql_connection.schema.create_table(
+            self.table_name,
+            {
+                "table_name": "TEXT NOT NULL",
+                "ticker": "TEXT NOT NULL",
+                "chunk_start": "DATE NOT NULL",
+                "chunk_end": "DATE NOT NULL",
+                "row_count": "INT NOT NULL",
+                "completed_at": "TIMESTAMP NOT NULL DEFAULT now()",
+            },
+            primary_key=["table_name", "ticker", "chunk_start", "chunk_end"],
+        )
+        self.postgresql_connection.schema.apply()
+
+    def get_completed_chunks(self) -> Set[Tuple[str, str, datetime.date, datetime.date]]:
+        """Get the (table name, ticker, chunk start, chunk end) of every chunk loaded by this or an earlier backfill."""
+        query = f"SELECT table_name, ticker, chunk_start, chunk_end FROM {self.table_name}"
+        cursor = self.postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE)
+        return set(cursor.fetchall())
+
+    def get_chunks(self, start_date: datetime.date, end_date: datetime.date) -> List[Tuple[datetime.date, datetime.date]]:
+        """Split start_date to end_date, not included, at every chunk_months-th month start, so chunks line up between backfills."""
+        boundaries = [
+            boundary.date()
+            for boundary in pd.date_range(start=start_date, end=end_date, freq="MS")
+            if (boundary.year * 12 + boundary.month - 1) % self.chunk_months == 0 and start_date < boundary.date() < end_date
+        ]
+        chunk_starts = [start_date] + boundaries
+        chunk_ends = boundaries + [end_date]
+        return [(chunk_start, chunk_end) for chunk_start, chunk_end in zip(chunk_starts, chunk_ends) if chunk_start < chunk_end]
+
+    def create_tasks(self, tickers: List[Ticker], start_date: datetime.date, end_date: datetime.date) -> List[BackfillTask]:
+        """Create a task per ticker and chunk of start_date to end_date, not included, that has not been loaded yet."""
+        completed_chunks = self.get_completed_chunks()
+        tasks = []
+        for ticker in tickers:
+            for chunk_start, chunk_end in self.get_chunks(start_date, end_date):
+                if (ticker.table_name, ticker.ticker_symbol, chunk_start, chunk_end) in completed_chunks:
+                    self.statistics["resumed"] += 1
+                else:
+                    tasks.append((ticker, chunk_start, chunk_end))
+        return tasks
+
+    @staticmethod
+    def _download_task(task: BackfillTask) -> pd.DataFrame:
+        """Download one chunk. An empty DataFrame means Yahoo has no rows in the chunk, e.g. before the ticker was listed.
+
+        Any other failed download raises, so the chunk is not recorded as loaded and the next backfill retries it.
+        """
+        ticker, chunk_start, chunk_end = task
+        metrics.record_yfinance_call([ticker.yfinance_ticker])
+        try:
+            with metrics.timer("yfinance.download"):
+                stock_history = YFinance().get_stock_data_single(
+                    ticker.yfinance_ticker, "1d", [chunk_start.strftime("%Y-%m-%d"), chunk_end.strftime("%Y-%m-%d")], raise_errors=True
+                )
+        except YFPricesMissingError as error:
+            if getattr(error, "yahoo_reason", None) is None:  # Only a reason from Yahoo, e.g. "Data doesn't exist for startDate", means no rows.
+                raise
+            return pd.DataFrame()
+        if stock_history.empty:
+            return pd.DataFrame()
+        return CollectBatchData.normalize_ticker_history(stock_history)
+
+    def _load(self, downloaded_tasks: List[Tuple[BackfillTask, pd.DataFrame]]) -> None:
+        """Load downloaded chunks, one write per per-ticker table or one write into stock_history, then record them as loaded."""
+        stock_histories: Dict[Ticker, List[pd.DataFrame]] = {}
+        for (ticker, _, _), stock_history in downloaded_tasks:
+            if not stock_history.empty:
+                stock_histories.setdefault(ticker, []).append(stock_history)
+        partitioned_stock_histories = {}
+        for ticker, ticker_stock_histories in stock_histories.items():
+            stock_history = pd.concat(ticker_stock_histories).sort_index()
+            if ticker.stock_history_layout == StockHistoryLayout.PARTITIONED:
+                partitioned_stock_histories[ticker.ticker_symbol] = stock_history
+            else:
+                # Tables written by to_sql have no primary key, which skip_existing_rows needs. Queued DDL runs in bulk_load's transaction.
+                self.postgresql_connection.schema.set_primary_key(ticker.table_name, ["date"])
+                self.postgresql_connection.bulk_load(
+                    stock_history, ticker.table_name, data_types=per_ticker_stock_history_dtypes, skip_existing_rows=True
+                )
+        if partitioned_stock_histories:
+            if self.stock_history_table is None:
+                self.stock_history_table = StockHistoryTable(self.postgresql_connection)
+                self.stock_history_table.create_table()
+            self.stock_history_table.append(partitioned_stock_histories, skip_existing_rows=True)
+        with self.postgresql_connection.transaction() as cursor:
+            execute_values(
+                cursor,
+                f"INSERT INTO {self.table_name} (table_name, ticker, chunk_start, chunk_end, row_count) VALUES %s "
+                "ON CONFLICT (table_name, ticker, chunk_start, chunk_end) DO UPDATE SET row_count = EXCLUDED.row_count, completed_at = now()",
+                [
+                    (ticker.table_name, ticker.ticker_symbol, chunk_start, chunk_end, len(stock_history))
+                    for (ticker, chunk_start, chunk_end), stock_history in downloaded_tasks
+                ],
+                page_size=len(downloaded_tasks),
+            )
+        self.statistics["loaded"] += len(downloaded_tasks)
+        self.statistics["rows"] += sum(len(stock_history) for _, stock_history in downloaded_tasks)
+
+    def run(self, tickers: List[Ticker], start_date: datetime.date, end_date: datetime.date) -> Dict[str, int]:
+        """Backfill tickers from start_date to end_date, not included. Return counts of tasks, resumed, loaded and failed chunks, and rows.
+
+        Failed downloads are reported and retried by the next backfill of the same range.
+        """
+        self.create_table()
+        self.postgresql_connection.schema.apply()  # Create per-ticker stock history tables queued by Ticker.
+        tasks = self.create_tasks(tickers, start_date, end_date)
+        self.statistics["tasks"] += len(tasks)
+        print(f"Backfill {len(tasks)} chunks of {len(tickers)} tickers from {start_date} to {end_date}, {self.statistics['resumed']} already loaded.")
+        downloaded_tasks: List[Tuple[BackfillTask, pd.DataFrame]] = []
+        downloaded_rows = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._download_task, task): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    stock_history = future.result()
+                except Exception as error:
+                    self.statistics["failed"] += 1
+                    print(f"Backfill of {task[0].yfinance_ticker} from {task[1]} to {task[2]} failed: {error}")
+                    continue
+                downloaded_tasks.append((task, stock_history))
+                downloaded_rows += len(stock_history)
+                if downloaded_rows >= self.load_rows:  # Load while the remaining chunks download.
+                    self._load(downloaded_tasks)
+                    downloaded_tasks, downloaded_rows = [], 0
+        if downloaded_tasks:
+            self._load(downloaded_tasks)
+        print(f"Backfill: {self.statistics}")
+        return dict(self.statistics)
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+import time
+from typing import Dict, List, Tuple
+
+
+import kaleido  # type: ignore
+from plotly.graph_objects import Figure
+
+
+from .definitions import CHART_CACHE_DIRECTORY, CHART_RENDER_WORKERS
+from .instrumentation import metrics
+
+
+class ChartRenderer:
+    """Render queued plotly figures to image files concurrently, in one kaleido (Chrome) process with max_workers tabs.
+
+    A chart is skipped if its output file exists and the SHA-256 of its figure JSON and render options matches the one
+    recorded in manifest.json when the file was last rendered, i.e. its input data and layout have not changed.
+    """
+
+    def __init__(
+        self,
+        cache_directory: Path = CHART_CACHE_DIRECTORY,
+        max_workers: int = CHART_RENDER_WORKERS,
+        image_format: str = "jpeg",
+        scale: float = 5,
+    ):
+        self.manifest_file_path = Path(cache_directory, "manifest.json")
+        self.max_workers = max_workers
+        self.options = {"format": image_format, "scale": scale}
+        self.charts: List[Tuple[Figure, Path]] = []
+        self.render_seconds: Dict[str, float] = {}
+        self.skipped: List[str] = []
+        cache_directory.mkdir(parents=True, exist_ok=True)
+        self.manifest: Dict[str, Dict[str, str | float]] = {}
+        if self.manifest_file_path.exists():
+            with open(self.manifest_file_path, "r", encoding="utf-8") as file:
+                self.manifest = json.load(file)
+
+    def _save_manifest(self) -> None:
+        temporary_file_path = self.manifest_file_path.with_suffix(".tmp")
+        with open(temporary_file_path, "w", encoding="utf-8") as file:
+            json.dump(self.manifest, file, indent=2)
+        temporary_file_path.replace(self.manifest_file_path)
+
+    def _hash_chart(self, figure: Figure) -> str:
+        return hashlib.sha256((figure.to_json() + json.dumps(self.options, sort_keys=True)).encode()).hexdigest()
+
+    def add(self, figure: Figure, file_path: str | Path) -> None:
+        """Queue figure to be written to file_path by render."""
+        self.charts.append((figure, Path(file_path)))
+
+    def render(self) -> Dict[str, float]:
+        """Render the queued charts that changed since they were last rendered. Return render seconds by file path."""
+        charts, self.charts = self.charts, []
+        charts_to_render = []
+        for figure, file_path in charts:
+            sha256 = self._hash_chart(figure)
+            entry = self.manifest.get(str(file_path))
+            if entry is not None and entry["sha256"] == sha256 and file_path.exists():
+                self.skipped.append(str(file_path))
+                metrics.increment("charts.skipped")
+                print(f"Skipped unchanged chart {file_path}.")
+                continue
+            charts_to_render.append((figure, file_path, sha256))
+        if not charts_to_render:
+            return {}
+        render_seconds = asyncio.run(self._render_charts(charts_to_render))
+        for (figure, file_path, sha256), seconds in zip(charts_to_render, render_seconds):
+            self.manifest[str(file_path)] = {"sha256": sha256, "render_seconds": seconds}
+            self.render_seconds[str(file_path)] = seconds
+            metrics.record_latency("charts.render", seconds)
+            print(f"Rendered {file_path} in {seconds:.2f} s.")
+        self._save_manifest()
+        return dict(zip([str(file_path) for _, file_path, _ in charts_to_render], render_seconds))
+
+    async def _render_charts(self, charts: List[Tuple[Figure, Path, str]]) -> List[float]:
+        tabs = min(self.max_workers, len(charts))
+        semaphore = asyncio.Semaphore(tabs)  # Time only the render, not the wait for a free tab.
+        async with kaleido.Kaleido(n=tabs) as renderer:
+
+            async def render_chart(figure: Figure, file_path: Path) -> float:
+                async with semaphore:
+                    start_time = time.perf_counter()
+                    await renderer.write_fig(figure, path=file_path, opts=self.options, cancel_on_error=True)
+                    return time.perf_counter() - start_time
+
+            return await asyncio.gather(*[render_chart(figure, file_path) for figure, file_path, _ in charts])
+
+    def get_statistics(self) -> Dict[str, int | float]:
+        return {"rendered": len(self.render_seconds), "skipped": len(self.skipped), "render_seconds": round(sum(self.render_seconds.values()), 2)}
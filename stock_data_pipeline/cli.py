@@ -0,0 +1,89 @@
+"""stock-data-pipeline command line interface.
+
+    stock-data-pipeline market-day [--date 2025-07-03]
+    stock-data-pipeline {scrape,load-shares,prices,sector-history,plot,run-all} [--sectors xlk xlf]
+    stock-data-pipeline intraday [--sectors xlk xlf] [--interval 5m] [--poll-seconds 60] [--once]
+
+Pipeline subcommands run their stages of the daily pipeline and the stages those depend on, resuming from the checkpoints of
+earlier subcommands on the same date. Modules are imported by the subcommand that needs them, so market-day starts without
+importing pandas or connecting to Postgres and S3.
+"""
+
+import argparse
+import datetime
+import sys
+from typing import Dict, List
+
+
+from .definitions import INTRADAY_INTERVAL, INTRADAY_POLL_SECONDS
+
+
+# Stages each pipeline subcommand runs, besides the stages they depend on. None runs all stages.
+SUBCOMMAND_STAGES: Dict[str, List[str] | None] = {
+    "scrape": ["scrape"],
+    "load-shares": ["update_sector_holdings", "update_shares_outstanding"],
+    "prices": ["update_stock_history"],
+    "sector-history": ["update_sector_history"],
+    "plot": ["plot"],
+    "run-all": None,
+}
+
+
+def market_day(args: argparse.Namespace) -> int:
+    from .trading_calendar import get_trading_calendar  # Only imports NumPy while the NYSE sessions are cached.
+
+    is_market_day = bool(get_trading_calendar().is_trading_day(args.date))
+    print(f"{args.date} is {'' if is_market_day else 'not '}a market day.")
+    return 0 if is_market_day else 1
+
+
+def run_stages(args: argparse.Namespace) -> int:
+    from .daily_pipeline import run_daily_pipeline
+
+    run_daily_pipeline(SUBCOMMAND_STAGES[args.subcommand], sector_symbols=args.sectors)
+    return 0
+
+
+def intraday(args: argparse.Namespace) -> int:
+    from .daily_pipeline import sectors_file_path
+    from .functions import get_database_parameters, get_engine_parameters, make_ticker_sql_compatible
+    from .intraday import IntradaySectorPrices
+    from .postgresql_connection import PostgreSQLConnection
+
+    with open(sectors_file_path, "r", encoding="utf-8") as file:
+        sector_symbols = [make_ticker_sql_compatible(sector_ticker.rstrip("\n")) for sector_ticker in file]
+    if args.sectors:
+        selected_sector_symbols = {make_ticker_sql_compatible(sector_symbol) for sector_symbol in args.sectors}
+        sector_symbols = [sector_symbol for sector_symbol in sector_symbols if sector_symbol in selected_sector_symbols]
+    database_parameters = get_database_parameters()
+    postgresql_connection = PostgreSQLConnection(database_parameters, get_engine_parameters(database_parameters))
+    IntradaySectorPrices(postgresql_connection, sector_symbols, interval=args.interval).run(poll_seconds=args.poll_seconds, once=args.once)
+    return 0
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="stock-data-pipeline", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="subcommand", required=True)
+    market_day_parser = subparsers.add_parser("market-day", help="Exit with 0 if date is an NYSE session, else 1.")
+    market_day_parser.add_argument("--date", type=datetime.date.fromisoformat, default=datetime.date.today(), help="Defaults to today.")
+    market_day_parser.set_defaults(function=market_day)
+    for subcommand, stage_names in SUBCOMMAND_STAGES.items():
+        stage_parser = subparsers.add_parser(subcommand, help=f"Run {', '.join(stage_names) if stage_names else 'all stages'}.")
+        stage_parser.add_argument("--sectors", nargs="+", help="Sector symbols to process, e.g. xlk xlf. Defaults to config/spdr_sectors.txt.")
+        stage_parser.set_defaults(function=run_stages)
+    intraday_parser = subparsers.add_parser("intraday", help="Write sector prices of every intraday bar until the session closes.")
+    intraday_parser.add_argument("--sectors", nargs="+", help="Sector symbols to calculate, e.g. xlk xlf. Defaults to config/spdr_sectors.txt.")
+    intraday_parser.add_argument("--interval", default=INTRADAY_INTERVAL, help="yfinance bar interval, e.g. 1m or 5m.")
+    intraday_parser.add_argument("--poll-seconds", type=float, default=INTRADAY_POLL_SECONDS)
+    intraday_parser.add_argument("--once", action="store_true", help="Write the complete bars so far and exit.")
+    intraday_parser.set_defaults(function=intraday)
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = create_parser().parse_args(argv)
+    return args.function(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
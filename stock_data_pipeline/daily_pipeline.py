@@ -0,0 +1,330 @@
+"""Stages of the daily pipeline: scrape SSGA sector holdings, load them and shares outstanding, download stock history from
+Yahoo Finance, calculate sector history with NumPy, and plot it. Tables are exported to S3.
+
+The pipeline runs as PipelineRunner stages. A rerun on the same date resumes from the first incomplete stage.
+"""
+
+import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+
+import pandas as pd  # type: ignore
+import sqlalchemy
+
+
+from .backfill import StockHistoryBackfill
+from .chart_renderer import ChartRenderer
+from .definitions import (
+    BACKFILL_NEW_TICKER_YEARS,
+    RUN_REPORT_DIRECTORY,
+    STOCK_WEIGHT_DIRECTORY,
+    FileFormat,
+    StockHistoryLayout,
+)
+from .functions import (
+    check_table_append_compatibility,
+    create_directory,
+    get_database_parameters,
+    get_engine_parameters,
+    get_environment_variable,
+    get_s3_table,
+    get_todays_date,
+    make_ticker_sql_compatible,
+)
+from .holdings_parser import HoldingsParser
+from .instrumentation import metrics, profile
+from .load_yfinance_data import CollectBatchData
+from .pipeline_runner import PipelineRunner
+from .postgresql_connection import PostgreSQLConnection
+from .s3_cache import S3ObjectCache
+from .s3_connection import S3Connection
+from .sector_holdings import SectorHoldingsTable
+from .sectors import Sectors
+from .scraper import SectorScraper
+from .stock_history import StockHistoryTable
+from .ticker import Ticker
+from .tickers import Tickers
+
+
+stock_history_dtypes = {
+    "date": sqlalchemy.DATE,
+    "open": sqlalchemy.types.Numeric(10, 2),
+    "high": sqlalchemy.types.Numeric(10, 2),
+    "low": sqlalchemy.types.Numeric(10, 2),
+    "close": sqlalchemy.types.Numeric(10, 2),
+    "volume": sqlalchemy.types.BigInteger,
+}
+
+DATA_DIRECTORY = Path("data")
+config_directory = "config"
+sectors_file_name = "spdr_sectors.txt"
+sectors_file_path = Path(config_directory, sectors_file_name)
+
+
+def create_connections() -> Tuple[PostgreSQLConnection, S3Connection]:
+    database_parameters: Dict[str, str | int] = get_database_parameters()
+    engine_parameters = get_engine_parameters(database_parameters)
+    postgresql_connection = PostgreSQLConnection(database_parameters, engine_parameters)
+    s3_connection = S3Connection(
+        stock_weight_directory=STOCK_WEIGHT_DIRECTORY,
+        data_directory=DATA_DIRECTORY,
+        AWS_ACCESS_KEY=get_environment_variable("AWS_ACCESS_KEY"),
+        AWS_SECRET_ACCESS_KEY=get_environment_variable("AWS_SECRET_ACCESS_KEY"),
+        STOCK_DATA_PIPELINE_BUCKET_NAME=get_environment_variable("STOCK_DATA_PIPELINE_BUCKET_NAME"),
+        STOCK_DATA_PIPELINE_BUCKET_REGION_NAME=get_environment_variable("STOCK_DATA_PIPELINE_BUCKET_REGION_NAME"),
+        AWS_USERNAME=get_environment_variable("AWS_USERNAME"),
+        file_format=FileFormat(get_environment_variable("S3_FILE_FORMAT", alternative_name="csv")),
+        cache=S3ObjectCache(),
+        compression=get_environment_variable("S3_COMPRESSION", alternative_name="") or None,  # "gzip".
+        write_local_copy=True,  # data/ exports are committed by the workflow.
+    )
+    return postgresql_connection, s3_connection
+
+
+def add_stages(
+    runner: PipelineRunner,
+    todays_date: datetime.datetime,
+    postgresql_connection: PostgreSQLConnection,
+    s3_connection: S3Connection,
+    stock_history_layout: StockHistoryLayout,
+    sector_symbols: List[str] | None = None,
+    backfill_new_ticker_history: bool = False,
+) -> None:
+    """Add the daily pipeline stages to runner. scrape runs concurrently with prepare_database and rehydrate_sector_holdings.
+
+    If sector_symbols is given, only those sectors are processed, but shares outstanding are still scraped for all sectors.
+    If backfill_new_ticker_history, the history of tickers that joined a sector is backfilled before update_stock_history.
+    """
+    sectors = Sectors(
+        sectors_file_path,
+        postgresql_connection=postgresql_connection,
+        s3_connection=s3_connection,
+        sector_symbols=sector_symbols,
+    )
+    tickers = Tickers()
+    sector_holdings_table = SectorHoldingsTable(postgresql_connection)
+    scraper = SectorScraper()  # Keeps one HTTP session and the validators of the last SSGA responses in HTTP_CACHE_DIRECTORY.
+
+    def prepare_database(results: Dict[str, Any]) -> None:
+        postgresql_connection.create_watermarks_table()
+        postgresql_connection.watermarks.backfill()  # Only tables loaded before pipeline_watermarks existed are read.
+        sector_holdings_table.create_table()
+
+    def scrape(results: Dict[str, Any]) -> Dict[str, Any]:
+        create_directory(STOCK_WEIGHT_DIRECTORY)
+        shares_outstanding_texts = scraper.scrape(
+            sectors.sectors, shares_outstanding_sectors=[sector for sector in sectors.all_sectors if sector not in sectors.sectors]
+        )  # Holdings workbooks are written to STOCK_WEIGHT_DIRECTORY.
+        print(f"HTTP: {scraper.http_client.get_statistics()}, unchanged sectors: {scraper.unchanged_sectors}")
+        return {
+            "shares_outstanding": {
+                sector.sector_symbol: sectors.convert_shares_outstanding(shares_outstanding_texts[sector.sector_symbol])
+                for sector in sectors.all_sectors
+            },
+            "unchanged_sectors": scraper.unchanged_sectors,
+        }
+
+    def parse_holdings(results: Dict[str, Any]) -> Dict[str, Any]:
+        unchanged_sectors = results["scrape"]["unchanged_sectors"]
+        return HoldingsParser().parse(
+            {sector.sector_symbol: sector.portfolio_holdings_file_path for sector in sectors.sectors if sector.sector_symbol not in unchanged_sectors}
+        )  # Parse changed workbooks in parallel, or read unchanged ones from snapshots.
+
+    def rehydrate_sector_holdings(results: Dict[str, Any]) -> None:
+        sector_holdings_latest_dates = sector_holdings_table.get_latest_dates()
+        for sector in sectors.sectors:
+            if sector.sector_symbol in sector_holdings_latest_dates:
+                continue
+            sector.sector_shares_df = get_s3_table(
+                sector.s3_connection,
+                s3_file_name=sector.sector_shares_s3_file_name,
+                download_file_path=sector.sector_shares_download_file_path,
+            )  # Load the sector's history from its wide S3 export once.
+            sector.sector_shares_df.drop(columns=[column for column in sector.sector_shares_df if "_shares_shares" in column], inplace=True)
+            sector_holdings_table.append_wide(sector.sector_symbol, sector.sector_shares_df)
+
+    def update_sector_holdings(results: Dict[str, Any]) -> Dict[str, Dict[str, List[str]]]:
+        holdings = results["parse_holdings"]
+        unchanged_sectors = results["scrape"]["unchanged_sectors"]
+        sector_holdings_latest_dates = sector_holdings_table.get_latest_dates()
+        sector_tickers = {}
+        for sector in sectors.sectors:
+            latest_date = sector_holdings_latest_dates.get(sector.sector_symbol)
+            print(
+                f"sector: {sector.sector_symbol}",
+                f"today's date: {todays_date}",
+                f"latest_date: {latest_date}",
+                sep="\n",
+            )
+            original_tickers = sector_holdings_table.get_tickers(sector.sector_symbol, before_date=todays_date)
+            if sector.sector_symbol in unchanged_sectors and latest_date is not None:
+                # Same workbook as the last loaded one, so today's holdings are the latest ones.
+                if todays_date > latest_date:
+                    sector_holdings_table.carry_forward(sector.sector_symbol, todays_date)
+                latest_tickers = sector_holdings_table.get_tickers(sector.sector_symbol)
+            else:
+                sector_holdings = holdings.get(sector.sector_symbol)
+                if sector_holdings is None:  # Unchanged workbook, but its holdings were never loaded, e.g. into a new database.
+                    sector_holdings = HoldingsParser().parse({sector.sector_symbol: sector.portfolio_holdings_file_path})[sector.sector_symbol]
+                sector.create_sector_shares_dataframe(todays_date, sector_holdings)  # Raises on duplicate tickers.
+                latest_tickers = list(sector_holdings["ticker"])
+                if latest_date is None or todays_date > latest_date:
+                    sector_holdings_table.append(sector.sector_symbol, todays_date, sector_holdings)
+            scraper.acknowledge(sector)  # Loaded, so an unchanged workbook can be carried forward by the next run.
+            sector_tickers[sector.sector_symbol] = {
+                "original_tickers": original_tickers,
+                "latest_tickers": latest_tickers,
+            }
+            # Only a change of the sector's tickers redefines its {sector}_shares view.
+            sector_holdings_table.create_wide_view(sector.sector_symbol, sector.sector_shares_table_name, latest_tickers)
+            sector.s3_connection.upload_sql_table(
+                sector.sector_shares_table_name,
+                sector.postgresql_connection,
+            )
+        return sector_tickers
+
+    def assign_tickers(results: Dict[str, Any]) -> None:
+        for sector in sectors.sectors:
+            original_tickers = results["update_sector_holdings"][sector.sector_symbol]["original_tickers"]
+            latest_tickers = results["update_sector_holdings"][sector.sector_symbol]["latest_tickers"]
+            sector.old_tickers = [ticker for ticker in original_tickers if ticker not in latest_tickers]
+            sector.get_new_tickers(original_tickers=original_tickers, latest_tickers=latest_tickers)
+            for ticker_symbol in latest_tickers:
+                ticker_object = Ticker(ticker_symbol, postgresql_connection, stock_history_layout=stock_history_layout)
+                sector.add_ticker(ticker_object)
+                tickers.add_ticker(ticker_symbol, ticker_object)
+
+    def backfill_new_tickers(results: Dict[str, Any]) -> Dict[str, int]:
+        """Load the history of tickers that joined a sector since the last run, up to the day before todays_date."""
+        new_tickers = [tickers.tickers[ticker_symbol] for sector in sectors.sectors for ticker_symbol in sector.new_tickers]
+        if not new_tickers:
+            return {}
+        start_date = (todays_date - pd.DateOffset(years=BACKFILL_NEW_TICKER_YEARS)).date()
+        return StockHistoryBackfill(postgresql_connection).run(new_tickers, start_date, todays_date.date())
+
+    def update_shares_outstanding(results: Dict[str, Any]) -> None:
+        for sector in sectors.all_sectors:  # sector_shares_outstanding has a column per sector.
+            shares_outstanding = results["scrape"]["shares_outstanding"][sector.sector_symbol]
+            sectors.append_shares_outstanding_dict(sector, shares_outstanding)
+            sector.shares_outstanding = shares_outstanding
+        sectors.create_shares_outstanding_table()
+
+    def update_stock_history(results: Dict[str, Any]) -> Dict[str, float]:
+        postgresql_connection.schema.apply()  # Create stock history tables queued by Ticker.
+        # Download stock history for all tickers in batches, then create or append stock history table for each ticker.
+        collect_stock_data = CollectBatchData(
+            [ticker.yfinance_ticker for ticker in tickers.tickers.values()],
+            todays_date=todays_date,
+        )
+        stock_histories = collect_stock_data.get_tickers_history()  # Columns are lower-case and dates are tz-naive.
+        if stock_history_layout == StockHistoryLayout.PARTITIONED:
+            stock_history_table = StockHistoryTable(postgresql_connection)
+            stock_history_table.create_table()
+        watermarks = postgresql_connection.watermarks.get_watermarks()  # Latest date of every table and ticker in one query.
+        new_stock_histories = {}
+        for ticker in tickers.tickers.values():
+            latest_date = watermarks.get(ticker.watermark_key)
+            print(f"{ticker.ticker_symbol}, latest date: {latest_date}, today's date: {todays_date}")
+            ticker.stock_history = stock_histories.get(ticker.yfinance_ticker)
+            if ticker.stock_history is not None:
+                ticker.price = float(ticker.stock_history.loc[todays_date.strftime("%Y-%m-%d"), "close"])
+                stock_history = check_table_append_compatibility(
+                    latest_date, ticker.stock_history
+                )  # Filter stock history to ensure no overlapping dates in postgreSQL table.
+                # Skip add_data if stock history table is empty.
+                if not stock_history.empty and stock_history_layout == StockHistoryLayout.PARTITIONED:
+                    new_stock_histories[ticker.ticker_symbol] = stock_history
+                elif not stock_history.empty:
+                    ticker.postgresql_connection.bulk_load(
+                        stock_history,
+                        ticker.table_name,
+                        data_types=stock_history_dtypes,
+                    )  # Append data to stock history table.
+        if stock_history_layout == StockHistoryLayout.PARTITIONED:
+            stock_history_table.append(new_stock_histories)  # Append all tickers' stock history in one write.
+        return {ticker.ticker_symbol: ticker.price for ticker in tickers.tickers.values() if ticker.price is not None}
+
+    def update_sector_history(results: Dict[str, Any]) -> None:
+        for ticker in tickers.tickers.values():  # Prices are also needed when a resumed run skipped update_stock_history.
+            ticker.price = results["update_stock_history"].get(ticker.ticker_symbol)
+        for sector in sectors.sectors:
+            sector.update_sector_history_table(todays_date.strftime("%Y-%m-%d"))
+
+    def plot(results: Dict[str, Any]) -> None:
+        sectors.read_sector_history_tables()
+        chart_renderer = ChartRenderer()
+        sectors.plot_all_graphs(DATA_DIRECTORY, percent_difference_days=[5, 10, 20, 50], renderer=chart_renderer)
+        print(f"Charts: {chart_renderer.get_statistics()}")
+
+    def add_stage(name: str, function: Callable[[Dict[str, Any]], Any], dependencies: List[str] | None = None, checkpoint: bool = True) -> None:
+        def run_stage(results: Dict[str, Any]) -> Any:
+            with postgresql_connection.thread_connection():  # Return the worker thread's connection to the pool after the stage.
+                return function(results)
+
+        runner.add_stage(name, run_stage, dependencies=dependencies, checkpoint=checkpoint)
+
+    add_stage("prepare_database", prepare_database)
+    add_stage("scrape", scrape)
+    add_stage("parse_holdings", parse_holdings, dependencies=["scrape"])
+    add_stage("rehydrate_sector_holdings", rehydrate_sector_holdings, dependencies=["prepare_database"])
+    add_stage(
+        "update_sector_holdings", update_sector_holdings, dependencies=["scrape", "parse_holdings", "rehydrate_sector_holdings"]
+    )
+    add_stage("assign_tickers", assign_tickers, dependencies=["update_sector_holdings"], checkpoint=False)
+    add_stage("update_shares_outstanding", update_shares_outstanding, dependencies=["scrape", "prepare_database"])
+    if backfill_new_ticker_history:
+        add_stage("backfill_new_tickers", backfill_new_tickers, dependencies=["assign_tickers"])
+        # After the backfill, so both do not create stock_history partitions at the same time.
+        add_stage("update_stock_history", update_stock_history, dependencies=["backfill_new_tickers"])
+    else:
+        add_stage("update_stock_history", update_stock_history, dependencies=["assign_tickers"])
+    add_stage(
+        "update_sector_history", update_sector_history, dependencies=["assign_tickers", "update_shares_outstanding", "update_stock_history"]
+    )
+    add_stage("plot", plot, dependencies=["update_sector_history"])
+
+
+def run_daily_pipeline(stage_names: List[str] | None = None, sector_symbols: List[str] | None = None) -> None:
+    """Run stage_names and the stages they depend on, or all stages, on the latest NYSE session before today.
+
+    Checkpoints are kept per date, database cluster and sector selection, since the stages' results, e.g. loaded tables, live in
+    the database. A rerun only resumes against the same, persistent database, not e.g. the new Postgres service of every CI run.
+    """
+    DATA_DIRECTORY.mkdir(exist_ok=True)  # Keep previous table exports, so incremental sector history updates can append to them.
+
+    todays_date = get_todays_date()
+
+    print(f"todays adjusted date {todays_date}")
+
+    report_file_path = Path(RUN_REPORT_DIRECTORY, f"{todays_date.strftime('%Y-%m-%d')}.json")
+    profile_file_path = report_file_path.with_suffix(".prof") if get_environment_variable("PIPELINE_PROFILE", alternative_name="") == "1" else None
+    postgresql_connection, s3_connection = create_connections()
+    run_id = f"{todays_date.strftime('%Y-%m-%d')}_{postgresql_connection.get_system_identifier()}"
+    if sector_symbols:
+        sector_symbols = sorted({make_ticker_sql_compatible(sector_symbol) for sector_symbol in sector_symbols})
+        run_id = f"{run_id}_{'_'.join(sector_symbols)}"
+    # Checkpoints only apply to the same date and database cluster. PIPELINE_RESTART=1 runs all stages again.
+    runner = PipelineRunner(run_id, restart=get_environment_variable("PIPELINE_RESTART", alternative_name="") == "1")
+    add_stages(
+        runner,
+        todays_date,
+        postgresql_connection,
+        s3_connection,
+        StockHistoryLayout(get_environment_variable("STOCK_HISTORY_LAYOUT", alternative_name="per_ticker")),
+        sector_symbols=sector_symbols or None,
+        # Only worth it against a persistent database. In CI every ticker of the new Postgres service is new.
+        backfill_new_ticker_history=get_environment_variable("PIPELINE_BACKFILL_NEW_TICKERS", alternative_name="") == "1",
+    )
+    try:
+        with profile(profile_file_path):
+            runner.run(stage_names)
+    finally:  # Also report failed runs.
+        metrics.write_report(
+            report_file_path,
+            extra={
+                "run_id": runner.run_id,
+                "resumed_stages": [stage_name for stage_name in runner.checkpoint if stage_name not in metrics.stages],
+                "s3_cache": s3_connection.cache.get_statistics(),
+            },
+        )
@@ -1,9 +1,54 @@
+import datetime
 from enum import Enum
 from pathlib import Path
 
 
 SECTOR_SHARES_OUTSTANDING = "sector_shares_outstanding"
+STOCK_HISTORY = "stock_history"
+PIPELINE_WATERMARKS = "pipeline_watermarks"
+SECTOR_HOLDINGS = "sector_holdings"
+BACKFILL_PROGRESS = "backfill_progress"
+INTRADAY_SECTOR_PRICES = "intraday_sector_prices"
 STOCK_WEIGHT_DIRECTORY = Path("stock_weights")
+CACHE_DIRECTORY = Path(".cache")  # Kept between runs, unlike the directories recreated by create_directory.
+S3_CACHE_DIRECTORY = Path(CACHE_DIRECTORY, "s3")
+S3_CACHE_MAX_SIZE_BYTES = 500 * 1024**2
+HTTP_CACHE_DIRECTORY = Path(CACHE_DIRECTORY, "http")  # Last body and validators of every scraped URL.
+HOLDINGS_CACHE_DIRECTORY = Path(CACHE_DIRECTORY, "holdings")
+HOLDINGS_SNAPSHOT_VERSION = 1  # Increase when read_holdings_workbook changes, so old snapshots are not used.
+CHART_CACHE_DIRECTORY = Path(CACHE_DIRECTORY, "charts")
+CHART_RENDER_WORKERS = 4  # Chrome tabs of the one kaleido process.
+PIPELINE_RUNS_DIRECTORY = Path(CACHE_DIRECTORY, "pipeline_runs")
+PIPELINE_MAX_WORKERS = 4
+RUN_REPORT_DIRECTORY = Path(CACHE_DIRECTORY, "run_reports")  # One JSON report per run date, kept to compare runs over days.
+TRADING_CALENDAR_DIRECTORY = Path(CACHE_DIRECTORY, "trading_calendar")
+TRADING_CALENDAR_NAME = "NYSE"
+TRADING_CALENDAR_START_DATE = "1990-01-01"
+TRADING_CALENDAR_END_YEARS_AHEAD = 2  # Sessions are loaded up to the end of the year this many years from now.
+
+SCRAPER_MAX_WORKERS = 8
+SCRAPER_REQUESTS_PER_SECOND = 2.0  # Per host.
+SCRAPER_BURST = 4
+SCRAPER_TIMEOUT = 30
+
+YFINANCE_BATCH_SIZE = 100  # Tickers per yfinance download request.
+
+BACKFILL_MAX_WORKERS = 8  # Concurrent yfinance downloads.
+BACKFILL_CHUNK_MONTHS = 12  # Calendar months of one ticker per download task.
+BACKFILL_LOAD_ROWS = 100_000  # Downloaded rows are loaded into PostgreSQL in batches of about this size.
+BACKFILL_NEW_TICKER_YEARS = 10  # History loaded for a ticker that joins a sector.
+
+INTRADAY_INTERVAL = "5m"  # yfinance keeps 1m bars for 7 days and 5m bars for 60 days.
+INTRADAY_POLL_SECONDS = 60
+INTRADAY_RETENTION_DAYS = 10  # Calendar days of bars kept in intraday_sector_prices.
+EXCHANGE_TIMEZONE = "America/New_York"  # Intraday timestamps are stored in exchange time, without timezone.
+EXCHANGE_CLOSE_TIME = datetime.time(16)  # Regular session close. Early closes end polling later than needed.
+
+PARQUET_COMPRESSION = "zstd"  # Or "snappy".
+S3_MULTIPART_PART_SIZE = 8 * 1024**2  # S3 requires at least 5 MiB for every part but the last.
+
+POSTGRESQL_POOL_SIZE = 5
+POSTGRESQL_MAX_OVERFLOW = 10
 
 
 class DataTypes:
@@ -21,3 +66,13 @@ class SQLOperation(Enum):
 class TickerColumnType(Enum):
     PRICE = "price"
     SHARES = "shares"
+
+
+class StockHistoryLayout(Enum):
+    PER_TICKER = "per_ticker"  # One {ticker}_stock_history table per ticker.
+    PARTITIONED = "partitioned"  # One stock_history table, range-partitioned by date.
+
+
+class FileFormat(Enum):
+    CSV = "csv"
+    PARQUET = "parquet"
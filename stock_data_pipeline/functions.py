@@ -11,13 +11,16 @@ from typing import Dict
 
 
 import pandas as pd  # type: ignore
-import pandas_market_calendars as mcal
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
 import sqlalchemy
 
 
-from .definitions import SQLOperation
+from .definitions import FileFormat
 from .postgresql_connection import PostgreSQLConnection
 from .s3_connection import S3Connection
+from .s3_stream import COMPRESSION_EXTENSIONS
+from .trading_calendar import get_trading_calendar
 
 
 def check_table_append_compatibility(
@@ -58,12 +61,25 @@ def get_environment_variable(name: str, alternative_name: str | None = None) ->
     return variable
 
 
+def get_database_parameters() -> Dict[str, str | int]:
+    return {
+        "host": get_environment_variable("POSTGRESQL_HOST", alternative_name="localhost"),
+        "port": get_environment_variable("POSTGRESQL_PORT", alternative_name="5432"),
+        "dbname": get_environment_variable("POSTGRESQL_DB"),
+        "user": get_environment_variable("POSTGRESQL_USER", alternative_name="postgres"),
+        "password": get_environment_variable("POSTGRESQL_PASSWORD"),
+    }
+
+
+def get_engine_parameters(database_parameters: Dict[str, str | int]) -> str:
+    return (
+        f"postgresql+psycopg2://{database_parameters['user']}:{database_parameters['password']}"
+        f"@{database_parameters['host']}:{database_parameters['port']}/{database_parameters['dbname']}"
+    )
+
+
 def get_market_day(date: datetime.datetime) -> bool:
-    nyse = mcal.get_calendar("NYSE")
-    market_days = nyse.valid_days(start_date=date, end_date=date)
-    if len(market_days) > 0:  # TODO: make this more robust
-        return True
-    return False
+    return get_trading_calendar().is_trading_day(date)
 
 
 def get_latest_date(df: pd.DataFrame, date_format: str) -> pd.DatetimeIndex | None:
@@ -76,17 +92,51 @@ def get_latest_date(df: pd.DataFrame, date_format: str) -> pd.DatetimeIndex | No
 def get_s3_table(
     s3_connection: S3Connection, s3_file_name: str, download_file_path: Path
 ) -> pd.DataFrame:
+    """Download a table from S3. s3_file_name is the CSV object name.
+
+    If s3_connection uses Parquet, read the Parquet object instead, or fall back to the CSV object and upload it as Parquet.
+    If s3_connection compresses CSV exports, read the compressed object if it exists.
+    """
+    if s3_connection.file_format == FileFormat.PARQUET:
+        parquet_file_name = Path(s3_file_name).with_suffix(".parquet").name
+        parquet_download_file_path = download_file_path.with_suffix(".parquet")
+        if s3_connection.object_exists(parquet_file_name):
+            s3_connection.download_file(parquet_file_name, parquet_download_file_path)
+            return read_table_file(parquet_download_file_path)
+        print(f"{parquet_file_name} does not exist, read {s3_file_name} and convert it to Parquet.")
+        s3_connection.download_file(s3_file_name, download_file_path)
+        df = read_table_file(download_file_path)
+        s3_connection.upload_data_frame_parquet(df, parquet_file_name)
+        return df
+    if s3_connection.compression is not None:
+        compressed_file_name = s3_file_name + COMPRESSION_EXTENSIONS[s3_connection.compression]
+        if s3_connection.object_exists(compressed_file_name):
+            compressed_download_file_path = download_file_path.with_name(compressed_file_name)
+            s3_connection.download_file(compressed_file_name, compressed_download_file_path)
+            return read_table_file(compressed_download_file_path)  # pandas infers the compression from the file extension.
     s3_connection.download_file(
         s3_file_name,
         download_file_path,
     )
-    if download_file_path.exists():
-        df = pd.read_csv(download_file_path)
-        df.index = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
-        df.index.name = None
-        df.drop(labels="date", inplace=True, axis=1)
-        return df
-    raise NameError(f"Download path {download_file_path} does not exist.")
+    return read_table_file(download_file_path)
+
+
+def read_table_file(file_path: Path) -> pd.DataFrame:
+    """Read a CSV or Parquet table export. Index is the date as a %Y-%m-%d string, other columns are floats."""
+    if not file_path.exists():
+        raise NameError(f"Download path {file_path} does not exist.")
+    if file_path.suffix == ".parquet":
+        table = pq.read_table(file_path)
+        for index, field in enumerate(table.schema):
+            if pa.types.is_decimal(field.type):  # Cast through text, so floats are the same as those parsed from CSV.
+                table = table.set_column(index, field.name, table.column(index).cast(pa.string()).cast(pa.float64()))
+        df = table.to_pandas()
+    else:
+        df = pd.read_csv(file_path)
+    df.index = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+    df.index.name = None
+    df.drop(labels="date", inplace=True, axis=1)
+    return df
 
 
 def get_sql_table_latest_date(
@@ -105,16 +155,10 @@ def get_sql_table_latest_date(
 
 
 def get_todays_date() -> datetime.datetime:
-    # TODO: below is a temporary solution, will need to be adjusted depending on what time the CI runs
-    today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    weekday = today.weekday()
-    if weekday >= 5:  # if Saturday to Sunday
-        weekday_adjustment = weekday - 4
-    elif weekday == 0:  # if Monday
-        weekday_adjustment = 3
-    else:  # if Tuesday to Friday
-        weekday_adjustment = 1
-    return today - datetime.timedelta(days=weekday_adjustment)
+    """Get the latest NYSE session before today, at midnight."""
+    today = datetime.date.today()
+    previous_session = get_trading_calendar().previous_session(today).astype(datetime.date)
+    return datetime.datetime.combine(previous_session, datetime.time())
 
 
 def initialize_table(
@@ -124,21 +168,17 @@ def initialize_table(
     postgresql_connection: PostgreSQLConnection,
     data_frame: pd.DataFrame | None = None,
 ) -> None:
-    dtypes_string = convert_sql_data_type_into_string(data_types_strings)
-    query = f"CREATE TABLE IF NOT EXISTS {table_name} ({dtypes_string})"
-    postgresql_connection.execute_query(query, operation=SQLOperation.COMMIT)
-    if data_frame is not None:
-        data_frame.to_sql(
-            table_name,
-            con=postgresql_connection.engine,
-            if_exists="append",
-            index=True,
-            index_label="date",
-            dtype=data_types,
-        )
-        set_table_primary_key(  # TODO: need to test when there are not sector shares csv files in S3 bucket
-            table_name, "date", postgresql_connection
-        )
+    postgresql_connection.schema.create_table(table_name, data_types_strings)
+    if data_frame is None:
+        postgresql_connection.schema.apply()
+        return
+    # TODO: need to test when there are not sector shares csv files in S3 bucket
+    postgresql_connection.schema.set_primary_key(table_name, ["date"])  # Queued DDL runs in bulk_load's transaction.
+    postgresql_connection.bulk_load(
+        data_frame,
+        table_name,
+        data_types=data_types,
+    )
 
 
 def make_ticker_sql_compatible(name: str) -> str:
@@ -0,0 +1,84 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from importlib.util import find_spec
+import multiprocessing
+import os
+from pathlib import Path
+import time
+from typing import Dict, List
+
+
+import pandas as pd  # type: ignore
+
+
+from .definitions import HOLDINGS_CACHE_DIRECTORY, HOLDINGS_SNAPSHOT_VERSION
+
+
+EXCEL_ENGINE = "calamine" if find_spec("python_calamine") is not None else "openpyxl"  # calamine is optional and much faster.
+HOLDINGS_COLUMNS = ["Ticker", "Weight", "Shares Held"]
+
+
+def read_holdings_workbook(file_path: Path) -> pd.DataFrame:
+    """Read an SSGA holdings workbook into a (ticker, weight, shares_held) DataFrame sorted by SQL compatible ticker.
+
+    Rows without a ticker, cash rows with ticker "-", and tickers containing "6" are removed. weight is a fraction.
+    """
+    holdings = pd.read_excel(file_path, skiprows=4, usecols=HOLDINGS_COLUMNS, engine=EXCEL_ENGINE)
+    holdings.columns = [column.lower().replace(" ", "_") for column in holdings.columns]
+    tickers = holdings["ticker"].astype("string")
+    holdings = holdings[tickers.notna() & (tickers != "-") & ~tickers.str.contains("6", regex=False).fillna(False)].copy()
+    holdings["ticker"] = holdings["ticker"].astype(str).str.replace(".", "_", regex=False).str.lower()  # Same as make_ticker_sql_compatible.
+    holdings["weight"] = pd.to_numeric(holdings["weight"]) / 100
+    return holdings.sort_values(by="ticker").reset_index(drop=True)
+
+
+class HoldingsParser:
+    """Parse holdings workbooks in a process pool, and cache each result as a Feather snapshot keyed by the workbook's SHA-256.
+
+    Unchanged workbooks are read from their snapshot without parsing.
+    """
+
+    def __init__(self, cache_directory: Path = HOLDINGS_CACHE_DIRECTORY, max_workers: int | None = None):
+        self.cache_directory = cache_directory
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.hits = 0
+        self.misses = 0
+        self.cache_directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _hash_file(file_path: Path) -> str:
+        with open(file_path, "rb") as file:
+            return hashlib.file_digest(file, "sha256").hexdigest()
+
+    def _get_snapshot_path(self, sha256: str) -> Path:
+        return Path(self.cache_directory, f"{sha256}_v{HOLDINGS_SNAPSHOT_VERSION}.feather")
+
+    def parse(self, file_paths: Dict[str, Path]) -> Dict[str, pd.DataFrame]:
+        """Parse the workbooks in file_paths, keyed by e.g. sector symbol. Return their holdings with the same keys."""
+        start_time = time.perf_counter()
+        holdings: Dict[str, pd.DataFrame] = {}
+        snapshot_paths = {key: self._get_snapshot_path(self._hash_file(file_path)) for key, file_path in file_paths.items()}
+        for key, snapshot_path in snapshot_paths.items():
+            if snapshot_path.exists():
+                holdings[key] = pd.read_feather(snapshot_path)
+        self.hits += len(holdings)
+        keys_to_parse = [key for key in file_paths if key not in holdings]
+        self.misses += len(keys_to_parse)
+        for key, parsed_holdings in zip(keys_to_parse, self._parse_workbooks([file_paths[key] for key in keys_to_parse])):
+            parsed_holdings.to_feather(snapshot_paths[key], compression="zstd")
+            holdings[key] = parsed_holdings
+        print(
+            f"Parsed {len(keys_to_parse)} holdings workbooks with {EXCEL_ENGINE} and read {len(file_paths) - len(keys_to_parse)} "
+            f"from snapshots in {time.perf_counter() - start_time:.2f} s."
+        )
+        return holdings
+
+    def _parse_workbooks(self, file_paths: List[Path]) -> List[pd.DataFrame]:
+        # Workers are spawned, not forked: parsing can run while other pipeline stages hold locks in other threads.
+        if len(file_paths) <= 1 or self.max_workers <= 1:
+            return [read_holdings_workbook(file_path) for file_path in file_paths]
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(file_paths)), mp_context=multiprocessing.get_context("spawn")) as executor:
+            return list(executor.map(read_holdings_workbook, file_paths))
+
+    def get_statistics(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
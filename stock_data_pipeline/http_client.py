@@ -0,0 +1,135 @@
+import hashlib
+import json
+from pathlib import Path
+import threading
+from typing import Dict
+
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+from .definitions import HTTP_CACHE_DIRECTORY, SCRAPER_MAX_WORKERS, SCRAPER_TIMEOUT
+from .instrumentation import metrics
+
+
+class HttpResponse:
+    """Body of a GET. changed is False if the body is the one last acknowledged for the URL, e.g. because the server answered 304."""
+
+    def __init__(self, url: str, content: bytes, status_code: int, changed: bool, downloaded_bytes: int):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.changed = changed
+        self.downloaded_bytes = downloaded_bytes
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+
+class HttpClient:
+    """Keep-alive requests.Session with a connection pool, and conditional GETs validated by ETag and Last-Modified.
+
+    The validators and SHA-256 of the last body of every URL are kept in index.json, and the body under objects/, so a 304
+    Not Modified answer returns the stored body. A body is unchanged if it hashes the same as the one last acknowledged with
+    acknowledge(url), which callers do once they have loaded it, so a body fetched by a run that failed before loading it
+    is still treated as changed by the next run.
+    """
+
+    def __init__(self, cache_directory: Path = HTTP_CACHE_DIRECTORY, pool_size: int = SCRAPER_MAX_WORKERS, timeout: float = SCRAPER_TIMEOUT):
+        self.objects_directory = Path(cache_directory, "objects")
+        self.index_file_path = Path(cache_directory, "index.json")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        self.lock = threading.Lock()
+        self.statistics: Dict[str, int] = {"requests": 0, "not_modified": 0, "unchanged": 0}
+        self.objects_directory.mkdir(parents=True, exist_ok=True)
+        self.index: Dict[str, Dict[str, str | None]] = {}
+        if self.index_file_path.exists():
+            with open(self.index_file_path, "r", encoding="utf-8") as file:
+                self.index = json.load(file)
+
+    def __enter__(self) -> "HttpClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _save_index(self) -> None:
+        temporary_file_path = self.index_file_path.with_suffix(".tmp")
+        with open(temporary_file_path, "w", encoding="utf-8") as file:
+            json.dump(self.index, file, indent=2)
+        temporary_file_path.replace(self.index_file_path)
+
+    def _get_object_path(self, sha256: str) -> Path:
+        return Path(self.objects_directory, sha256)
+
+    def _remove_unused_object(self, sha256: str | None) -> None:
+        if sha256 is not None and sha256 not in {entry["sha256"] for entry in self.index.values()}:
+            self._get_object_path(sha256).unlink(missing_ok=True)
+
+    def get(self, url: str) -> HttpResponse:
+        """GET url, conditionally if a body of it is stored. Raise for error status codes."""
+        with self.lock:
+            entry = dict(self.index.get(url, {}))
+        headers = {}
+        if entry and self._get_object_path(str(entry["sha256"])).exists():
+            if entry["etag"]:
+                headers["If-None-Match"] = str(entry["etag"])
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = str(entry["last_modified"])
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        with self.lock:
+            self.statistics["requests"] += 1
+        if response.status_code == 304 and headers:
+            with open(self._get_object_path(str(entry["sha256"])), "rb") as file:
+                content = file.read()
+            sha256 = str(entry["sha256"])
+            with self.lock:
+                self.statistics["not_modified"] += 1
+            metrics.increment("http.not_modified")
+        else:
+            response.raise_for_status()
+            content = response.content
+            sha256 = hashlib.sha256(content).hexdigest()
+            object_path = self._get_object_path(sha256)
+            if not object_path.exists():
+                temporary_object_path = object_path.with_suffix(".tmp")
+                temporary_object_path.write_bytes(content)
+                temporary_object_path.replace(object_path)
+            with self.lock:
+                previous_entry = self.index.get(url, {})
+                self.index[url] = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "sha256": sha256,
+                    "acknowledged_sha256": previous_entry.get("acknowledged_sha256"),
+                }
+                self._remove_unused_object(previous_entry.get("sha256"))
+                self._save_index()
+        changed = sha256 != entry.get("acknowledged_sha256")
+        if not changed:
+            with self.lock:
+                self.statistics["unchanged"] += 1
+        return HttpResponse(url, content, response.status_code, changed, len(response.content))
+
+    def acknowledge(self, url: str) -> None:
+        """Record the last body of url as loaded, so the same body is reported as unchanged by later GETs."""
+        with self.lock:
+            entry = self.index.get(url)
+            if entry is None or entry["acknowledged_sha256"] == entry["sha256"]:
+                return
+            entry["acknowledged_sha256"] = entry["sha256"]
+            self._save_index()
+
+    def get_statistics(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.statistics)
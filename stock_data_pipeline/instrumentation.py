@@ -0,0 +1,116 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import cProfile
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Any, Dict, Iterator, List
+
+
+import numpy as np
+
+
+class RunMetrics:
+    """Thread-safe stage times, latencies and counters of one pipeline run, written as a JSON report at the end of the run.
+
+    Latencies are kept per name, e.g. "postgresql.query" or "http.www.ssga.com", and summarized as count, total, p50, p95 and max.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.stages: Dict[str, float] = {}
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.counters: Counter = Counter()
+        self.yfinance_calls: Counter = Counter()
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def record_stage(self, stage_name: str, seconds: float) -> None:
+        with self.lock:
+            self.stages[stage_name] = seconds
+
+    def record_latency(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.latencies[name].append(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Record the wall time of the block as a latency of name, also if it raises."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_latency(name, time.perf_counter() - start_time)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] += value
+
+    def record_yfinance_call(self, tickers: List[str]) -> None:
+        """Count one yfinance request for each ticker it covers."""
+        with self.lock:
+            self.yfinance_calls.update(tickers)
+
+    @staticmethod
+    def _summarize(latencies: List[float]) -> Dict[str, float | int]:
+        latency_array = np.asarray(latencies)
+        return {
+            "count": len(latencies),
+            "total_seconds": round(float(latency_array.sum()), 6),
+            "p50_seconds": round(float(np.percentile(latency_array, 50)), 6),
+            "p95_seconds": round(float(np.percentile(latency_array, 95)), 6),
+            "max_seconds": round(float(latency_array.max()), 6),
+        }
+
+    def get_report(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.start_time)),
+                "wall_seconds": round(time.time() - self.start_time, 3),
+                "stages": {stage_name: round(seconds, 3) for stage_name, seconds in self.stages.items()},
+                "latencies": {name: self._summarize(latencies) for name, latencies in sorted(self.latencies.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "yfinance_calls": {
+                    "requests_per_ticker": dict(sorted(self.yfinance_calls.items())),
+                    "tickers": len(self.yfinance_calls),
+                },
+            }
+
+    def write_report(self, file_path: Path, extra: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        """Write the report, plus extra entries such as cache statistics, to file_path as JSON. Return the report."""
+        report = self.get_report()
+        report.update(extra or {})
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_file_path = file_path.with_suffix(".tmp")
+        with open(temporary_file_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, default=str)
+        temporary_file_path.replace(file_path)
+        print(f"Run report written to {file_path}.")
+        return report
+
+
+metrics = RunMetrics()  # Shared by PostgreSQLConnection, S3Connection, the scraper and the yfinance collectors.
+
+
+@contextmanager
+def profile(file_path: Path | None) -> Iterator[None]:
+    """Run the block under cProfile and dump the stats to file_path, e.g. for snakeviz. Do nothing if file_path is None.
+
+    Before Python 3.12, cProfile only sees the calling thread, so stages running in PipelineRunner worker threads show up as
+    time waiting on them.
+    """
+    if file_path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(file_path)
+        print(f"Profile written to {file_path}.")
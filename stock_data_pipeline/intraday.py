@@ -0,0 +1,170 @@
+import datetime
+import time
+from typing import Dict, List
+from zoneinfo import ZoneInfo
+
+
+import pandas as pd  # type: ignore
+import sqlalchemy
+
+
+from .definitions import (
+    EXCHANGE_CLOSE_TIME,
+    EXCHANGE_TIMEZONE,
+    INTRADAY_INTERVAL,
+    INTRADAY_POLL_SECONDS,
+    INTRADAY_RETENTION_DAYS,
+    INTRADAY_SECTOR_PRICES,
+    SECTOR_SHARES_OUTSTANDING,
+    YFINANCE_BATCH_SIZE,
+)
+from .functions import make_ticker_yfinance_compatible
+from .instrumentation import metrics
+from .load_yfinance_data import YFinance
+from .postgresql_connection import PostgreSQLConnection
+from .sector_holdings import SectorHoldingsTable
+from .sector_index import SectorIndexEngine
+from .trading_calendar import get_trading_calendar
+
+
+intraday_sector_prices_dtypes = {
+    "timestamp": sqlalchemy.types.TIMESTAMP,
+    "sector": sqlalchemy.types.Text,
+    "price": sqlalchemy.types.Numeric(10, 2),
+}
+
+
+class IntradaySectorPrices:
+    """Calculated price of every sector per intraday bar, e.g. every 5 minutes, kept in the intraday_sector_prices table.
+
+    Constituents and their shares are the latest holdings in sector_holdings, the rows behind the {sector}_shares views, and
+    shares outstanding are the latest row of sector_shares_outstanding. Each poll downloads the bars of all constituents in
+    batches of chunk_size tickers, but only bars that are new to the SectorIndexEngine are applied to it, and only complete bars
+    after a sector's watermark are written. A constituent without a bar keeps its previous close, so the first poll downloads
+    the previous session too, and later polls download from the last bar applied to the engine. Bars older than retention_days
+    are deleted.
+    """
+
+    def __init__(
+        self,
+        postgresql_connection: PostgreSQLConnection,
+        sector_symbols: List[str],
+        interval: str = INTRADAY_INTERVAL,
+        retention_days: int = INTRADAY_RETENTION_DAYS,
+        chunk_size: int = YFINANCE_BATCH_SIZE,
+        table_name: str = INTRADAY_SECTOR_PRICES,
+    ):
+        self.postgresql_connection = postgresql_connection
+        self.sector_symbols = sector_symbols
+        self.interval = interval
+        self.bar_duration = pd.Timedelta(interval)
+        self.retention_days = retention_days
+        self.chunk_size = chunk_size
+        self.table_name = table_name
+        self.tickers: List[str] = []
+        self.engine: SectorIndexEngine | None = None
+
+    def create_table(self) -> None:
+        self.postgresql_connection.create_watermarks_table()
+        self.postgresql_connection.schema.create_table(
+            self.table_name,
+            {"timestamp": "TIMESTAMP NOT NULL", "sector": "TEXT NOT NULL", "price": "NUMERIC(10, 2)"},
+            primary_key=["sector", "timestamp"],
+        )
+        self.postgresql_connection.schema.apply()
+
+    def load_constituents(self) -> None:
+        """Load the latest holdings and shares outstanding of every sector, e.g. once per session after the daily pipeline ran."""
+        holdings = SectorHoldingsTable(self.postgresql_connection).get_latest_holdings(self.sector_symbols)
+        missing_sector_symbols = [sector_symbol for sector_symbol in self.sector_symbols if sector_symbol not in set(holdings["sector"])]
+        if missing_sector_symbols:
+            raise NameError(f"Sectors {missing_sector_symbols} have no holdings. Run the daily pipeline first.")
+        self.tickers = sorted(set(holdings["ticker"]))
+        shares_outstanding = self.postgresql_connection.read_query(
+            f"SELECT date, {', '.join(self.sector_symbols)} FROM {SECTOR_SHARES_OUTSTANDING} ORDER BY date DESC LIMIT 1", index_col="date"
+        )
+        if shares_outstanding.empty:
+            raise NameError(f"{SECTOR_SHARES_OUTSTANDING} is empty. Run the daily pipeline first.")
+        self.engine = SectorIndexEngine(self.tickers, self.sector_symbols, holdings, shares_outstanding.iloc[0])
+        print(f"Intraday sector prices of {len(self.sector_symbols)} sectors from {len(self.tickers)} constituents.")
+
+    @staticmethod
+    def get_exchange_time() -> datetime.datetime:
+        return datetime.datetime.now(ZoneInfo(EXCHANGE_TIMEZONE)).replace(tzinfo=None)
+
+    def get_watermarks(self) -> Dict[str, datetime.datetime]:
+        """Get the latest bar written of every sector."""
+        return {
+            sector: watermark
+            for (table_name, sector), watermark in self.postgresql_connection.watermarks.get_watermarks().items()
+            if table_name == self.table_name and sector in self.sector_symbols
+        }
+
+    def _download_closes(self, start: datetime.datetime, end_date: datetime.date) -> pd.DataFrame:
+        """Download the close of every bar from start to end_date, not included, as a bar x ticker DataFrame in exchange time."""
+        yfinance_tickers = [make_ticker_yfinance_compatible(ticker) for ticker in self.tickers]
+        date_range = [start, datetime.datetime.combine(end_date, datetime.time())]  # Naive datetimes are in exchange time.
+        closes = []
+        for chunk_start in range(0, len(yfinance_tickers), self.chunk_size):
+            chunk = yfinance_tickers[chunk_start : chunk_start + self.chunk_size]
+            metrics.record_yfinance_call(chunk)
+            try:
+                with metrics.timer("yfinance.download"):
+                    bars = YFinance().get_stock_fine_resolution(chunk, self.interval, date_range)
+            except Exception as error:
+                print(f"Intraday download of {len(chunk)} tickers from {start} to {end_date} failed: {error}")
+                continue
+            if bars is not None and not bars.empty:
+                closes.append(bars.xs("Close", axis=1, level=1))
+        if not closes:
+            return pd.DataFrame(columns=self.tickers, index=pd.DatetimeIndex([]), dtype=float)
+        close_frame = pd.concat(closes, axis=1).reindex(columns=yfinance_tickers)
+        close_frame.columns = self.tickers
+        if close_frame.index.tz is not None:
+            close_frame.index = close_frame.index.tz_convert(EXCHANGE_TIMEZONE).tz_localize(None)
+        return close_frame.sort_index()
+
+    def poll(self, now: datetime.datetime | None = None) -> pd.DataFrame:
+        """Write the sector prices of complete bars after each sector's watermark. Return the written (sector, price) rows by timestamp."""
+        if self.engine is None:
+            raise NameError("Call load_constituents before poll.")
+        now = now or self.get_exchange_time()
+        watermarks = self.get_watermarks()
+        first_watermark = min(watermarks.values()) if len(watermarks) == len(self.sector_symbols) else None
+        if self.engine.date_count:
+            start = pd.Timestamp(self.engine.dates[self.engine.date_count - 1]).to_pydatetime()  # Earlier bars were applied by earlier polls.
+        else:
+            start_date = get_trading_calendar().previous_session((first_watermark or now).date()).astype(datetime.date)
+            start = datetime.datetime.combine(start_date, datetime.time())
+        closes = self._download_closes(start, now.date() + datetime.timedelta(days=1))
+        closes = closes[closes.index + self.bar_duration <= now]  # The latest bar is not complete until its interval ends.
+        if self.engine.date_count:
+            closes = closes[closes.index > self.engine.dates[self.engine.date_count - 1]]
+        self.engine.append_prices(closes)
+        sector_prices = self.engine.get_sector_prices(start_date=first_watermark).rename_axis(index="timestamp")
+        sector_prices = sector_prices.melt(ignore_index=False, var_name="sector", value_name="price").dropna()
+        sector_watermarks = pd.to_datetime(sector_prices["sector"].map(watermarks)).fillna(pd.Timestamp.min)
+        sector_prices = sector_prices[sector_prices.index.to_numpy() > sector_watermarks.to_numpy()]
+        if sector_prices.empty:
+            return sector_prices
+        self.postgresql_connection.bulk_load(
+            sector_prices, self.table_name, data_types=intraday_sector_prices_dtypes, index_label="timestamp", ticker_column="sector"
+        )
+        retention_start = sector_prices.index.max() - pd.Timedelta(days=self.retention_days)
+        with self.postgresql_connection.transaction() as cursor:
+            cursor.execute(f"DELETE FROM {self.table_name} WHERE timestamp < %s", (retention_start.to_pydatetime(),))
+        return sector_prices
+
+    def run(self, poll_seconds: float = INTRADAY_POLL_SECONDS, once: bool = False) -> None:
+        """Poll every poll_seconds until the session's last bar is written, or poll once."""
+        self.create_table()
+        self.load_constituents()
+        while True:
+            sector_prices = self.poll()
+            latest_bar = sector_prices.index.max() if not sector_prices.empty else None
+            print(f"Wrote {len(sector_prices)} intraday sector prices, latest bar {latest_bar}.")
+            now = self.get_exchange_time()
+            session_end = datetime.datetime.combine(now.date(), EXCHANGE_CLOSE_TIME) + self.bar_duration
+            if once or not get_trading_calendar().is_trading_day(now.date()) or now > session_end:
+                return
+            time.sleep(poll_seconds)
@@ -3,7 +3,11 @@ from datetime import datetime
 import pandas as pd
 import yfinance as yf
 import json
-from typing import List
+from typing import Dict, List
+
+
+from .definitions import YFINANCE_BATCH_SIZE
+from .instrumentation import metrics
 
 
 class CollectDailyData:
@@ -48,16 +52,18 @@ class CollectDailyData:
     def _download_ticker_history(self, start_date, end_date):
         """Download the entire price and volume history for a stock."""
 
+        metrics.record_yfinance_call([self.ticker])
         try:
-            return (
-                YFinance()
-                .get_stock_data_single(
-                    self.ticker,
-                    "1d",
-                    [start_date, end_date],
+            with metrics.timer("yfinance.download"):
+                return (
+                    YFinance()
+                    .get_stock_data_single(
+                        self.ticker,
+                        "1d",
+                        [start_date, end_date],
+                    )
+                    .drop(columns=["Dividends", "Stock Splits"])
                 )
-                .drop(columns=["Dividends", "Stock Splits"])
-            )
 
         except:
             print(f"Ticker {self.ticker} stock data does not exist from {start_date} to {end_date}")
@@ -106,6 +112,63 @@ class CollectDailyData:
         return self.update
 
 
+class CollectBatchData:
+    """Download daily stock history for many tickers with one yfinance request per chunk of tickers."""
+
+    def __init__(
+        self,
+        tickers: List[str],
+        todays_date: pd.DatetimeIndex,
+        chunk_size: int = YFINANCE_BATCH_SIZE,
+    ):
+        self.tickers = list(dict.fromkeys(tickers))  # Remove duplicates, keep order.
+        self.chunk_size = chunk_size
+        self.start_date = CollectDailyData.format_date_to_string(todays_date)
+        self.end_date = CollectDailyData.format_date_to_string(datetime.now())
+        self.failed_tickers: List[str] = []
+
+    @staticmethod
+    def normalize_ticker_history(stock_history: pd.DataFrame) -> pd.DataFrame:
+        """Lower-case column names, drop dividends and splits, drop empty rows, and remove time and timezone from dates."""
+        stock_history = stock_history.copy()
+        stock_history.columns = [column.lower() for column in stock_history.columns]
+        stock_history = stock_history.drop(columns=["dividends", "stock splits"], errors="ignore").dropna(how="all")
+        stock_history = CollectDailyData.remove_time_zone_and_time_from_date(stock_history)
+        stock_history.index.name = "date"
+        return stock_history
+
+    def _download_chunk(self, tickers: List[str]) -> Dict[str, pd.DataFrame]:
+        metrics.record_yfinance_call(tickers)
+        try:
+            with metrics.timer("yfinance.download"):
+                batch_history = YFinance().get_stock_data_batch(tickers, "1d", [self.start_date, self.end_date])
+        except Exception as error:
+            print(f"Batch download of {len(tickers)} tickers from {self.start_date} to {self.end_date} failed: {error}")
+            return {}
+        if batch_history is None or batch_history.empty:
+            return {}
+        stock_histories = {}
+        for ticker in tickers:
+            if ticker not in batch_history.columns.get_level_values(0):
+                continue
+            stock_history = self.normalize_ticker_history(batch_history[ticker])
+            if not stock_history.empty:
+                stock_histories[ticker] = stock_history
+        return stock_histories
+
+    def get_tickers_history(self) -> Dict[str, pd.DataFrame]:
+        """Return stock history keyed by ticker. Tickers without data are recorded in failed_tickers."""
+
+        stock_histories: Dict[str, pd.DataFrame] = {}
+        for chunk_start in range(0, len(self.tickers), self.chunk_size):
+            chunk = self.tickers[chunk_start : chunk_start + self.chunk_size]
+            stock_histories.update(self._download_chunk(chunk))
+        self.failed_tickers = [ticker for ticker in self.tickers if ticker not in stock_histories]
+        if self.failed_tickers:
+            print(f"Ticker stock data does not exist from {self.start_date} to {self.end_date}: {self.failed_tickers}")
+        return stock_histories
+
+
 class YFinance:
     def get_ticker_data(self, path):
         with open(path, "r") as file:
@@ -127,18 +190,37 @@ class YFinance:
             dfs.append(df_history)
         return pd.concat(dfs, keys=tickers, axis=1)
 
-    def get_stock_data_single(self, ticker: str, resolution: str, date_range: List[str]) -> pd.DataFrame:
+    def get_stock_data_single(self, ticker: str, resolution: str, date_range: List[str], raise_errors: bool = False) -> pd.DataFrame:
+        """Download one ticker. If raise_errors, a failed download raises instead of returning an empty DataFrame."""
         start_year = date_range[0]
         end_year = date_range[1]
         stock = yf.Ticker(ticker)
-        df_history = stock.history(interval=resolution, start=start_year, end=end_year)
+        df_history = stock.history(interval=resolution, start=start_year, end=end_year, raise_errors=raise_errors)
         return df_history
 
-    def get_stock_fine_resolution(self, ticker: str, resolution: str, date_range: List[str]) -> pd.DataFrame:
+    def get_stock_data_batch(self, tickers: List[str], resolution: str, date_range: List[str]) -> pd.DataFrame:
+        """Download several tickers in one request. Columns are a (ticker, field) MultiIndex."""
         start_year = date_range[0]
         end_year = date_range[1]
-        df_history = yf.download(ticker, period=resolution, start=start_year, end=end_year)
-        return df_history
+        return yf.download(
+            tickers,
+            interval=resolution,
+            start=start_year,
+            end=end_year,
+            group_by="ticker",
+            auto_adjust=True,
+            actions=False,
+            progress=False,
+            threads=True,
+            multi_level_index=True,
+        )
+
+    def get_stock_fine_resolution(self, tickers: List[str], resolution: str, date_range: List[str | datetime]) -> pd.DataFrame:
+        """Download intraday bars, e.g. resolution "1m" or "5m", of several tickers in one request. Columns are a (ticker, field) MultiIndex.
+
+        date_range can also hold naive datetimes, which yfinance reads in the exchange's time zone.
+        """
+        return self.get_stock_data_batch(tickers, resolution, date_range)
 
     def append_sma_column_to_dataframe(self, df: pd.DataFrame, sma: int):
         df[f"SMA {sma}"] = df["Close"].rolling(window=sma).mean()
@@ -0,0 +1,148 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import json
+from pathlib import Path
+import pickle
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+
+from .definitions import PIPELINE_MAX_WORKERS, PIPELINE_RUNS_DIRECTORY
+from .instrumentation import metrics
+
+
+class Stage:
+    """Named step of a pipeline. function receives the results of the stages in dependencies, keyed by stage name.
+
+    If checkpoint, the stage is skipped when a previous attempt of the same run completed it, and its saved result is used.
+    Stages that only build in-memory state, e.g. Ticker objects, use checkpoint=False so they run on every attempt.
+    """
+
+    def __init__(self, name: str, function: Callable[[Dict[str, Any]], Any], dependencies: List[str] | None = None, checkpoint: bool = True):
+        self.name = name
+        self.function = function
+        self.dependencies = dependencies or []
+        self.checkpoint = checkpoint
+
+
+class PipelineRunner:
+    """Run stages in dependency order, running independent stages concurrently in a thread pool.
+
+    Each completed stage is recorded in runs_directory/run_id/checkpoint.json and its result is pickled next to it, so a
+    rerun with the same run_id, e.g. the same date, resumes from the first incomplete stages. run_id starts with the run's date,
+    e.g. 2025-07-03_{cluster}_{sectors}, and directories of runs with an earlier date are removed, so runs of the same date with
+    other run_ids, e.g. other sector selections, keep their checkpoints. If restart, this run's directory is removed too.
+    """
+
+    def __init__(
+        self, run_id: str, runs_directory: Path = PIPELINE_RUNS_DIRECTORY, max_workers: int = PIPELINE_MAX_WORKERS, restart: bool = False
+    ):
+        self.run_id = run_id
+        self.run_directory = Path(runs_directory, run_id)
+        self.checkpoint_file_path = Path(self.run_directory, "checkpoint.json")
+        self.max_workers = max_workers
+        self.stages: Dict[str, Stage] = {}
+        self.results: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        if runs_directory.exists():
+            run_date = self.get_run_date(run_id)
+            for directory in runs_directory.iterdir():
+                if self.get_run_date(directory.name) < run_date or (restart and directory == self.run_directory):
+                    shutil.rmtree(directory)
+        self.run_directory.mkdir(parents=True, exist_ok=True)
+        self.checkpoint: Dict[str, Dict[str, str | float]] = {}
+        if self.checkpoint_file_path.exists():
+            with open(self.checkpoint_file_path, "r", encoding="utf-8") as file:
+                self.checkpoint = json.load(file)
+
+    @staticmethod
+    def get_run_date(run_id: str) -> str:
+        """Get the date run_id starts with, the part before the first underscore."""
+        return run_id.split("_", 1)[0]
+
+    def add_stage(self, name: str, function: Callable[[Dict[str, Any]], Any], dependencies: List[str] | None = None, checkpoint: bool = True) -> None:
+        if name in self.stages:
+            raise NameError(f"Stage {name} already exists.")
+        for dependency in dependencies or []:
+            if dependency not in self.stages:
+                raise NameError(f"Stage {name} depends on {dependency}, which must be added first.")
+        self.stages[name] = Stage(name, function, dependencies, checkpoint)
+
+    def _get_result_path(self, stage_name: str) -> Path:
+        return Path(self.run_directory, f"{stage_name}.pickle")
+
+    def _is_completed(self, stage: Stage) -> bool:
+        return stage.checkpoint and stage.name in self.checkpoint and self._get_result_path(stage.name).exists()
+
+    def _save_checkpoint(self, stage: Stage, result: Any, seconds: float) -> None:
+        with open(self._get_result_path(stage.name), "wb") as file:
+            pickle.dump(result, file)
+        with self.lock:
+            self.checkpoint[stage.name] = {"completed_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "seconds": round(seconds, 3)}
+            temporary_file_path = self.checkpoint_file_path.with_suffix(".tmp")
+            with open(temporary_file_path, "w", encoding="utf-8") as file:
+                json.dump(self.checkpoint, file, indent=2)
+            temporary_file_path.replace(self.checkpoint_file_path)
+
+    def _run_stage(self, stage: Stage) -> Any:
+        print(f"Start stage {stage.name}.")
+        start_time = time.perf_counter()
+        result = stage.function({dependency: self.results[dependency] for dependency in stage.dependencies})
+        seconds = time.perf_counter() - start_time
+        metrics.record_stage(stage.name, seconds)
+        if stage.checkpoint:
+            self._save_checkpoint(stage, result, seconds)
+        print(f"End stage {stage.name} in {seconds:.2f} s.")
+        return result
+
+    def get_required_stages(self, stage_names: List[str]) -> List[str]:
+        """Get stage_names and the stages they depend on, directly or indirectly, in the order they were added."""
+        required_stages = set()
+        stack = list(stage_names)
+        while stack:
+            stage_name = stack.pop()
+            if stage_name not in self.stages:
+                raise NameError(f"Stage {stage_name} does not exist.")
+            if stage_name not in required_stages:
+                required_stages.add(stage_name)
+                stack.extend(self.stages[stage_name].dependencies)
+        return [stage_name for stage_name in self.stages if stage_name in required_stages]
+
+    def run(self, stage_names: List[str] | None = None) -> Dict[str, Any]:
+        """Run all incomplete stages, or only those stage_names depend on. If a stage raises, running stages finish, no new stages
+        start, and the error is raised.
+        """
+        pending = dict(self.stages) if stage_names is None else {name: self.stages[name] for name in self.get_required_stages(stage_names)}
+        running: Dict[Future, Stage] = {}
+        error: BaseException | None = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if error is None:
+                    for stage in [stage for stage in pending.values() if all(dependency in self.results for dependency in stage.dependencies)]:
+                        del pending[stage.name]
+                        if self._is_completed(stage):
+                            with open(self._get_result_path(stage.name), "rb") as file:
+                                self.results[stage.name] = pickle.load(file)
+                            print(f"Skip stage {stage.name}, completed by a previous attempt of run {self.run_id}.")
+                        else:
+                            running[executor.submit(self._run_stage, stage)] = stage
+                    if any(all(dependency in self.results for dependency in stage.dependencies) for stage in pending.values()):
+                        continue  # Skipped stages made more stages ready.
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        self.results[stage.name] = future.result()
+                    except BaseException as stage_error:
+                        print(f"Stage {stage.name} failed: {stage_error!r}")
+                        error = error or stage_error
+        if error is not None:
+            raise error
+        return self.results
+
+    def get_statistics(self) -> Dict[str, float]:
+        """Seconds of each stage completed in this run or a previous attempt of it."""
+        return {stage_name: float(entry["seconds"]) for stage_name, entry in self.checkpoint.items()}
@@ -0,0 +1,101 @@
+import datetime
+from typing import TYPE_CHECKING, Dict, Tuple
+
+
+import pandas as pd  # type: ignore
+from psycopg2.extras import execute_values  # type: ignore
+
+
+from .definitions import PIPELINE_WATERMARKS, SQLOperation
+
+if TYPE_CHECKING:
+    from stock_data_pipeline import PostgreSQLConnection
+
+
+class PipelineWatermarks:
+    """Latest date of every table, and of every ticker or sector in long tables, kept in the pipeline_watermarks table.
+
+    Watermarks are written in the same transaction as the rows they describe, so reading them replaces a MAX(date) or a
+    full table read. The ticker column holds the ticker or sector symbol, or '' for tables with one watermark.
+    """
+
+    def __init__(self, postgresql_connection: "PostgreSQLConnection", table_name: str = PIPELINE_WATERMARKS):
+        self.postgresql_connection = postgresql_connection
+        self.table_name = table_name
+
+    def create_table(self) -> None:
+        """Queue CREATE TABLE in the schema manager if the table does not exist. It runs with the next schema apply."""
+        self.postgresql_connection.schema.create_table(
+            self.table_name,
+            {
+                "table_name": "TEXT NOT NULL",
+                "ticker": "TEXT NOT NULL DEFAULT ''",
+                "watermark": "TIMESTAMP NOT NULL",
+                "updated_at": "TIMESTAMP NOT NULL DEFAULT now()",
+            },
+            primary_key=["table_name", "ticker"],
+        )
+
+    def get_watermarks(self) -> Dict[Tuple[str, str], datetime.datetime]:
+        """Get the watermarks of all tables and tickers in one query, keyed by (table name, ticker)."""
+        query = f"SELECT table_name, ticker, watermark FROM {self.table_name}"
+        cursor = self.postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE)
+        return {(table_name, ticker): watermark for table_name, ticker, watermark in cursor.fetchall()}
+
+    def get_watermark(self, table_name: str, ticker: str = "") -> datetime.datetime | None:
+        query = f"SELECT watermark FROM {self.table_name} WHERE table_name = %s AND ticker = %s"
+        cursor = self.postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE, values=(table_name, ticker))
+        row = cursor.fetchone()
+        return row[0] if row is not None else None
+
+    @staticmethod
+    def get_data_frame_watermarks(data_frame: pd.DataFrame, date_column: str, ticker_column: str | None = None) -> Dict[str, datetime.datetime]:
+        """Get the latest date in data_frame, per ticker if ticker_column, keyed by ticker."""
+        dates = pd.to_datetime(data_frame[date_column])
+        if ticker_column is None:
+            latest_dates = pd.Series([dates.max()], index=[""])
+        else:
+            latest_dates = dates.groupby(data_frame[ticker_column]).max()
+        return {ticker: latest_date.to_pydatetime() for ticker, latest_date in latest_dates.items() if not pd.isna(latest_date)}
+
+    def update(self, cursor, table_name: str, watermarks: Dict[str, datetime.datetime | datetime.date | str], replace: bool = False) -> None:
+        """Raise the watermarks of table_name, keyed by ticker, with the caller's cursor so they commit with the rows.
+
+        If replace, the rows of table_name were replaced, so its old watermarks are removed first.
+        """
+        if replace:
+            cursor.execute(f"DELETE FROM {self.table_name} WHERE table_name = %s", (table_name,))
+        if not watermarks:
+            return
+        execute_values(
+            cursor,
+            f"INSERT INTO {self.table_name} (table_name, ticker, watermark) VALUES %s ON CONFLICT (table_name, ticker) DO UPDATE "
+            f"SET watermark = GREATEST({self.table_name}.watermark, EXCLUDED.watermark), updated_at = now()",
+            [(table_name, ticker, watermark) for ticker, watermark in watermarks.items()],
+            template="(%s, %s, %s::TIMESTAMP)",
+            page_size=len(watermarks),
+        )
+
+    def backfill(self) -> None:
+        """Add watermarks for tables with a date column that have none, e.g. tables loaded before watermarks existed.
+
+        Watermarks are per sector for tables with a sector column, per ticker for tables with a ticker column.
+        """
+        query = (
+            "SELECT table_name, CASE WHEN bool_or(column_name = 'sector') THEN 'sector' WHEN bool_or(column_name = 'ticker') THEN 'ticker' END "
+            "FROM information_schema.columns WHERE table_schema = 'public' "
+            f"AND column_name IN ('date', 'sector', 'ticker') AND table_name NOT IN (SELECT table_name FROM {self.table_name}) "
+            "AND table_name IN (SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_type = 'BASE TABLE') "
+            "AND table_name NOT IN (SELECT relname FROM pg_class WHERE relispartition) "
+            "GROUP BY table_name HAVING bool_or(column_name = 'date')"
+        )
+        cursor = self.postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE)
+        for table_name, key_column in cursor.fetchall():
+            ticker_expression, group_by = (key_column, f"GROUP BY {key_column} ") if key_column is not None else ("''", "")
+            with self.postgresql_connection.transaction() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {self.table_name} (table_name, ticker, watermark) SELECT %s, {ticker_expression}, MAX(date) FROM {table_name} "
+                    f"{group_by}HAVING MAX(date) IS NOT NULL ON CONFLICT (table_name, ticker) DO NOTHING",
+                    (table_name,),
+                )
+            print(f"Backfilled watermarks of {table_name}.")
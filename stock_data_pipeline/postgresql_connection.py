@@ -1,47 +1,297 @@
+from contextlib import contextmanager
+from io import StringIO
 from pathlib import Path
-from typing import Dict
+import threading
+from typing import Dict, Iterator, List
 
 
+import pandas as pd  # type: ignore
 import psycopg2  # type: ignore
+import sqlalchemy
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
 
 
-from .definitions import SQLOperation
+from .definitions import POSTGRESQL_MAX_OVERFLOW, POSTGRESQL_POOL_SIZE, SQLOperation
+from .instrumentation import metrics
+from .pipeline_watermarks import PipelineWatermarks
+from .schema_manager import SchemaManager
 
 
 class PostgreSQLConnection:
+    """Pooled PostgreSQL connections, shared by the raw psycopg2 cursor paths and the SQLAlchemy engine.
+
+    connection and cursor belong to the calling thread, so execute_query can be called from several threads at once.
+    """
 
     def __init__(
-        self, database_parameters: Dict[str, str | int], engine_parameters: str
+        self,
+        database_parameters: Dict[str, str | int],
+        engine_parameters: str,
+        pool_size: int = POSTGRESQL_POOL_SIZE,
+        max_overflow: int = POSTGRESQL_MAX_OVERFLOW,
     ):
-        self.connection: psycopg2.extensions.connection = psycopg2.connect(
-            **database_parameters
+        self.engine = create_engine(
+            engine_parameters,
+            creator=lambda: psycopg2.connect(**database_parameters),
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=True,
         )
-        self.cursor: psycopg2.extensions.cursor = self.connection.cursor()
-        self.engine = create_engine(engine_parameters)
+        self._thread_local = threading.local()
+        self.schema = SchemaManager(self)
+        self.watermarks = PipelineWatermarks(self)
+
+    def __enter__(self) -> "PostgreSQLConnection":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def connection(self) -> psycopg2.extensions.connection:
+        """Pooled connection of the calling thread. Checked out on first use and kept until release()."""
+        if getattr(self._thread_local, "connection", None) is None:
+            self._thread_local.connection = self.engine.raw_connection()
+            self._thread_local.cursor = self._thread_local.connection.cursor()
+        return self._thread_local.connection
+
+    @property
+    def cursor(self) -> psycopg2.extensions.cursor:
+        self.connection
+        return self._thread_local.cursor
+
+    def release(self) -> None:
+        """Return the calling thread's connection to the pool. Uncommitted work is rolled back."""
+        connection = getattr(self._thread_local, "connection", None)
+        if connection is not None:
+            self._thread_local.cursor.close()
+            connection.rollback()
+            connection.close()  # Returns the connection to the pool.
+            self._thread_local.connection = None
+            self._thread_local.cursor = None
+
+    def close(self) -> None:
+        self.release()
+        self.engine.dispose()
+
+    @contextmanager
+    def transaction(self) -> Iterator[psycopg2.extensions.cursor]:
+        """Yield the calling thread's cursor. Commit on success, roll back on error."""
+        connection = self.connection
+        self._thread_local.transaction_depth = getattr(self._thread_local, "transaction_depth", 0) + 1
+        try:
+            yield self.cursor
+            connection.commit()
+            self.schema.commit()
+        except Exception:
+            connection.rollback()
+            self.schema.rollback()  # DDL applied in this transaction was rolled back too, so it is queued again.
+            raise
+        finally:
+            self._thread_local.transaction_depth -= 1
+
+    def in_transaction(self) -> bool:
+        """Whether the calling thread is inside a transaction() block."""
+        return getattr(self._thread_local, "transaction_depth", 0) > 0
+
+    @contextmanager
+    def thread_connection(self) -> Iterator["PostgreSQLConnection"]:
+        """Use in worker threads or tasks: queries inside share one pooled connection, which is returned to the pool on exit."""
+        try:
+            yield self
+        finally:
+            self.release()
 
     def execute_query(self, query, operation: SQLOperation, values=None):
-        """Execute postgreSQL query."""
+        """Execute postgreSQL query.
 
-        if values:
-            self.cursor.execute(query, values)  # Use values to parameterize the query
-        else:
-            self.cursor.execute(query)
+        EXECUTE returns the cursor to fetch the rows from. Outside a transaction() block its transaction is ended right away, so the
+        connection is not left idle in transaction, holding locks that block DDL. The rows stay fetchable from the cursor.
+        """
 
-        if operation == SQLOperation.COMMIT:
+        if operation not in (SQLOperation.COMMIT, SQLOperation.EXECUTE):
+            raise NameError(f"operation {operation} is not a valid input.")
+        try:
+            with metrics.timer("postgresql.query"):
+                if values:
+                    self.cursor.execute(query, values)  # Use values to parameterize the query
+                else:
+                    self.cursor.execute(query)
+        except Exception:
+            if not self.in_transaction():  # Otherwise the caller's transaction() block rolls back.
+                self.connection.rollback()
+                self.schema.rollback()
+            raise
+
+        if operation == SQLOperation.COMMIT or not self.in_transaction():
             self.connection.commit()
-        elif operation == SQLOperation.EXECUTE:
+            self.schema.commit()
+        if operation == SQLOperation.EXECUTE:
             return self.cursor
-        else:
-            raise NameError(f"operation {SQLOperation} is not a valid input.")
+
+    @staticmethod
+    def _compile_data_type(data_type) -> str:
+        if isinstance(data_type, type):
+            data_type = data_type()
+        return data_type.compile(dialect=postgresql.dialect())
+
+    @staticmethod
+    def _infer_data_type(column: pd.Series) -> str:
+        if pd.api.types.is_bool_dtype(column):
+            return "BOOLEAN"
+        if pd.api.types.is_integer_dtype(column):
+            return "BIGINT"
+        if pd.api.types.is_float_dtype(column):
+            return "DOUBLE PRECISION"
+        if pd.api.types.is_datetime64_any_dtype(column):
+            return "TIMESTAMP"
+        return "TEXT"
+
+    @staticmethod
+    def _convert_column(column: pd.Series, data_type) -> pd.Series:
+        """Convert column to the text representation COPY expects for data_type."""
+        if isinstance(data_type, type):
+            data_type = data_type()
+        if isinstance(data_type, sqlalchemy.types.Date):
+            return pd.to_datetime(column).dt.strftime("%Y-%m-%d")
+        if isinstance(data_type, sqlalchemy.types.Integer):  # Also BigInteger. Float columns with NaN would be written as 1.0.
+            return pd.to_numeric(column).round().astype("Int64")
+        if isinstance(data_type, sqlalchemy.types.Numeric) and data_type.scale is not None:
+            return pd.to_numeric(column).round(data_type.scale)
+        return column
+
+    def bulk_load(
+        self,
+        data_frame: pd.DataFrame,
+        table_name: str,
+        data_types: Dict[str, sqlalchemy.types.TypeEngine] | None = None,
+        if_exists: str = "append",
+        index: bool = True,
+        index_label: str = "date",
+        update_watermark: bool = True,
+        ticker_column: str | None = None,
+        skip_existing_rows: bool = False,
+    ) -> None:
+        """Write data_frame to table_name with COPY FROM STDIN, like DataFrame.to_sql(..., if_exists=if_exists).
+
+        data_types maps column names to SQLAlchemy types, the same dicts passed to to_sql as dtype. If update_watermark and
+        data_frame has a date column, the watermark of table_name, per ticker_column if given, is raised in the same transaction.
+        DDL queued in schema for table_name, and CREATE TABLE if table_name does not exist, runs in the same transaction too.
+        If skip_existing_rows, rows are copied into a temporary staging table and inserted with ON CONFLICT DO NOTHING, so rows
+        whose primary key is already in table_name are skipped instead of failing the COPY. table_name must have a primary key,
+        e.g. queued with schema.set_primary_key, since without one no row conflicts and every row would be inserted again.
+        """
+
+        if if_exists not in ("append", "replace"):
+            raise NameError(f"if_exists {if_exists} is not a valid input.")
+        data_types = data_types or {}
+        data_frame = data_frame.reset_index(names=index_label) if index else data_frame.reset_index(drop=True)
+        for column_name, data_type in data_types.items():
+            if column_name in data_frame.columns:
+                data_frame[column_name] = self._convert_column(data_frame[column_name], data_type)
+        columns_string = ", ".join([f'"{column_name}"' for column_name in data_frame.columns])
+        column_data_types = {
+            column_name: (
+                self._compile_data_type(data_types[column_name]) if column_name in data_types else self._infer_data_type(data_frame[column_name])
+            )
+            for column_name in data_frame.columns
+        }
+        buffer = StringIO()
+        data_frame.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        date_column = index_label if index else "date"
+        update_watermark = update_watermark and date_column in data_frame.columns
+        if update_watermark:
+            self.watermarks.create_table()
+        if if_exists == "replace":
+            self.schema.drop_table(table_name)
+        self.schema.create_table(table_name, column_data_types)
+        if skip_existing_rows and not self.schema.primary_keys.get(table_name):
+            raise NameError(f"{table_name} has no primary key, so skip_existing_rows cannot tell which rows exist.")
+        with self.transaction() as cursor:
+            self.schema.apply(cursor, table_names=[table_name, self.watermarks.table_name])
+            copy_table_name = f"{table_name}_staging" if skip_existing_rows else table_name
+            if skip_existing_rows:
+                cursor.execute(f"CREATE TEMPORARY TABLE {copy_table_name} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP")
+            with metrics.timer("postgresql.copy_from"):
+                cursor.copy_expert(f"COPY {copy_table_name} ({columns_string}) FROM STDIN WITH (FORMAT CSV)", file=buffer)
+            rows_written = len(data_frame)
+            if skip_existing_rows:
+                cursor.execute(
+                    f"INSERT INTO {table_name} ({columns_string}) SELECT {columns_string} FROM {copy_table_name} ON CONFLICT DO NOTHING"
+                )
+                rows_written = cursor.rowcount
+            if update_watermark:
+                self.watermarks.update(
+                    cursor,
+                    table_name,
+                    self.watermarks.get_data_frame_watermarks(data_frame, date_column, ticker_column),
+                    replace=if_exists == "replace",
+                )
+        metrics.increment("postgresql.rows_written", rows_written)
+
+    def drop_table(self, table_name: str) -> None:
+        """Drop table_name and its watermarks in one transaction."""
+        self.watermarks.create_table()
+        self.schema.drop_table(table_name)
+        with self.transaction() as cursor:
+            self.schema.apply(cursor, table_names=[table_name, self.watermarks.table_name])
+            self.watermarks.update(cursor, table_name, {}, replace=True)
+
+    def create_watermarks_table(self) -> None:
+        self.watermarks.create_table()
+        self.schema.apply()
+
+    def read_query(
+        self, query: str, index_col: str | None = None, parse_dates: List[str] | None = None, values: tuple | None = None
+    ) -> pd.DataFrame:
+        """Read the result of query into a DataFrame through COPY TO STDOUT. NUMERIC columns are read as floats."""
+        buffer = StringIO()
+        with self.transaction() as cursor, metrics.timer("postgresql.copy_to"):
+            if values is not None:
+                query = cursor.mogrify(query, values).decode()  # COPY does not take parameters.
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT CSV, HEADER)", file=buffer)
+        buffer.seek(0)
+        return pd.read_csv(buffer, index_col=index_col, parse_dates=parse_dates)
+
+    def get_system_identifier(self) -> str:
+        """Get the identifier of the database cluster, which is new for every initdb, e.g. every CI service container."""
+        cursor = self.execute_query("SELECT system_identifier FROM pg_control_system()", operation=SQLOperation.EXECUTE)
+        return str(cursor.fetchone()[0])
+
+    def get_table_columns(self, table_name: str) -> List[str]:
+        """Get column names of table_name in table order from the schema model. Empty if the table does not exist."""
+        return self.schema.get_columns(table_name)
+
+    def get_table_column_types(self, table_name: str) -> List[tuple[str, str, int | None, int | None]]:
+        """Get (column name, data type, numeric precision, numeric scale) of every column of table_name in table order."""
+        query = (
+            "SELECT column_name, data_type, numeric_precision, numeric_scale FROM information_schema.columns "
+            "WHERE table_schema = 'public' AND table_name = %s ORDER BY ordinal_position"
+        )
+        cursor = self.execute_query(query, operation=SQLOperation.EXECUTE, values=(table_name,))
+        return cursor.fetchall()
 
     def set_primary_key(self, table_name: str, column: str) -> None:
-        query = f"ALTER TABLE {table_name} ADD PRIMARY KEY ({column})"
-        self.execute_query(query, SQLOperation.COMMIT)
+        """Add a primary key on column if table_name has none."""
+        self.schema.set_primary_key(table_name, [column])
+        self.schema.apply()
 
     def save_sql_table_to_csv(self, table_name: str, file_path: Path) -> None:
-        query = f"COPY {table_name} TO STDOUT WITH (FORMAT CSV, HEADER)"
         with open(file_path, "w", newline="") as file:
-            self.cursor.copy_expert(query, file=file)
+            self.copy_sql_table(table_name, file)
+
+    def copy_sql_table(self, table_name: str, file) -> None:
+        """Write table_name as CSV with a header to a writable file object."""
+        query = f"COPY (SELECT * FROM {table_name}) TO STDOUT WITH (FORMAT CSV, HEADER)"  # Also works for views.
+        with self.transaction() as cursor, metrics.timer("postgresql.copy_to"):
+            cursor.copy_expert(query, file=file)
+
+    def append_sql_rows_to_csv(self, table_name: str, file_path: Path, date: str) -> None:
+        """Append the rows of table_name on date to an existing CSV export of table_name, without a header."""
+        query = self.cursor.mogrify(f"COPY (SELECT * FROM {table_name} WHERE date = %s) TO STDOUT WITH (FORMAT CSV)", (date,)).decode()
+        with open(file_path, "a", newline="") as file, self.transaction() as cursor:
+            cursor.copy_expert(query, file=file)
 
         # self.execute_query(query, operation=SQLOperation.EXECUTE)
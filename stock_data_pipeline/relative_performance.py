@@ -0,0 +1,50 @@
+from typing import Dict, List
+
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+
+def create_sector_price_frame(sector_prices: Dict[str, pd.Series]) -> pd.DataFrame:
+    """Align the price series of each sector, keyed by sector symbol, into one date by sector DataFrame sorted by date.
+
+    Dates a sector has no row for are NaN.
+    """
+    if not sector_prices:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+    price_frame = pd.concat(sector_prices, axis=1, sort=False).astype(float)
+    price_frame.index = pd.DatetimeIndex(price_frame.index, name="date")
+    return price_frame.sort_index()
+
+
+def calculate_relative_performance(price_frame: pd.DataFrame, windows: List[int]) -> pd.DataFrame:
+    """Calculate the percent change of every sector over the last days of price_frame, for all windows in one pass.
+
+    Return a tidy DataFrame with columns window, date, sector, price and percent_change, with the rows of each window and
+    sector in date order. A sector is left out of a window if it has no price on the window's first date, e.g. because its
+    history is shorter than the window.
+    """
+    columns = ["window", "date", "sector", "price", "percent_change"]
+    windows = [window for window in windows if 0 < window <= len(price_frame)]
+    if not windows or price_frame.empty:
+        return pd.DataFrame(columns=columns)
+    window_array = np.asarray(windows)
+    max_window = int(window_array.max())
+    prices = price_frame.to_numpy(dtype=float)[-max_window:]  # (max_window, sectors)
+    dates = price_frame.index[-max_window:]
+    start_prices = prices[max_window - window_array]  # (windows, sectors)
+    percent_changes = (prices[np.newaxis, :, :] - start_prices[:, np.newaxis, :]) * 100 / start_prices[:, np.newaxis, :]
+    row_positions = np.arange(max_window)
+    in_window = row_positions[np.newaxis, :] >= (max_window - window_array)[:, np.newaxis]  # (windows, max_window)
+    mask = in_window[:, :, np.newaxis] & ~np.isnan(start_prices)[:, np.newaxis, :]  # (windows, max_window, sectors)
+    window_index, sector_index, row_index = np.nonzero(mask.transpose(0, 2, 1))  # Window, then sector, then date order.
+    return pd.DataFrame(
+        {
+            "window": window_array[window_index],
+            "date": dates[row_index],
+            "sector": price_frame.columns[sector_index],
+            "price": prices[row_index, sector_index],
+            "percent_change": percent_changes[window_index, row_index, sector_index],
+        },
+        columns=columns,
+    )
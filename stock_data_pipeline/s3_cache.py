@@ -0,0 +1,100 @@
+import hashlib
+import json
+from pathlib import Path
+import shutil
+import threading
+import time
+from typing import Dict
+
+
+from .definitions import S3_CACHE_DIRECTORY, S3_CACHE_MAX_SIZE_BYTES
+
+
+class S3ObjectCache:
+    """Content-addressed local copies of S3 objects, validated by ETag.
+
+    Files are stored once per content hash under objects/. index.json maps each S3 key to its ETag, last-modified time,
+    content hash, size and last access time. When the total size exceeds max_size_bytes, the least recently used files are evicted.
+    """
+
+    def __init__(self, cache_directory: Path = S3_CACHE_DIRECTORY, max_size_bytes: int = S3_CACHE_MAX_SIZE_BYTES):
+        self.cache_directory = cache_directory
+        self.objects_directory = Path(cache_directory, "objects")
+        self.index_file_path = Path(cache_directory, "index.json")
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.objects_directory.mkdir(parents=True, exist_ok=True)
+        self.index: Dict[str, Dict[str, str | int | float]] = {}
+        if self.index_file_path.exists():
+            with open(self.index_file_path, "r", encoding="utf-8") as file:
+                self.index = json.load(file)
+
+    def _save_index(self) -> None:
+        temporary_file_path = self.index_file_path.with_suffix(".tmp")
+        with open(temporary_file_path, "w", encoding="utf-8") as file:
+            json.dump(self.index, file, indent=2)
+        temporary_file_path.replace(self.index_file_path)
+
+    @staticmethod
+    def _hash_file(file_path: Path) -> str:
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    def get(self, s3_file_name: str, etag: str) -> Path | None:
+        """Return the cached file of s3_file_name if its ETag is unchanged, else None."""
+        with self.lock:
+            entry = self.index.get(s3_file_name)
+            if entry is not None and entry["etag"] == etag:
+                object_path = Path(self.objects_directory, str(entry["sha256"]))
+                if object_path.exists():
+                    entry["last_access"] = time.time()
+                    self.hits += 1
+                    self._save_index()
+                    return object_path
+            self.misses += 1
+            return None
+
+    def put(self, s3_file_name: str, etag: str, last_modified: str, file_path: Path) -> None:
+        """Store a copy of file_path as the current content of s3_file_name."""
+        sha256 = self._hash_file(file_path)
+        object_path = Path(self.objects_directory, sha256)
+        with self.lock:
+            if not object_path.exists():
+                shutil.copyfile(file_path, object_path)
+            self.index[s3_file_name] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "sha256": sha256,
+                "size": object_path.stat().st_size,
+                "last_access": time.time(),
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self) -> None:
+        """Remove least recently used files until the cache fits in max_size_bytes."""
+        objects: Dict[str, Dict[str, int | float]] = {}
+        for entry in self.index.values():
+            cached_object = objects.setdefault(str(entry["sha256"]), {"size": int(entry["size"]), "last_access": 0.0})
+            cached_object["last_access"] = max(cached_object["last_access"], float(entry["last_access"]))
+        total_size = sum(cached_object["size"] for cached_object in objects.values())
+        for sha256, cached_object in sorted(objects.items(), key=lambda item: item[1]["last_access"]):
+            if total_size <= self.max_size_bytes:
+                break
+            Path(self.objects_directory, sha256).unlink(missing_ok=True)
+            self.index = {s3_file_name: entry for s3_file_name, entry in self.index.items() if entry["sha256"] != sha256}
+            total_size -= int(cached_object["size"])
+
+    def get_statistics(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "objects": len({entry["sha256"] for entry in self.index.values()}),
+                "size_bytes": sum({str(entry["sha256"]): int(entry["size"]) for entry in self.index.values()}.values()),
+            }
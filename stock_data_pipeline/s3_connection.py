@@ -1,8 +1,20 @@
+import csv
+import datetime
 import os
 from pathlib import Path
+import shutil
 from typing import TYPE_CHECKING
 
 import boto3
+from botocore.exceptions import ClientError
+import pandas as pd  # type: ignore
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+
+from .definitions import PARQUET_COMPRESSION, FileFormat, SQLOperation
+from .instrumentation import metrics
+from .s3_cache import S3ObjectCache
+from .s3_stream import COMPRESSION_EXTENSIONS, S3MultipartWriter
 
 if TYPE_CHECKING:
     from stock_data_pipeline import PostgreSQLConnection
@@ -19,7 +31,17 @@ class S3Connection:
         STOCK_DATA_PIPELINE_BUCKET_NAME: str,
         STOCK_DATA_PIPELINE_BUCKET_REGION_NAME: str,
         AWS_USERNAME: str,
+        file_format: FileFormat = FileFormat.CSV,
+        parquet_compression: str = PARQUET_COMPRESSION,
+        cache: S3ObjectCache | None = None,
+        compression: str | None = None,
+        write_local_copy: bool = False,
     ):
+        self.cache = cache
+        self.compression = compression  # None or "gzip" for CSV exports.
+        self.write_local_copy = write_local_copy  # Also write CSV exports to data_directory.
+        self.file_format = file_format
+        self.parquet_compression = parquet_compression
         self.stock_weight_directory = stock_weight_directory
         self.data_directory = data_directory
         self.AWS_ACCESS_KEY = AWS_ACCESS_KEY
@@ -43,18 +65,198 @@ class S3Connection:
         table_name: str,
         postgresql_connection: "PostgreSQLConnection",
     ):
+        if self.file_format == FileFormat.PARQUET:
+            self.upload_sql_table_parquet(table_name, postgresql_connection)
+            return
+        csv_file_path = Path(self.data_directory, f"{table_name}.csv")
+        s3_file_name = self.get_csv_s3_file_name(table_name)
+        with S3MultipartWriter(
+            self.s3_connection,
+            self.STOCK_DATA_PIPELINE_BUCKET_NAME,
+            s3_file_name,
+            compression=self.compression,
+            side_output_path=csv_file_path if self.write_local_copy else None,
+        ) as writer:  # Stream COPY output straight to S3, without a temporary file.
+            postgresql_connection.copy_sql_table(table_name, writer)
+        if self.cache is not None and self.write_local_copy and self.compression is None:
+            self.cache.put(s3_file_name, writer.etag, "", csv_file_path)
+
+    def get_csv_s3_file_name(self, table_name: str) -> str:
+        return f"{table_name}.csv" + (COMPRESSION_EXTENSIONS[self.compression] if self.compression is not None else "")
+
+    def upload_file_compressed(self, file_path: Path, s3_file_name: str):
+        """Upload a local file through S3MultipartWriter with self.compression."""
+        with open(file_path, "rb") as file, S3MultipartWriter(
+            self.s3_connection, self.STOCK_DATA_PIPELINE_BUCKET_NAME, s3_file_name, compression=self.compression
+        ) as writer:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                writer.write(chunk)
+
+    def append_sql_table_rows(
+        self,
+        table_name: str,
+        postgresql_connection: "PostgreSQLConnection",
+        date: str,
+        full_export: bool = False,
+    ):
+        """Append the rows of table_name on date to the local CSV export and upload it.
+
+        Export the whole table instead if full_export, or if the local export is not the S3 object plus date's rows, see
+        is_csv_export_current, e.g. a stale export from an old checkout or an interrupted run.
+        """
         csv_file_name = f"{table_name}.csv"
         csv_file_path = Path(self.data_directory, csv_file_name)
-        postgresql_connection.save_sql_table_to_csv(table_name, csv_file_path)
-        self.s3_connection.upload_file(
-            csv_file_path,
-            self.STOCK_DATA_PIPELINE_BUCKET_NAME,
-            csv_file_name,
+        if self.file_format == FileFormat.PARQUET:  # Parquet files cannot be appended to.
+            full_export = True
+        if not full_export:
+            full_export = not self.is_csv_export_current(table_name, postgresql_connection, csv_file_path, date)
+        if full_export:
+            self.upload_sql_table(table_name, postgresql_connection)
+            return
+        postgresql_connection.append_sql_rows_to_csv(table_name, csv_file_path, date)
+        if self.compression is not None:
+            self.upload_file_compressed(csv_file_path, self.get_csv_s3_file_name(table_name))
+        else:
+            self.upload_file(csv_file_path, csv_file_name)
+
+    def is_csv_export_current(self, table_name: str, postgresql_connection: "PostgreSQLConnection", csv_file_path: Path, date: str) -> bool:
+        """Check that csv_file_path can be appended with the rows of table_name on date, which were just inserted.
+
+        Its header must match the table, its rows and last date must match the table's rows before date, the watermark of
+        table_name must be date, and it must be the size of the S3 object, unless that is compressed, then the object must exist.
+        """
+        if not csv_file_path.exists():
+            return False
+        with open(csv_file_path, "r", newline="") as file:
+            reader = csv.reader(file)
+            header = next(reader, [])
+            if header != postgresql_connection.get_table_columns(table_name) or "date" not in header:
+                print(f"{csv_file_path} columns do not match {table_name}, export the whole table.")
+                return False
+            date_position = header.index("date")
+            row_count, last_date = 0, None
+            for row in reader:
+                row_count += 1
+                last_date = row[date_position]
+        query = f"SELECT COUNT(*), MAX(date) FROM {table_name} WHERE date < %s"
+        table_row_count, table_last_date = postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE, values=(date,)).fetchone()
+        table_last_date = table_last_date.strftime("%Y-%m-%d") if table_last_date is not None else None
+        watermark = postgresql_connection.watermarks.get_watermark(table_name)
+        if (row_count, last_date) != (table_row_count, table_last_date) or watermark != datetime.datetime.strptime(date, "%Y-%m-%d"):
+            print(
+                f"{csv_file_path} has {row_count} rows until {last_date}, {table_name} has {table_row_count} rows until {table_last_date} "
+                f"before its watermark {watermark}, export the whole table."
+            )
+            return False
+        try:
+            head = self.s3_connection.head_object(Bucket=self.STOCK_DATA_PIPELINE_BUCKET_NAME, Key=self.get_csv_s3_file_name(table_name))
+        except ClientError as error:
+            if error.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                print(f"{self.get_csv_s3_file_name(table_name)} does not exist, export the whole table.")
+                return False
+            raise
+        if self.compression is None and head["ContentLength"] != csv_file_path.stat().st_size:
+            print(f"{csv_file_path} is not the S3 object {self.get_csv_s3_file_name(table_name)}, export the whole table.")
+            return False
+        return True
+
+    @staticmethod
+    def _get_arrow_type(data_type: str, numeric_precision: int | None, numeric_scale: int | None) -> pa.DataType:
+        if data_type == "date":
+            return pa.date32()
+        if data_type == "bigint":
+            return pa.int64()
+        if data_type == "integer":
+            return pa.int32()
+        if data_type == "numeric" and numeric_precision is not None:
+            return pa.decimal128(numeric_precision, numeric_scale or 0)
+        if data_type in ("numeric", "double precision", "real"):
+            return pa.float64()
+        if data_type == "boolean":
+            return pa.bool_()
+        if data_type.startswith("timestamp"):
+            return pa.timestamp("us")
+        return pa.string()
+
+    def get_arrow_schema(self, table_name: str, postgresql_connection: "PostgreSQLConnection") -> pa.Schema:
+        """Build a Parquet schema that keeps the DATE, BIGINT and NUMERIC(p, s) types of table_name."""
+        return pa.schema(
+            [
+                (column_name, self._get_arrow_type(data_type, numeric_precision, numeric_scale))
+                for column_name, data_type, numeric_precision, numeric_scale in postgresql_connection.get_table_column_types(table_name)
+            ]
         )
 
+    def upload_sql_table_parquet(
+        self,
+        table_name: str,
+        postgresql_connection: "PostgreSQLConnection",
+    ):
+        parquet_file_name = f"{table_name}.parquet"
+        parquet_file_path = Path(self.data_directory, parquet_file_name)
+        schema = self.get_arrow_schema(table_name, postgresql_connection)
+        df = pd.read_sql(f"SELECT * FROM {table_name}", con=postgresql_connection.engine, coerce_float=False)  # Keep NUMERIC values as exact Decimals.
+        pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), parquet_file_path, compression=self.parquet_compression)
+        self.upload_file(parquet_file_path, parquet_file_name)
+
+    def upload_data_frame_parquet(self, df: pd.DataFrame, parquet_file_name: str):
+        """Upload a table read from a CSV object as Parquet, with the column types of the SQL tables it is loaded into.
+
+        Price columns, e.g. {ticker}_price and {sector}_calculated_price, become NUMERIC(10, 2). All other columns hold share counts,
+        e.g. {ticker}_shares or a sector's shares outstanding, and become BIGINT. The types do not depend on the values, so a price
+        column with only whole numbers is still NUMERIC(10, 2).
+        """
+        arrays = {"date": pa.array(pd.to_datetime(df.index).date, type=pa.date32())}
+        for column_name in df.columns:
+            column = pd.to_numeric(df[column_name])
+            if column_name.endswith("_price"):
+                arrays[column_name] = pa.array(column.round(2), type=pa.float64(), from_pandas=True).cast(pa.decimal128(10, 2))
+                continue
+            values = column.dropna()
+            if not (values == values.round()).all():
+                raise NameError(f"Share count column {column_name} of {parquet_file_name} has values that are not whole numbers.")
+            arrays[column_name] = pa.array(column.astype("Int64"), type=pa.int64())
+        table = pa.Table.from_arrays(list(arrays.values()), names=list(arrays.keys()))
+        parquet_file_path = Path(self.data_directory, parquet_file_name)
+        pq.write_table(table, parquet_file_path, compression=self.parquet_compression)
+        self.upload_file(parquet_file_path, parquet_file_name)
+
+    def object_exists(self, s3_file_name: str) -> bool:
+        try:
+            self.s3_connection.head_object(Bucket=self.STOCK_DATA_PIPELINE_BUCKET_NAME, Key=s3_file_name)
+        except ClientError as error:
+            if error.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def upload_file(self, file_path: Path, s3_file_name: str):
+        with metrics.timer("s3.upload"):
+            self.s3_connection.upload_file(
+                file_path,
+                self.STOCK_DATA_PIPELINE_BUCKET_NAME,
+                s3_file_name,
+            )
+        metrics.increment("s3.bytes_uploaded", Path(file_path).stat().st_size)
+        if self.cache is not None:  # Cache the uploaded file, so the next run does not download it again.
+            head = self.s3_connection.head_object(Bucket=self.STOCK_DATA_PIPELINE_BUCKET_NAME, Key=s3_file_name)
+            self.cache.put(s3_file_name, head["ETag"], str(head.get("LastModified")), file_path)
+
     def download_file(self, s3_file_name: str, download_file_path: Path):
-        self.s3_connection.download_file(
-            self.STOCK_DATA_PIPELINE_BUCKET_NAME,
-            s3_file_name,
-            Path(self.current_working_directory, download_file_path),
-        )
+        download_file_path = Path(self.current_working_directory, download_file_path)
+        if self.cache is not None:
+            head = self.s3_connection.head_object(Bucket=self.STOCK_DATA_PIPELINE_BUCKET_NAME, Key=s3_file_name)
+            cached_file_path = self.cache.get(s3_file_name, head["ETag"])
+            if cached_file_path is not None:
+                shutil.copyfile(cached_file_path, download_file_path)
+                metrics.increment("s3.bytes_read_from_cache", download_file_path.stat().st_size)
+                return
+        with metrics.timer("s3.download"):
+            self.s3_connection.download_file(
+                self.STOCK_DATA_PIPELINE_BUCKET_NAME,
+                s3_file_name,
+                download_file_path,
+            )
+        metrics.increment("s3.bytes_downloaded", download_file_path.stat().st_size)
+        if self.cache is not None:
+            self.cache.put(s3_file_name, head["ETag"], str(head.get("LastModified")), download_file_path)
@@ -0,0 +1,113 @@
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List
+import zlib
+
+
+from .definitions import S3_MULTIPART_PART_SIZE
+from .instrumentation import metrics
+
+
+COMPRESSION_EXTENSIONS = {"gzip": ".gz"}
+
+
+def get_compressor(compression: str | None):
+    if compression is None:
+        return None
+    if compression == "gzip":
+        return zlib.compressobj(wbits=31)  # wbits=31 writes a gzip header and trailer.
+    raise NameError(f"compression {compression} is not a valid input.")
+
+
+class S3MultipartWriter:
+    """Write-only file object that compresses data and uploads it to S3 in parts, so memory use is bounded by part_size.
+
+    Objects smaller than one part are uploaded with a single put_object. Pass side_output_path to also write the
+    uncompressed data to a local file.
+    """
+
+    def __init__(
+        self,
+        s3_client: Any,
+        bucket_name: str,
+        s3_file_name: str,
+        compression: str | None = None,
+        part_size: int = S3_MULTIPART_PART_SIZE,
+        side_output_path: Path | None = None,
+    ):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.s3_file_name = s3_file_name
+        self.compressor = get_compressor(compression)
+        self.part_size = part_size
+        self.side_output: BinaryIO | None = open(side_output_path, "wb") if side_output_path is not None else None
+        self.buffer = bytearray()
+        self.upload_id: str | None = None
+        self.parts: List[Dict[str, str | int]] = []
+        self.etag: str | None = None
+        self.bytes_written = 0
+        self.bytes_uploaded = 0
+
+    def __enter__(self) -> "S3MultipartWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, data: bytes | str) -> int:
+        if isinstance(data, str):
+            data = data.encode()
+        if self.side_output is not None:
+            self.side_output.write(data)
+        self.bytes_written += len(data)
+        self.buffer += self.compressor.compress(data) if self.compressor is not None else data
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+        return len(data)
+
+    def _upload_part(self) -> None:
+        if self.upload_id is None:
+            self.upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket_name, Key=self.s3_file_name)["UploadId"]
+        part_number = len(self.parts) + 1
+        with metrics.timer("s3.upload"):
+            response = self.s3_client.upload_part(
+                Bucket=self.bucket_name,
+                Key=self.s3_file_name,
+                UploadId=self.upload_id,
+                PartNumber=part_number,
+                Body=bytes(self.buffer),
+            )
+        metrics.increment("s3.bytes_uploaded", len(self.buffer))
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self.bytes_uploaded += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self) -> None:
+        if self.compressor is not None:
+            self.buffer += self.compressor.flush()
+        if self.side_output is not None:
+            self.side_output.close()
+        if self.upload_id is None:
+            with metrics.timer("s3.upload"):
+                self.etag = self.s3_client.put_object(Bucket=self.bucket_name, Key=self.s3_file_name, Body=bytes(self.buffer))["ETag"]
+            self.bytes_uploaded += len(self.buffer)
+            metrics.increment("s3.bytes_uploaded", len(self.buffer))
+        else:
+            if self.buffer:
+                self._upload_part()
+            self.etag = self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.s3_file_name,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )["ETag"]
+        self.buffer.clear()
+
+    def abort(self) -> None:
+        if self.side_output is not None:
+            self.side_output.close()
+        if self.upload_id is not None:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.s3_file_name, UploadId=self.upload_id)
+        self.buffer.clear()
@@ -0,0 +1,190 @@
+import threading
+from typing import TYPE_CHECKING, Dict, List, Set, Tuple
+
+
+from .definitions import SQLOperation
+
+if TYPE_CHECKING:
+    from stock_data_pipeline import PostgreSQLConnection
+
+
+class SchemaManager:
+    """In-memory model of the tables, views, columns and primary keys of the public schema, read from information_schema once.
+
+    create_table, create_view, add_columns and set_primary_key only queue the DDL the model says is missing. apply runs the queue in
+    one transaction, so a run without schema changes sends no DDL. apply with table_names only runs the DDL of those tables, e.g.
+    inside a bulk_load of one table, and leaves the rest of the queue to other loads. DDL applied in a transaction that is rolled
+    back is queued again, so the model and the queue still agree.
+    """
+
+    def __init__(self, postgresql_connection: "PostgreSQLConnection"):
+        self.postgresql_connection = postgresql_connection
+        self.tables: Dict[str, Dict[str, str]] = {}  # Table or view name to column names and data types, in table order.
+        self.views: Set[str] = set()
+        self.primary_keys: Dict[str, List[str]] = {}
+        self.pending_statements: List[Tuple[str, str]] = []  # Table name and DDL statement, in queue order.
+        self.loaded = False
+        self.lock = threading.RLock()
+        self._thread_local = threading.local()  # DDL applied in the calling thread's open transaction.
+
+    def load(self) -> None:
+        query = (
+            "SELECT columns.table_name, columns.column_name, columns.data_type, primary_keys.column_name IS NOT NULL, tables.table_type = 'VIEW' "
+            "FROM information_schema.columns JOIN information_schema.tables "
+            "ON tables.table_schema = columns.table_schema AND tables.table_name = columns.table_name LEFT JOIN ("
+            "SELECT key_column_usage.table_name, key_column_usage.column_name FROM information_schema.table_constraints "
+            "JOIN information_schema.key_column_usage ON key_column_usage.constraint_name = table_constraints.constraint_name "
+            "AND key_column_usage.table_schema = table_constraints.table_schema "
+            "WHERE table_constraints.constraint_type = 'PRIMARY KEY' AND table_constraints.table_schema = 'public'"
+            ") AS primary_keys ON primary_keys.table_name = columns.table_name AND primary_keys.column_name = columns.column_name "
+            "WHERE columns.table_schema = 'public' ORDER BY columns.table_name, columns.ordinal_position"
+        )
+        with self.lock:
+            cursor = self.postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE)
+            self.tables = {}
+            self.views = set()
+            self.primary_keys = {}
+            for table_name, column_name, data_type, is_primary_key, is_view in cursor.fetchall():
+                self.tables.setdefault(table_name, {})[column_name] = data_type
+                if is_primary_key:
+                    self.primary_keys.setdefault(table_name, []).append(column_name)
+                if is_view:
+                    self.views.add(table_name)
+            self.loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if not self.loaded:
+            self.load()
+
+    def invalidate(self) -> None:
+        """Read the schema again on next use, e.g. after DDL that did not go through the queue."""
+        with self.lock:
+            self.loaded = False
+
+    def _get_applied_statements(self) -> List[Tuple[str, str]]:
+        if getattr(self._thread_local, "applied_statements", None) is None:
+            self._thread_local.applied_statements = []
+        return self._thread_local.applied_statements
+
+    def commit(self) -> None:
+        """Forget the DDL applied in the calling thread's transaction, which was committed."""
+        self._get_applied_statements().clear()
+
+    def rollback(self) -> None:
+        """Queue the DDL applied in the calling thread's transaction again, in its order, since it was rolled back."""
+        applied_statements = self._get_applied_statements()
+        with self.lock:
+            self.pending_statements[:0] = applied_statements
+        applied_statements.clear()
+
+    def has_table(self, table_name: str) -> bool:
+        with self.lock:
+            self._ensure_loaded()
+            return table_name in self.tables
+
+    def get_columns(self, table_name: str) -> List[str]:
+        """Get column names of table_name in table order. Empty if the table does not exist."""
+        with self.lock:
+            self._ensure_loaded()
+            return list(self.tables.get(table_name, {}))
+
+    def create_table(self, table_name: str, columns: Dict[str, str], primary_key: List[str] | None = None, partition_by: str | None = None) -> None:
+        """Queue CREATE TABLE if table_name does not exist. columns maps column names to their definitions, e.g. "NUMERIC(10, 2)"."""
+        with self.lock:
+            self._ensure_loaded()
+            if table_name in self.tables:
+                return
+            definitions = [f'"{column_name}" {definition}' for column_name, definition in columns.items()]
+            if primary_key:
+                definitions.append(f"PRIMARY KEY ({', '.join(primary_key)})")
+                self.primary_keys[table_name] = list(primary_key)
+            query = f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(definitions)})"
+            if partition_by is not None:
+                query += f" PARTITION BY {partition_by}"
+            self.pending_statements.append((table_name, query))
+            self.tables[table_name] = dict(columns)
+
+    def create_view(self, view_name: str, columns: List[str], query: str) -> None:
+        """Queue (re)creating view_name as query, unless it is already a view with exactly these columns.
+
+        A table named view_name, e.g. from the layout the view replaces, is dropped first.
+        """
+        with self.lock:
+            self._ensure_loaded()
+            if view_name in self.views and list(self.tables[view_name]) == columns:
+                return
+            self.drop_table(view_name)
+            self.pending_statements.append((view_name, f"CREATE VIEW {view_name} AS {query}"))
+            self.tables[view_name] = {column_name: "" for column_name in columns}
+            self.views.add(view_name)
+
+    def create_partition(self, table_name: str, parent_table_name: str, bounds: str) -> None:
+        """Queue CREATE TABLE ... PARTITION OF parent_table_name if table_name does not exist. bounds is e.g. "FROM ('2024-01-01') TO ('2025-01-01')"."""
+        with self.lock:
+            self._ensure_loaded()
+            if table_name in self.tables:
+                return
+            statement = f"CREATE TABLE IF NOT EXISTS {table_name} PARTITION OF {parent_table_name} FOR VALUES {bounds}"
+            self.pending_statements.append((parent_table_name, statement))  # Applied with the parent table's DDL, e.g. by its bulk_load.
+            self.tables[table_name] = dict(self.tables.get(parent_table_name, {}))
+
+    def add_columns(self, table_name: str, columns: Dict[str, str]) -> List[str]:
+        """Queue one ALTER TABLE adding the columns table_name does not have yet. Return the names of those columns."""
+        with self.lock:
+            self._ensure_loaded()
+            table_columns = self.tables.setdefault(table_name, {})
+            missing_columns = {column_name: definition for column_name, definition in columns.items() if column_name not in table_columns}
+            if missing_columns:
+                add_columns_string = ", ".join(
+                    [f'ADD COLUMN IF NOT EXISTS "{column_name}" {definition}' for column_name, definition in missing_columns.items()]
+                )
+                self.pending_statements.append((table_name, f"ALTER TABLE {table_name} {add_columns_string}"))
+                table_columns.update(missing_columns)
+            return list(missing_columns)
+
+    def set_primary_key(self, table_name: str, primary_key: List[str]) -> None:
+        """Queue ADD PRIMARY KEY if table_name has no primary key."""
+        with self.lock:
+            self._ensure_loaded()
+            if self.primary_keys.get(table_name):
+                return
+            self.pending_statements.append((table_name, f"ALTER TABLE {table_name} ADD PRIMARY KEY ({', '.join(primary_key)})"))
+            self.primary_keys[table_name] = list(primary_key)
+
+    def drop_table(self, table_name: str) -> None:
+        """Queue DROP TABLE, or DROP VIEW if table_name is a view."""
+        with self.lock:
+            self._ensure_loaded()
+            if table_name in self.views:
+                self.pending_statements.append((table_name, f"DROP VIEW IF EXISTS {table_name}"))
+                self.views.discard(table_name)
+            else:
+                self.pending_statements.append((table_name, f"DROP TABLE IF EXISTS {table_name}"))
+            self.tables.pop(table_name, None)
+            self.primary_keys.pop(table_name, None)
+
+    def apply(self, cursor=None, table_names: List[str] | None = None) -> int:
+        """Run the queued DDL in one transaction, or with cursor inside the caller's transaction. Return the number of statements.
+
+        If table_names is given, only the DDL of those tables runs and the rest stays queued.
+        """
+        with self.lock:
+            pending_statements = [
+                (table_name, statement) for table_name, statement in self.pending_statements if table_names is None or table_name in table_names
+            ]
+            if not pending_statements:
+                return 0
+            self.pending_statements = [
+                (table_name, statement) for table_name, statement in self.pending_statements if table_names is not None and table_name not in table_names
+            ]
+        if cursor is None:
+            with self.postgresql_connection.transaction() as cursor:
+                self._execute(cursor, pending_statements)
+        else:
+            self._execute(cursor, pending_statements)
+        return len(pending_statements)
+
+    def _execute(self, cursor, pending_statements: List[Tuple[str, str]]) -> None:
+        self._get_applied_statements().extend(pending_statements)  # Queued again if the transaction is rolled back.
+        for _, statement in pending_statements:
+            cursor.execute(statement)
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List
+from urllib.parse import urlparse
+
+
+from .definitions import (
+    SCRAPER_BURST,
+    SCRAPER_MAX_WORKERS,
+    SCRAPER_REQUESTS_PER_SECOND,
+    SCRAPER_TIMEOUT,
+)
+from .http_client import HttpClient, HttpResponse
+from .instrumentation import metrics
+
+if TYPE_CHECKING:
+    from stock_data_pipeline import Sector
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Each acquire() takes one token, blocking until one is available."""
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0 or capacity < 1:
+            raise NameError(f"TokenBucket requires rate > 0 and capacity >= 1, got rate={rate} capacity={capacity}.")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class HostRateLimiter:
+    """Keep one TokenBucket per host, so requests to different hosts do not throttle each other."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url: str) -> None:
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.capacity)
+            bucket = self.buckets[host]
+        bucket.acquire()
+
+
+class SectorScraper:
+    """Fetch the SSGA shares outstanding page and holdings workbook of every sector concurrently, through one HttpClient.
+
+    After scrape, unchanged_sectors lists the sectors whose page and workbook are both the ones last acknowledged in
+    http_client, i.e. whose holdings were already loaded by an earlier run.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = SCRAPER_MAX_WORKERS,
+        requests_per_second: float = SCRAPER_REQUESTS_PER_SECOND,
+        burst: int = SCRAPER_BURST,
+        timeout: float = SCRAPER_TIMEOUT,
+        http_client: HttpClient | None = None,
+    ):
+        self.max_workers = max_workers
+        self.http_client = http_client or HttpClient(pool_size=max_workers, timeout=timeout)
+        self.rate_limiter = HostRateLimiter(requests_per_second, burst)
+        self.unchanged_sectors: List[str] = []
+
+    def _get(self, url: str) -> HttpResponse:
+        self.rate_limiter.acquire(url)
+        with metrics.timer(f"http.{urlparse(url).netloc}"):  # Rate limiter wait is not included.
+            response = self.http_client.get(url)
+        metrics.increment("http.bytes_downloaded", response.downloaded_bytes)
+        return response
+
+    def _fetch_shares_outstanding(self, sector: "Sector") -> tuple[str | None, bool]:
+        response = self._get(sector.url_shares_outstanding)
+        return sector.parse_shares_outstanding(response.text), response.changed
+
+    def _fetch_holdings_workbook(self, sector: "Sector") -> tuple[None, bool]:
+        response = self._get(sector.url_xlsx)
+        with open(sector.portfolio_holdings_file_path, "wb") as f:  # Write workbook as soon as it arrives, also if not modified.
+            f.write(response.content)
+        return None, response.changed
+
+    def scrape(self, sectors: List["Sector"], shares_outstanding_sectors: List["Sector"] | None = None) -> Dict[str, str | None]:
+        """Scrape sectors, and only the shares outstanding page of shares_outstanding_sectors. Return shares outstanding text keyed by sector symbol."""
+
+        shares_outstanding_texts: Dict[str, str | None] = {}
+        changed_sectors = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for sector in sectors + (shares_outstanding_sectors or []):
+                print(f"Start scraping {sector.sector_symbol} sector info.")
+                futures[executor.submit(self._fetch_shares_outstanding, sector)] = (sector, "shares_outstanding")
+            for sector in sectors:
+                futures[executor.submit(self._fetch_holdings_workbook, sector)] = (sector, "holdings")
+            for future in as_completed(futures):
+                sector, fetch_type = futures[future]
+                result, changed = future.result()
+                if fetch_type == "shares_outstanding":
+                    shares_outstanding_texts[sector.sector_symbol] = result
+                if changed:
+                    changed_sectors.add(sector.sector_symbol)
+                print(f"End scraping {sector.sector_symbol} {fetch_type}{'' if changed else ', unchanged'}.")
+        self.unchanged_sectors = [sector.sector_symbol for sector in sectors if sector.sector_symbol not in changed_sectors]
+        return shares_outstanding_texts
+
+    def acknowledge(self, sector: "Sector") -> None:
+        """Record the sector's fetched page and workbook as loaded, so they count as unchanged until SSGA publishes new ones."""
+        self.http_client.acknowledge(sector.url_shares_outstanding)
+        self.http_client.acknowledge(sector.url_xlsx)
@@ -5,7 +5,9 @@ from typing import List
 
 
 from bs4 import BeautifulSoup
+import numpy as np
 import pandas as pd  # type:ignore
+from psycopg2.extras import execute_values  # type: ignore
 import sqlalchemy
 
 from .definitions import (
@@ -13,15 +15,13 @@ from .definitions import (
     STOCK_WEIGHT_DIRECTORY,
     DataTypes,
     SQLOperation,
-    TickerColumnType,
 )
 from .functions import (
-    convert_sql_data_type_into_string,
-    get_latest_date,
     get_s3_table,
     make_ticker_sql_compatible,
 )
 from stock_data_pipeline import PostgreSQLConnection, S3Connection
+from .holdings_parser import read_holdings_workbook
 from .ticker import Ticker
 
 
@@ -65,49 +65,72 @@ class Sector:
         self.portfolio_csv_link_xpath = """//*[@id="holdings"]/div/div[1]/section/div/div[2]/div[1]/div[2]/a"""
         self.sector_shares_data_types = {"date": DataTypes.DATE}
 
-    def add_missing_columns(
-        self,
-        column_type: TickerColumnType,
-        sql_table_name: str,
-        data_type_string: str,
-        postgresql_connection: PostgreSQLConnection,
-    ):
-        # missing_columns = [f"{new_ticker}_{column_type.value}" for new_ticker in self.new_tickers]
-        for missing_column in self.new_tickers:
-            if column_type.value not in missing_column:
-                missing_column += f"_{column_type.value}"
-            query = f"ALTER TABLE {sql_table_name} ADD COLUMN IF NOT EXISTS {missing_column} {data_type_string} NULL"
-            postgresql_connection.execute_query(query, operation=SQLOperation.COMMIT)
-
     def add_ticker(self, ticker_object: Ticker):
         if ticker_object.ticker_symbol not in self.tickers:
             self.tickers.append(ticker_object)
             self.sector_shares_data_types.update({ticker_object.ticker_symbol: DataTypes.BIGINT})
 
-    def calculate_sector_price(self):
-        update_query = f"UPDATE {self.sector_history_table_name}"
-        set_query = f"SET {self.sector_calculated_price_column_name} = "
-        calculation_queries = []
-        for ticker in self.tickers:
-            calculation_queries.append(
-                f"{self.sector_history_table_name}.{ticker.price_column_name} * {self.sector_shares_table_name}.{ticker.shares_column_name}"
-            )
-        calculation_query = f"""{" ( " + " + ".join(calculation_queries) + " ) "} / {SECTOR_SHARES_OUTSTANDING}.{self.sector_symbol}"""
-        from_query = f"FROM {SECTOR_SHARES_OUTSTANDING}"
-        join_query = f"JOIN {self.sector_shares_table_name} on {self.sector_shares_table_name}.date = {SECTOR_SHARES_OUTSTANDING}.date"
-        where_query = f"WHERE {self.sector_shares_table_name}.date = {self.sector_history_table_name}.date AND {self.sector_history_table_name}.{self.sector_calculated_price_column_name} IS NULL"
-
-        query = " ".join(
-            [
-                update_query,
-                set_query,
-                calculation_query,
-                from_query,
-                join_query,
-                where_query,
-            ]
+    def _get_sector_price_matrices(
+        self, date: str | None = None
+    ) -> tuple[pd.DatetimeIndex, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Load prices and shares as aligned (date x ticker) arrays, plus shares outstanding and current calculated price per date.
+
+        Dates are those present in the sector history, sector shares and shares outstanding tables. If date is given, only that date.
+        """
+        where_query, values = ("WHERE date = %s", (date,)) if date is not None else ("", None)
+        price_columns = ", ".join([ticker.price_column_name for ticker in self.tickers])
+        shares_columns = ", ".join([ticker.shares_column_name for ticker in self.tickers])
+        prices = self.postgresql_connection.read_query(
+            f"SELECT date, {price_columns}, {self.sector_calculated_price_column_name} FROM {self.sector_history_table_name} {where_query}",
+            index_col="date",
+            parse_dates=["date"],
+            values=values,
         )
-        self.postgresql_connection.execute_query(query, SQLOperation.COMMIT)
+        shares = self.postgresql_connection.read_query(
+            f"SELECT date, {shares_columns} FROM {self.sector_shares_table_name} {where_query}",
+            index_col="date",
+            parse_dates=["date"],
+            values=values,
+        )
+        shares_outstanding = self.postgresql_connection.read_query(
+            f"SELECT date, {self.sector_symbol} FROM {SECTOR_SHARES_OUTSTANDING} {where_query}",
+            index_col="date",
+            parse_dates=["date"],
+            values=values,
+        )
+        dates = prices.index.intersection(shares.index).intersection(shares_outstanding.index).sort_values()
+        price_matrix = prices.loc[dates, [ticker.price_column_name for ticker in self.tickers]].to_numpy(dtype=float)
+        shares_matrix = shares.loc[dates, [ticker.shares_column_name for ticker in self.tickers]].to_numpy(dtype=float)
+        shares_outstanding_vector = shares_outstanding.loc[dates, self.sector_symbol].to_numpy(dtype=float)
+        calculated_prices = prices.loc[dates, self.sector_calculated_price_column_name].to_numpy(dtype=float)
+        return pd.DatetimeIndex(dates), price_matrix, shares_matrix, shares_outstanding_vector, calculated_prices
+
+    def calculate_sector_price_vectorized(self, date: str | None = None, overwrite: bool = False) -> pd.Series:
+        """Calculate sector price for every date, or only date if given, with NumPy and write the results back in bulk.
+
+        Only rows without a calculated price are written, unless overwrite. A missing price or share count gives no price.
+        Return the calculated prices by date.
+        """
+
+        dates, price_matrix, shares_matrix, shares_outstanding_vector, calculated_prices = self._get_sector_price_matrices(date)
+        sector_prices = pd.Series(
+            np.einsum("ij,ij->i", price_matrix, shares_matrix) / shares_outstanding_vector,  # Row-wise dot product of prices and shares.
+            index=dates,
+        ).round(2)
+        write_mask = np.isfinite(sector_prices.to_numpy())
+        if not overwrite:
+            write_mask &= np.isnan(calculated_prices)
+        rows = [(date.strftime("%Y-%m-%d"), float(sector_price)) for date, sector_price in sector_prices[write_mask].items()]
+        if rows:
+            with self.postgresql_connection.transaction() as cursor:
+                execute_values(
+                    cursor,
+                    f"UPDATE {self.sector_history_table_name} SET {self.sector_calculated_price_column_name} = calculated.price "
+                    f"FROM (VALUES %s) AS calculated (date, price) WHERE {self.sector_history_table_name}.date = calculated.date::DATE",
+                    rows,
+                    page_size=len(rows),  # One UPDATE statement for all rows.
+                )
+        return sector_prices
 
     def create_sector_history_table(self, todays_date):
         self.sector_history_df = get_s3_table(
@@ -121,68 +144,88 @@ class Sector:
             if old_ticker_price in self.sector_history_df.columns:
                 self.sector_history_df.drop(labels=old_ticker_price, axis=1, inplace=True)
         sector_history_dtypes = {"date": sqlalchemy.DATE}
-        sector_history_dtypes_strings = {
-            "date": DataTypes.DATE,
-        }
         sector_history_dtypes.update({column: sqlalchemy.types.Numeric(10, 2) for column in self.sector_history_df.columns})
-        sector_history_dtypes_strings.update({column: DataTypes.NUMERIC_10_2 for column in self.sector_history_df.columns})
-        sector_history_dtypes_strings = convert_sql_data_type_into_string(sector_history_dtypes_strings)
-        query = f"DROP TABLE IF EXISTS {make_ticker_sql_compatible(self.sector_history_table_name)}"
-        self.postgresql_connection.execute_query(query, operation=SQLOperation.COMMIT)
-        query = f"CREATE TABLE IF NOT EXISTS {make_ticker_sql_compatible(self.sector_history_table_name)} ({sector_history_dtypes_strings})"
-        self.postgresql_connection.execute_query(query, operation=SQLOperation.COMMIT)
 
         self.sector_history_df.loc[todays_date, :] = None
         for ticker in self.tickers:
             self.sector_history_df.loc[todays_date, f"{ticker.ticker_symbol}_price"] = ticker.price  # TODO: Convert numpy float to float
-        self.sector_history_df.to_sql(
+        self.postgresql_connection.bulk_load(
+            self.sector_history_df,
             make_ticker_sql_compatible(self.sector_history_table_name),
-            con=self.postgresql_connection.engine,
+            data_types=sector_history_dtypes,
             if_exists="replace",
-            index=True,
-            index_label="date",
-            dtype=sector_history_dtypes,
         )
 
-        self.calculate_sector_price()
-        self.sector_history_df = pd.read_sql(self.sector_history_table_name, con=self.postgresql_connection.engine).set_index("date").sort_index()
+        self.calculate_sector_price_vectorized()
+        self._read_sector_history_table()
         self.s3_connection.upload_sql_table(
             self.sector_history_table_name,
             postgresql_connection=self.postgresql_connection,
         )
 
-    def create_sector_shares_dataframe(self, todays_date: datetime.datetime) -> pd.DataFrame:
-        df_sector_shares = pd.read_excel(self.portfolio_holdings_file_path, skiprows=4)[["Ticker", "Weight", "Shares Held"]]
-        df_sector_shares.columns = [column.lower().replace(" ", "_") for column in df_sector_shares.columns]
-        df_sector_shares = df_sector_shares[df_sector_shares["ticker"] != "-"]  # TODO: Add note as to why this is removed
-        df_sector_shares = df_sector_shares[df_sector_shares["ticker"].notna()]  # TODO: Add note as to why this is removed
-        print(self.sector_symbol, list(df_sector_shares["ticker"]))
-        df_sector_shares = df_sector_shares[~df_sector_shares["ticker"].str.contains("6")]
-        print(self.sector_symbol, list(df_sector_shares["ticker"]))
-        df_sector_shares["ticker"] = [make_ticker_sql_compatible(ticker) for ticker in df_sector_shares["ticker"]]
-        df_sector_shares = df_sector_shares.sort_values(by="ticker")
-
-        df_sector_shares["weight"] = df_sector_shares["weight"] / 100
-        df_sector_shares["date"] = todays_date.strftime("%Y-%m-%d")
-        df_sector_shares = pd.pivot(df_sector_shares, index="date", columns="ticker", values="shares_held")
-        return df_sector_shares
+    def update_sector_history_table(self, todays_date: str):
+        """Insert todays_date's ticker prices into the existing sector history table and calculate only that date's sector price.
+
+        The table is not read back, the charts read it once with Sectors.read_sector_history_tables. Falls back to
+        create_sector_history_table, a full rebuild from S3, if the table does not exist yet, e.g. on a new database.
+        """
+
+        table_columns = self.postgresql_connection.get_table_columns(self.sector_history_table_name)
+        if not table_columns:
+            print(f"{self.sector_history_table_name} does not exist, rebuild from S3.")
+            self.create_sector_history_table(todays_date)
+            return
+        watermark = self.postgresql_connection.watermarks.get_watermark(self.sector_history_table_name)
+        if watermark is not None and watermark >= datetime.datetime.strptime(todays_date, "%Y-%m-%d"):
+            print(f"{self.sector_history_table_name} already has {todays_date}.")
+            return
+
+        ticker_prices = {ticker.price_column_name: ticker.price for ticker in self.tickers}
+        missing_columns = [column for column in ticker_prices if column not in table_columns]
+        self.postgresql_connection.schema.add_columns(
+            self.sector_history_table_name, {missing_column: f"{DataTypes.NUMERIC_10_2} NULL" for missing_column in missing_columns}
+        )
+        with self.postgresql_connection.transaction() as cursor:
+            self.postgresql_connection.schema.apply(
+                cursor, table_names=[self.sector_history_table_name, self.postgresql_connection.watermarks.table_name]
+            )
+            columns_string = ", ".join(["date"] + list(ticker_prices.keys()))
+            values_string = ", ".join(["%s"] * (len(ticker_prices) + 1))
+            cursor.execute(
+                f"INSERT INTO {self.sector_history_table_name} ({columns_string}) VALUES ({values_string})",
+                [todays_date] + list(ticker_prices.values()),
+            )
+            self.postgresql_connection.watermarks.update(cursor, self.sector_history_table_name, {"": todays_date})
+        self.calculate_sector_price_vectorized(date=todays_date)
+        self.s3_connection.append_sql_table_rows(
+            self.sector_history_table_name,
+            postgresql_connection=self.postgresql_connection,
+            date=todays_date,
+            full_export=bool(missing_columns),
+        )
 
-    def get_new_tickers(self, original_tickers: List[str], latest_tickers: List[str]):
-        self.new_tickers = [column for column in latest_tickers if column not in original_tickers]  # TODO: add missing columns to sql_table
+    def _read_sector_history_table(self):
+        """Read sector history table into sector_history_df, which is used to plot the sector prices."""
+        self.sector_history_df = pd.read_sql(self.sector_history_table_name, con=self.postgresql_connection.engine).set_index("date").sort_index()
 
-    def get_s3_table(self):
-        self.s3_connection.download_file(
-            self.sector_shares_s3_file_name,
-            download_file_path=self.sector_shares_download_file_path,
+    def create_sector_shares_dataframe(self, todays_date: datetime.datetime, holdings: pd.DataFrame | None = None) -> pd.DataFrame:
+        """Create a one-row DataFrame of shares held per ticker on todays_date.
+
+        holdings is the sector's parsed workbook from HoldingsParser.parse. If None, the workbook is parsed here.
+        """
+        if holdings is None:
+            holdings = read_holdings_workbook(self.portfolio_holdings_file_path)
+        print(self.sector_symbol, list(holdings["ticker"]))
+        if holdings["ticker"].duplicated().any():
+            raise NameError(f"{self.sector_symbol} holdings have duplicate tickers {list(holdings['ticker'][holdings['ticker'].duplicated()])}.")
+        return pd.DataFrame(
+            [holdings["shares_held"].to_numpy()],
+            index=pd.Index([todays_date.strftime("%Y-%m-%d")], name="date"),
+            columns=pd.Index(holdings["ticker"].to_numpy(), name="ticker"),
         )
-        if self.sector_shares_download_file_path.exists():
-            self.sector_shares_df = pd.read_csv(self.sector_shares_download_file_path)
-            self.sector_shares_df.index = pd.to_datetime(self.sector_shares_df["date"]).dt.strftime("%Y-%m-%d")
-            self.sector_shares_df.index.name = None
-            self.sector_shares_df.drop(labels="date", inplace=True, axis=1)
-
-    def get_s3_table_latest_date(self) -> pd.DatetimeIndex | None:
-        return get_latest_date(self.sector_shares_df, date_format="%Y-%m-%d")
+
+    def get_new_tickers(self, original_tickers: List[str], latest_tickers: List[str]):
+        self.new_tickers = [column for column in latest_tickers if column not in original_tickers]  # TODO: add missing columns to sql_table
 
     def parse_shares_outstanding(self, html: str):
         soup = BeautifulSoup(html, "html.parser")
@@ -0,0 +1,133 @@
+import datetime
+from typing import Dict, List
+
+
+import pandas as pd  # type: ignore
+import sqlalchemy
+
+
+from .definitions import SECTOR_HOLDINGS, SQLOperation
+from .instrumentation import metrics
+from .postgresql_connection import PostgreSQLConnection
+
+
+sector_holdings_dtypes = {
+    "sector": sqlalchemy.types.Text,
+    "date": sqlalchemy.DATE,
+    "ticker": sqlalchemy.types.Text,
+    "shares": sqlalchemy.types.BigInteger,
+    "weight": sqlalchemy.types.Numeric(12, 8),
+}
+
+
+class SectorHoldingsTable:
+    """Long-format sector_holdings(sector, date, ticker, shares, weight) table, with a wide {sector}_shares view per sector.
+
+    A change of sector membership only inserts rows. Each view keeps the date, {ticker}_shares layout that the sector
+    price calculation and the S3 exports use, and is only redefined when the sector's tickers change.
+    """
+
+    def __init__(self, postgresql_connection: PostgreSQLConnection, table_name: str = SECTOR_HOLDINGS):
+        self.postgresql_connection = postgresql_connection
+        self.table_name = table_name
+
+    def create_table(self) -> None:
+        # The primary key's index starts with (sector, date), so it also serves the per-sector, per-date lookups.
+        self.postgresql_connection.schema.create_table(
+            self.table_name,
+            {
+                "sector": "TEXT NOT NULL",
+                "date": "DATE NOT NULL",
+                "ticker": "TEXT NOT NULL",
+                "shares": "BIGINT",
+                "weight": "NUMERIC(12, 8)",
+            },
+            primary_key=["sector", "date", "ticker"],
+        )
+        self.postgresql_connection.schema.apply()
+
+    def get_latest_dates(self) -> Dict[str, datetime.datetime]:
+        """Get most recent holdings date of every sector from pipeline_watermarks in one query."""
+        return {
+            sector: watermark
+            for (table_name, sector), watermark in self.postgresql_connection.watermarks.get_watermarks().items()
+            if table_name == self.table_name
+        }
+
+    def get_tickers(self, sector_symbol: str, before_date: datetime.datetime | None = None) -> List[str]:
+        """Get the tickers held by sector_symbol on its most recent date, or its most recent date before before_date."""
+        query = (
+            f"SELECT ticker FROM {self.table_name} WHERE sector = %s "
+            f"AND date = (SELECT MAX(date) FROM {self.table_name} WHERE sector = %s AND date < COALESCE(%s, 'infinity'::DATE)) ORDER BY ticker"
+        )
+        cursor = self.postgresql_connection.execute_query(
+            query, operation=SQLOperation.EXECUTE, values=(sector_symbol, sector_symbol, before_date)
+        )
+        return [ticker for (ticker,) in cursor.fetchall()]
+
+    def get_latest_holdings(self, sector_symbols: List[str]) -> pd.DataFrame:
+        """Get the (sector, ticker, shares) rows of every sector in sector_symbols on its most recent date, in one query."""
+        query = (
+            f"SELECT sector, ticker, shares FROM {self.table_name} WHERE (sector, date) IN "
+            f"(SELECT sector, MAX(date) FROM {self.table_name} WHERE sector = ANY(%s) GROUP BY sector) ORDER BY sector, ticker"
+        )
+        cursor = self.postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE, values=(sector_symbols,))
+        return pd.DataFrame(cursor.fetchall(), columns=["sector", "ticker", "shares"])
+
+    def append(self, sector_symbol: str, date: datetime.datetime, holdings: pd.DataFrame) -> None:
+        """Append one date of holdings, a (ticker, weight, shares_held) DataFrame from HoldingsParser."""
+        sector_holdings = pd.DataFrame(
+            {
+                "sector": sector_symbol,
+                "date": date.strftime("%Y-%m-%d"),
+                "ticker": holdings["ticker"].to_numpy(),
+                "shares": holdings["shares_held"].to_numpy(),
+                "weight": holdings["weight"].to_numpy(),
+            }
+        )
+        self._bulk_load(sector_holdings)
+
+    def carry_forward(self, sector_symbol: str, date: datetime.datetime) -> int:
+        """Copy the sector's most recent holdings before date to date in SQL, e.g. if its workbook is unchanged. Return rows inserted."""
+        query = (
+            f"INSERT INTO {self.table_name} (sector, date, ticker, shares, weight) "
+            f"SELECT sector, %s::DATE, ticker, shares, weight FROM {self.table_name} WHERE sector = %s "
+            f"AND date = (SELECT MAX(date) FROM {self.table_name} WHERE sector = %s AND date < %s::DATE) ON CONFLICT DO NOTHING"
+        )
+        date_string = date.strftime("%Y-%m-%d")
+        with self.postgresql_connection.transaction() as cursor:
+            cursor.execute(query, (date_string, sector_symbol, sector_symbol, date_string))
+            rows_written = cursor.rowcount
+            if rows_written > 0:
+                self.postgresql_connection.watermarks.update(cursor, self.table_name, {sector_symbol: date_string})
+        metrics.increment("postgresql.rows_written", rows_written)
+        return rows_written
+
+    def append_wide(self, sector_symbol: str, sector_shares: pd.DataFrame) -> None:
+        """Append a wide {ticker}_shares DataFrame indexed by date, e.g. an S3 export of the {sector}_shares table. weight is NULL."""
+        sector_holdings = sector_shares.rename_axis(index="date").melt(ignore_index=False, var_name="ticker", value_name="shares").reset_index()
+        sector_holdings = sector_holdings[sector_holdings["shares"].notna()]
+        sector_holdings["ticker"] = sector_holdings["ticker"].str.removesuffix("_shares")
+        sector_holdings.insert(0, "sector", sector_symbol)
+        sector_holdings["weight"] = None
+        self._bulk_load(sector_holdings)
+
+    def _bulk_load(self, sector_holdings: pd.DataFrame) -> None:
+        if sector_holdings.empty:
+            return
+        self.postgresql_connection.bulk_load(
+            sector_holdings,
+            self.table_name,
+            data_types=sector_holdings_dtypes,
+            index=False,
+            ticker_column="sector",  # Watermark per sector.
+        )
+
+    def create_wide_view(self, sector_symbol: str, view_name: str, tickers: List[str]) -> bool:
+        """Create or redefine view_name as date plus one {ticker}_shares column per ticker. Return True if DDL was needed."""
+        tickers = sorted(tickers)
+        columns_string = ", ".join(["date"] + [f"MAX(shares) FILTER (WHERE ticker = '{ticker}') AS {ticker}_shares" for ticker in tickers])
+        query = f"SELECT {columns_string} FROM {self.table_name} WHERE sector = '{sector_symbol}' GROUP BY date ORDER BY date"
+        schema = self.postgresql_connection.schema
+        schema.create_view(view_name, ["date"] + [f"{ticker}_shares" for ticker in tickers], query)
+        return schema.apply() > 0
@@ -0,0 +1,173 @@
+"""Sector prices of intraday bars. Only intraday uses SectorIndexEngine.
+
+The holdings of an engine are fixed for all its dates, while the daily sector history has holdings per date, so
+Sector.calculate_sector_price_vectorized calculates the daily sector history. Both give the same price for one date's holdings.
+"""
+
+from typing import List
+
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+
+class SectorIndexEngine:
+    """Sector prices of many dates or bars from a dense ticker x date price array and a sparse sector x ticker holdings matrix.
+
+    Holdings are kept in CSR form, indptr, indices and shares, built with NumPy since SciPy is not a dependency, and again by
+    ticker, so the sectors holding a ticker are found without a scan. Each date's sector values, the sum of price times shares
+    held, are kept too, so update_prices with k changed prices costs O(k) per sector holding them, and a new date copies the
+    previous date's values and only applies the prices that changed. Sector prices divide the values by shares outstanding.
+    A missing price gives no sector price, like Sector.calculate_sector_price_vectorized.
+    """
+
+    def __init__(self, tickers: List[str], sector_symbols: List[str], holdings: pd.DataFrame, shares_outstanding: pd.Series):
+        self.tickers = list(tickers)
+        self.sector_symbols = list(sector_symbols)
+        self.ticker_positions = {ticker: position for position, ticker in enumerate(self.tickers)}
+        self.dates = np.empty(0, dtype="datetime64[ns]")
+        self.prices = np.empty((len(self.tickers), 0))  # Ticker x date. Columns beyond date_count are spare capacity.
+        self.values = np.empty((len(self.sector_symbols), 0))  # Sector x date sum of price times shares held.
+        self.date_count = 0
+        self.set_holdings(holdings, shares_outstanding)
+
+    def set_holdings(self, holdings: pd.DataFrame, shares_outstanding: pd.Series) -> None:
+        """Set the (sector, ticker, shares) holdings and the shares outstanding of every sector, and recalculate all dates."""
+        sector_positions = {sector_symbol: position for position, sector_symbol in enumerate(self.sector_symbols)}
+        holdings = holdings[holdings["sector"].isin(sector_positions) & holdings["ticker"].isin(self.ticker_positions)]
+        holdings = holdings[holdings["shares"].fillna(0) != 0]
+        rows = holdings["sector"].map(sector_positions).to_numpy(dtype=np.int64)
+        columns = holdings["ticker"].map(self.ticker_positions).to_numpy(dtype=np.int64)
+        shares = holdings["shares"].to_numpy(dtype=float)
+        order = np.lexsort((columns, rows))
+        self.indices, self.shares = columns[order], shares[order]
+        self.indptr = np.searchsorted(rows[order], np.arange(len(self.sector_symbols) + 1))
+        self.entry_sectors = rows[order]  # Sector of each stored entry, so entries can be used without indptr.
+        self.ticker_entries = np.argsort(self.indices, kind="stable")  # Entries sorted by ticker.
+        self.ticker_indptr = np.searchsorted(self.indices[self.ticker_entries], np.arange(len(self.tickers) + 1))
+        self.shares_outstanding = shares_outstanding.reindex(self.sector_symbols).to_numpy(dtype=float)
+        if self.date_count:
+            self.values[:, : self.date_count] = self._multiply(self.prices[:, : self.date_count])
+
+    def _multiply(self, price_matrix: np.ndarray) -> np.ndarray:
+        """Multiply the holdings matrix with a ticker x date price matrix. One pass over the stored entries."""
+        weighted_prices = self.shares[:, np.newaxis] * price_matrix[self.indices]
+        values = np.zeros((len(self.sector_symbols), price_matrix.shape[1]))
+        np.add.at(values, self.entry_sectors, weighted_prices)  # NaN prices give NaN values, an empty sector gives 0.
+        return values
+
+    def _get_entries(self, ticker_positions: np.ndarray) -> np.ndarray:
+        """Get the stored entries of the tickers at ticker_positions, in ticker order, without a Python loop."""
+        starts = self.ticker_indptr[ticker_positions]
+        counts = self.ticker_indptr[ticker_positions + 1] - starts
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return self.ticker_entries[np.repeat(starts, counts) + offsets]
+
+    def _reserve(self, date_count: int) -> None:
+        if date_count <= self.prices.shape[1]:
+            return
+        capacity = max(date_count, 2 * self.prices.shape[1], 16)  # Doubling keeps appending one bar at a time amortized O(1).
+        prices = np.full((len(self.tickers), capacity), np.nan)
+        values = np.full((len(self.sector_symbols), capacity), np.nan)
+        prices[:, : self.date_count] = self.prices[:, : self.date_count]
+        values[:, : self.date_count] = self.values[:, : self.date_count]
+        dates = np.empty(capacity, dtype="datetime64[ns]")
+        dates[: self.date_count] = self.dates[: self.date_count]
+        self.prices, self.values, self.dates = prices, values, dates
+
+    def _apply_changes(self, date_position: int, ticker_positions: np.ndarray, new_prices: np.ndarray) -> None:
+        old_prices = self.prices[ticker_positions, date_position]
+        self.prices[ticker_positions, date_position] = new_prices
+        entries = self._get_entries(ticker_positions)
+        entry_ticker_count = np.diff(self.ticker_indptr)[ticker_positions]
+        old_entry_prices, new_entry_prices = np.repeat(old_prices, entry_ticker_count), np.repeat(new_prices, entry_ticker_count)
+        # A NaN cannot be subtracted out, so sectors with a NaN old or new price are recalculated from their entries.
+        recalculate = np.isnan(old_entry_prices) | np.isnan(new_entry_prices)
+        np.add.at(
+            self.values[:, date_position],
+            self.entry_sectors[entries[~recalculate]],
+            self.shares[entries[~recalculate]] * (new_entry_prices[~recalculate] - old_entry_prices[~recalculate]),
+        )
+        for sector_position in np.unique(self.entry_sectors[entries[recalculate]]):
+            sector_entries = slice(self.indptr[sector_position], self.indptr[sector_position + 1])
+            sector_prices = self.prices[self.indices[sector_entries], date_position]
+            self.values[sector_position, date_position] = self.shares[sector_entries] @ sector_prices
+
+    def get_date_position(self, date) -> int:
+        date = np.datetime64(pd.Timestamp(date), "ns")
+        position = int(np.searchsorted(self.dates[: self.date_count], date))
+        if position == self.date_count or self.dates[position] != date:
+            raise NameError(f"{date} is not a date of the engine.")
+        return position
+
+    def update_prices(self, date, prices: pd.Series) -> None:
+        """Set the prices of tickers on an existing date, keyed by ticker. Only the sectors holding a changed ticker are updated."""
+        date_position = self.get_date_position(date)
+        known_prices = [(self.ticker_positions[ticker], price) for ticker, price in prices.items() if ticker in self.ticker_positions]
+        ticker_positions = np.array([position for position, _ in known_prices], dtype=np.int64)
+        new_prices = np.array([price for _, price in known_prices], dtype=float)
+        old_prices = self.prices[ticker_positions, date_position]
+        changed = ~((old_prices == new_prices) | (np.isnan(old_prices) & np.isnan(new_prices)))
+        if changed.any():
+            self._apply_changes(date_position, ticker_positions[changed], new_prices[changed])
+
+    def append_prices(self, prices: pd.DataFrame) -> None:
+        """Append a date x ticker DataFrame of prices for dates after the latest one. Tickers not in prices keep their previous price.
+
+        Each date starts from the previous date's prices and values, so only the tickers whose price changed are applied.
+        """
+        prices = prices.reindex(columns=self.tickers)
+        dates = pd.DatetimeIndex(prices.index).to_numpy(dtype="datetime64[ns]")
+        after_latest_date = self.date_count == 0 or len(dates) == 0 or dates[0] > self.dates[self.date_count - 1]
+        if not after_latest_date or np.any(np.diff(dates) <= np.timedelta64(0)):
+            raise NameError("Appended dates must be increasing and after the latest date of the engine.")
+        self._reserve(self.date_count + len(dates))
+        price_matrix = prices.to_numpy(dtype=float)
+        for date, date_prices in zip(dates, price_matrix):
+            position = self.date_count
+            self.dates[position] = date
+            self.date_count += 1
+            if position == 0:
+                self.prices[:, 0] = date_prices
+                self.values[:, :1] = self._multiply(self.prices[:, :1])
+                continue
+            self.prices[:, position] = self.prices[:, position - 1]
+            self.values[:, position] = self.values[:, position - 1]
+            previous_prices = self.prices[:, position]
+            changed = ~np.isnan(date_prices) & (date_prices != previous_prices)
+            if changed.any():
+                self._apply_changes(position, np.flatnonzero(changed), date_prices[changed])
+
+    def _get_date_slice(self, start_date=None, end_date=None) -> slice:
+        dates = self.dates[: self.date_count]
+        start = 0 if start_date is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date), "ns")))
+        end = self.date_count if end_date is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date), "ns"), side="right"))
+        return slice(start, end)
+
+    def get_sector_prices(self, start_date=None, end_date=None) -> pd.DataFrame:
+        """Get a date x sector DataFrame of sector prices from start_date to end_date, both included, rounded to cents."""
+        dates = self._get_date_slice(start_date, end_date)
+        sector_prices = self.values[:, dates] / self.shares_outstanding[:, np.newaxis]
+        return pd.DataFrame(sector_prices.T, index=pd.DatetimeIndex(self.dates[dates]), columns=self.sector_symbols).round(2)
+
+    def calculate(self, start_date=None, end_date=None) -> pd.DataFrame:
+        """Recalculate sector prices from start_date to end_date from the price array with one sparse matrix product."""
+        dates = self._get_date_slice(start_date, end_date)
+        self.values[:, dates] = self._multiply(self.prices[:, dates])
+        return self.get_sector_prices(start_date, end_date)
+
+    def get_contributions(self, start_date, end_date) -> pd.DataFrame:
+        """Get each holding's contribution to its sector's price move from start_date to end_date, as (sector, ticker, contribution).
+
+        Contributions of a sector add up to its move, shares held times the ticker's price change over shares outstanding.
+        """
+        start_position, end_position = self.get_date_position(start_date), self.get_date_position(end_date)
+        price_changes = self.prices[self.indices, end_position] - self.prices[self.indices, start_position]
+        contributions = self.shares * price_changes / self.shares_outstanding[self.entry_sectors]
+        return pd.DataFrame(
+            {
+                "sector": np.array(self.sector_symbols, dtype=object)[self.entry_sectors],
+                "ticker": np.array(self.tickers, dtype=object)[self.indices],
+                "contribution": contributions,
+            }
+        )
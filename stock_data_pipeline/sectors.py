@@ -3,20 +3,23 @@ from re import sub
 from pathlib import Path
 from plotly.graph_objects import Figure, Scatter
 from typing import Dict, List
+import numpy as np
 import pandas as pd  # type: ignore
 import sqlalchemy
 
 
+from .chart_renderer import ChartRenderer
 from .definitions import SECTOR_SHARES_OUTSTANDING, DataTypes
 from .functions import (
     get_s3_table,
-    get_sql_table_latest_date,
     get_todays_date,
     initialize_table,
     set_table_primary_key,
 )
 from stock_data_pipeline import PostgreSQLConnection, S3Connection, create_directory
+from .relative_performance import calculate_relative_performance, create_sector_price_frame
 from .sector import Sector
+from .trading_calendar import get_trading_calendar
 
 
 sector_color_map = {
@@ -35,13 +38,18 @@ sector_color_map = {
 
 
 class Sectors:
+    """Sectors listed in file_path. If sector_symbols is given, sectors only holds those, and all_sectors still holds every sector,
+    whose shares outstanding make up the sector_shares_outstanding table.
+    """
+
     def __init__(
         self,
         file_path: Path,
         postgresql_connection: PostgreSQLConnection,
         s3_connection: S3Connection,
+        sector_symbols: List[str] | None = None,
     ):
-        self.sectors: List[Sector] = []
+        self.all_sectors: List[Sector] = []
         self.shares_outstanding: Dict[str, List[str | int]] = {
             "sector": [],
             "shares_outstanding": [],
@@ -67,36 +75,50 @@ class Sectors:
                     s3_connection=s3_connection,
                     sector_shares_directory=self.sector_shares_directory,
                 )
-                self.sectors.append(sector)
+                self.all_sectors.append(sector)
                 self.sector_shares_outstanding_dtypes.update({sector.sector_symbol: sqlalchemy.types.BigInteger})
                 self.sector_shares_outstanding_dtypes_strings.update({sector.sector_symbol: DataTypes.BIGINT})
+        unknown_sector_symbols = set(sector_symbols or []) - {sector.sector_symbol for sector in self.all_sectors}
+        if unknown_sector_symbols:
+            raise NameError(f"Sectors {sorted(unknown_sector_symbols)} are not in {file_path}.")
+        self.sectors: List[Sector] = [sector for sector in self.all_sectors if sector_symbols is None or sector.sector_symbol in sector_symbols]
 
     def append_shares_outstanding_dict(self, sector: Sector, shares_outstanding: int):
         self.shares_outstanding["sector"].append(sector.sector_symbol)
         self.shares_outstanding["shares_outstanding"].append(shares_outstanding)
 
     def create_shares_outstanding_table(self):
-        df_shares_outstanding = get_s3_table(
-            self.s3_connection,
-            s3_file_name=self.sector_shares_outstanding_s3_file_name,
-            download_file_path=self.sector_shares_outstanding_s3_download_path,
-        )
-        initialize_table(
-            table_name=SECTOR_SHARES_OUTSTANDING,
-            data_types=self.sector_shares_outstanding_dtypes,
-            data_types_strings=self.sector_shares_outstanding_dtypes_strings,
-            postgresql_connection=self.postgresql_connection,
-            data_frame=df_shares_outstanding,
-        )
-        # TODO: initilalize sql table (create table if exists ...)
-        # TODO: create a row of shares outstanding and add row to existing sql tables
+        """Load sector_shares_outstanding from S3 into a new database, then append today's shares outstanding.
+
+        If the table already has rows, e.g. from an earlier run on the same database, only the row is appended, so no DDL runs
+        unless a sector was added.
+        """
+        latest_date = self.postgresql_connection.watermarks.get_watermark(SECTOR_SHARES_OUTSTANDING)
+        if latest_date is None:
+            df_shares_outstanding = get_s3_table(
+                self.s3_connection,
+                s3_file_name=self.sector_shares_outstanding_s3_file_name,
+                download_file_path=self.sector_shares_outstanding_s3_download_path,
+            )
+            initialize_table(
+                table_name=SECTOR_SHARES_OUTSTANDING,
+                data_types=self.sector_shares_outstanding_dtypes,
+                data_types_strings=self.sector_shares_outstanding_dtypes_strings,
+                postgresql_connection=self.postgresql_connection,
+                data_frame=df_shares_outstanding,
+            )
+            latest_date = self.postgresql_connection.watermarks.get_watermark(SECTOR_SHARES_OUTSTANDING)
+        else:
+            self.postgresql_connection.schema.add_columns(  # Queued DDL runs in bulk_load's transaction.
+                SECTOR_SHARES_OUTSTANDING,
+                {sector_symbol: f"{data_type} NULL" for sector_symbol, data_type in self.sector_shares_outstanding_dtypes_strings.items()},
+            )
         todays_date = get_todays_date()
-        latest_date = get_sql_table_latest_date(SECTOR_SHARES_OUTSTANDING, self.postgresql_connection.engine)
         shares_outstanding = {"date": [todays_date]}
         shares_outstanding_dtypes = {
             "date": sqlalchemy.DATE,
         }
-        for sector in self.sectors:
+        for sector in self.all_sectors:
             shares_outstanding.update({sector.sector_symbol: [sector.shares_outstanding]})
             shares_outstanding_dtypes.update(
                 {
@@ -106,13 +128,10 @@ class Sectors:
         if latest_date is None:
             set_table_primary_key(SECTOR_SHARES_OUTSTANDING, "date", self.postgresql_connection)
         elif todays_date > latest_date:
-            pd.DataFrame(shares_outstanding).set_index("date").to_sql(
+            self.postgresql_connection.bulk_load(
+                pd.DataFrame(shares_outstanding).set_index("date"),
                 SECTOR_SHARES_OUTSTANDING,
-                con=self.postgresql_connection.engine,
-                if_exists="append",
-                index=True,
-                index_label="date",
-                dtype=shares_outstanding_dtypes,
+                data_types=shares_outstanding_dtypes,
             )
         self.s3_connection.upload_sql_table(
             SECTOR_SHARES_OUTSTANDING,
@@ -131,77 +150,90 @@ class Sectors:
                 f"magnitude {magnitude} from shares_outstanding is not compatible with func convert_shares_outstanding. Consider editing func."
             )
 
-    def plot_graphs(self, plot_directory: str | Path) -> None:
-        figure = Figure()
-        range_break = False
-        range_break_dates: List[pd.DatetimeIndex] = []
-        x_min: str = ""
-        x_max: str = ""
+    def read_sector_history_tables(self) -> None:
+        """Read the sector history tables not read yet, e.g. all but those create_sector_history_table rebuilt in this run."""
         for sector in self.sectors:
-            dates = list(sector.sector_history_df.index)
-            sector_prices = sector.sector_history_df[sector.sector_calculated_price_column_name]
+            if sector.sector_history_df.empty:
+                sector._read_sector_history_table()
+
+    def plot_all_graphs(self, plot_directory: str | Path, percent_difference_days: List[int], renderer: ChartRenderer | None = None) -> None:
+        """Build the sector price chart and a percent difference chart per number of days, then render the changed ones concurrently."""
+        renderer = renderer or ChartRenderer()
+        price_frame = self.get_sector_price_frame()
+        relative_performance = calculate_relative_performance(price_frame, percent_difference_days)
+        renderer.add(self.create_price_figure(price_frame), Path(plot_directory, "calculated_sector_prices.jpeg"))
+        for days in percent_difference_days:
+            renderer.add(
+                self.create_percent_difference_figure(days, relative_performance), Path(plot_directory, f"percent_sector_prices_{days}_days.jpeg")
+            )
+        renderer.render()
+
+    def plot_graphs(self, plot_directory: str | Path, renderer: ChartRenderer | None = None) -> None:
+        renderer = renderer or ChartRenderer()
+        renderer.add(self.create_price_figure(), Path(plot_directory, "calculated_sector_prices.jpeg"))
+        renderer.render()
+
+    def get_sector_price_frame(self) -> pd.DataFrame:
+        """Get the calculated prices of all sectors as one date by sector symbol DataFrame."""
+        return create_sector_price_frame(
+            {sector.sector_symbol: sector.sector_history_df[sector.sector_calculated_price_column_name] for sector in self.sectors}
+        )
+
+    def create_price_figure(self, price_frame: pd.DataFrame | None = None) -> Figure:
+        if price_frame is None:
+            price_frame = self.get_sector_price_frame()
+        figure = Figure()
+        for sector_symbol in price_frame.columns:
+            sector_prices = price_frame[sector_symbol]
+            sector_prices = sector_prices.loc[sector_prices.first_valid_index() :]  # Not the dates before the sector's history starts.
             figure.add_trace(
                 Scatter(
-                    x=dates,
+                    x=list(sector_prices.index),
                     y=sector_prices,
-                    marker={"color": sector_color_map[sector.sector_symbol]},
+                    marker={"color": sector_color_map.get(sector_symbol)},  # Default plotly colors for other sectors.
                     mode="lines",
-                    name=sector.sector_symbol.upper(),
+                    name=sector_symbol.upper(),
                 )
             )
-            if not range_break:
-                date_range = self._add_date_range(dates)
-                x_min, x_max = self._get_date_limits(date_range)
-                range_break_dates = self._add_range_break_dates(dates, date_range)
-
-                x_min = date_range[0] - pd.DateOffset(days=1)
-                x_max = date_range[-1] + pd.DateOffset(days=1)
-                range_break_dates = [date for date in date_range if date not in dates]
+        return self._update_date_layout(figure, price_frame.index, title="SPDR Sector Prices", y_axis_title="Sector Price ($)")
 
-                range_break = True
-        figure = self.update_layout(
-            figure, date_range_breaks=range_break_dates, x_min=x_min, x_max=x_max, title="SPDR Sector Prices", y_axis_title="Sector Price ($)"
-        )
-        figure.write_image(Path(plot_directory, "calculated_sector_prices.jpeg"), format="jpeg", scale=5, engine="kaleido")
+    def plot_percent_difference_graphs(self, plot_directory: str | Path, days: int, renderer: ChartRenderer | None = None) -> None:
+        renderer = renderer or ChartRenderer()
+        renderer.add(self.create_percent_difference_figure(days), Path(plot_directory, f"percent_sector_prices_{days}_days.jpeg"))
+        renderer.render()
 
-    def plot_percent_difference_graphs(self, plot_directory: str | Path, days: int) -> None:
+    def create_percent_difference_figure(self, days: int, relative_performance: pd.DataFrame | None = None) -> Figure:
+        """Plot the percent change of each sector over the last days, from a calculate_relative_performance DataFrame."""
+        if relative_performance is None:
+            relative_performance = calculate_relative_performance(self.get_sector_price_frame(), [days])
+        window_performance = relative_performance[relative_performance["window"] == days]
         figure = Figure()
-        range_break = False
-        range_break_dates: List[pd.DatetimeIndex] = []
-        x_min: str = ""
-        x_max: str = ""
-        for sector in self.sectors:
-            if len(sector.sector_history_df) < days:
-                continue
-            dates = list(sector.sector_history_df.index[-days:])
-            sector_prices = sector.sector_history_df[sector.sector_calculated_price_column_name][-days:]
-            start_sector_price = sector_prices[0]
-            if start_sector_price is None:
-                continue
-            percent_sector_prices = [(sector_price - start_sector_price) * 100 / start_sector_price for sector_price in sector_prices]
+        for sector_symbol, sector_performance in window_performance.groupby("sector", sort=False):
             figure.add_trace(
                 Scatter(
-                    x=dates,
-                    y=percent_sector_prices,
-                    marker={"color": sector_color_map[sector.sector_symbol]},
+                    x=list(sector_performance["date"]),
+                    y=sector_performance["percent_change"],
+                    marker={"color": sector_color_map.get(sector_symbol)},  # Default plotly colors for other sectors.
                     mode="lines",
-                    name=sector.sector_symbol.upper(),
+                    name=sector_symbol.upper(),
                 )
             )
-            if not range_break:
-                date_range = self._add_date_range(dates)
-                x_min, x_max = self._get_date_limits(date_range)
-                range_break_dates = self._add_range_break_dates(dates, date_range)
-                range_break = True
-        figure = self.update_layout(
+        return self._update_date_layout(
             figure,
-            date_range_breaks=range_break_dates,
-            x_min=x_min,
-            x_max=x_max,
+            pd.DatetimeIndex(window_performance["date"].unique()),
             title=f"SPDR Sectors {days}-Day Relative Price Movement",
             y_axis_title="Percent Change (%)",
         )
-        figure.write_image(Path(plot_directory, f"percent_sector_prices_{days}_days.jpeg"), format="jpeg", scale=5, engine="kaleido")
+
+    def _update_date_layout(self, figure: Figure, dates: pd.DatetimeIndex, title: str, y_axis_title: str) -> Figure:
+        range_break_dates: List[str] = []
+        x_min: pd.Timestamp | str = ""
+        x_max: pd.Timestamp | str = ""
+        if len(dates) > 0:
+            date_range = self._add_date_range(dates)
+            x_min, x_max = self._get_date_limits(date_range)
+            range_break_dates = self._add_range_break_dates(dates, date_range)
+        return self.update_layout(figure, date_range_breaks=range_break_dates, x_min=x_min, x_max=x_max, title=title, y_axis_title=y_axis_title)
 
     @staticmethod
     def _add_date_range(dates: pd.DatetimeIndex):
@@ -216,8 +248,14 @@ class Sectors:
         return x_min, x_max
 
     @staticmethod
-    def _add_range_break_dates(dates: pd.DatetimeIndex, date_range: pd.DatetimeIndex) -> pd.DatetimeIndex:
-        return [date for date in date_range if date not in dates]
+    def _add_range_break_dates(dates: pd.DatetimeIndex, date_range: pd.DatetimeIndex) -> List[str]:
+        """Hide days without an NYSE session, and sessions without a price, from the x-axis."""
+        trading_calendar = get_trading_calendar()
+        missing_sessions = trading_calendar.get_missing_sessions(dates)
+        if len(missing_sessions) > 0:
+            print(f"No sector prices on sessions {np.datetime_as_string(missing_sessions).tolist()}.")
+        non_sessions = trading_calendar.get_non_sessions_between(date_range[0], date_range[-1])
+        return np.datetime_as_string(np.union1d(non_sessions, missing_sessions)).tolist()
 
     def update_layout(
         self, figure: Figure, date_range_breaks: List[pd.DatetimeIndex], x_min: pd.Timestamp, x_max: pd.Timestamp, title: str, y_axis_title: str
@@ -0,0 +1,124 @@
+from typing import Dict, List, Set
+
+
+import pandas as pd  # type: ignore
+import sqlalchemy
+
+
+from .definitions import STOCK_HISTORY, SQLOperation
+from .postgresql_connection import PostgreSQLConnection
+
+
+stock_history_columns = ["open", "high", "low", "close", "volume"]
+stock_history_dtypes = {
+    "ticker": sqlalchemy.types.Text,
+    "date": sqlalchemy.DATE,
+    "open": sqlalchemy.types.Numeric(10, 2),
+    "high": sqlalchemy.types.Numeric(10, 2),
+    "low": sqlalchemy.types.Numeric(10, 2),
+    "close": sqlalchemy.types.Numeric(10, 2),
+    "volume": sqlalchemy.types.BigInteger,
+}
+
+
+class StockHistoryTable:
+    """Long-format stock_history(ticker, date, open, high, low, close, volume) table, range-partitioned by year."""
+
+    def __init__(self, postgresql_connection: PostgreSQLConnection, table_name: str = STOCK_HISTORY):
+        self.postgresql_connection = postgresql_connection
+        self.table_name = table_name
+        self.partition_years: Set[int] = set()
+
+    def create_table(self) -> None:
+        self.postgresql_connection.schema.create_table(
+            self.table_name,
+            {
+                "ticker": "TEXT NOT NULL",
+                "date": "DATE NOT NULL",
+                "open": "NUMERIC(10, 2)",
+                "high": "NUMERIC(10, 2)",
+                "low": "NUMERIC(10, 2)",
+                "close": "NUMERIC(10, 2)",
+                "volume": "BIGINT",
+            },
+            primary_key=["ticker", "date"],
+            partition_by="RANGE (date)",
+        )
+        self.postgresql_connection.schema.apply()
+        self.partition_years = self._get_partition_years()
+
+    def _get_partition_years(self) -> Set[int]:
+        query = (
+            "SELECT child.relname FROM pg_inherits JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+            "JOIN pg_class child ON pg_inherits.inhrelid = child.oid WHERE parent.relname = %s"
+        )
+        cursor = self.postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE, values=(self.table_name,))
+        return {int(partition_name.rsplit("_", 1)[-1]) for (partition_name,) in cursor.fetchall()}
+
+    def create_partitions(self, years: List[int] | Set[int], apply: bool = True) -> None:
+        """Create one partition per calendar year, skipping partitions that already exist, in one transaction.
+
+        If not apply, the partitions are only queued in the schema manager, e.g. to be created by the next bulk_load.
+        """
+        for year in sorted(set(years) - self.partition_years):
+            self.postgresql_connection.schema.create_partition(
+                f"{self.table_name}_{year}", self.table_name, f"FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+            )
+            self.partition_years.add(year)
+        if apply:
+            self.postgresql_connection.schema.apply()
+
+    def append(self, stock_histories: Dict[str, pd.DataFrame], skip_existing_rows: bool = False) -> None:
+        """Append stock history of several tickers, keyed by SQL compatible ticker symbol, in one write.
+
+        If skip_existing_rows, rows of a ticker and date already in the table are skipped, e.g. when a backfill overlaps them.
+        """
+        stock_histories = {ticker: stock_history for ticker, stock_history in stock_histories.items() if not stock_history.empty}
+        if not stock_histories:
+            return
+        stock_history = pd.concat(
+            [stock_history[stock_history_columns] for stock_history in stock_histories.values()],
+            keys=list(stock_histories.keys()),
+            names=["ticker", "date"],
+        ).reset_index()
+        self.create_partitions(set(pd.DatetimeIndex(stock_history["date"]).year), apply=False)  # Created in bulk_load's transaction.
+        self.postgresql_connection.bulk_load(
+            stock_history,
+            self.table_name,
+            data_types=stock_history_dtypes,
+            index=False,
+            ticker_column="ticker",
+            skip_existing_rows=skip_existing_rows,
+        )
+
+    def get_per_ticker_table_names(self) -> List[str]:
+        query = (
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' "
+            "AND table_name LIKE %s AND table_type = 'BASE TABLE' ORDER BY table_name"
+        )
+        cursor = self.postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE, values=(f"%\\_{self.table_name}",))
+        return [table_name for (table_name,) in cursor.fetchall()]
+
+    def migrate_per_ticker_tables(self, drop_per_ticker_tables: bool = False) -> None:
+        """Copy every {ticker}_stock_history table into the partitioned table. Rows already migrated are skipped."""
+        self.create_table()
+        self.postgresql_connection.create_watermarks_table()
+        for per_ticker_table_name in self.get_per_ticker_table_names():
+            ticker_symbol = per_ticker_table_name[: -len(f"_{self.table_name}")]
+            query = f"SELECT DISTINCT EXTRACT(YEAR FROM date)::INT FROM {per_ticker_table_name}"
+            cursor = self.postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE)
+            self.create_partitions({year for (year,) in cursor.fetchall()})
+            with self.postgresql_connection.transaction() as cursor:  # Commit each ticker's copy (and drop) as one transaction.
+                query = (
+                    f"INSERT INTO {self.table_name} (ticker, date, open, high, low, close, volume) "
+                    f"SELECT %s, date, open, high, low, close, volume FROM {per_ticker_table_name} ON CONFLICT (ticker, date) DO NOTHING"
+                )
+                cursor.execute(query, (ticker_symbol,))
+                cursor.execute(f"SELECT MAX(date) FROM {per_ticker_table_name}")
+                latest_date = cursor.fetchone()[0]
+                if latest_date is not None:
+                    self.postgresql_connection.watermarks.update(cursor, self.table_name, {ticker_symbol: latest_date})
+                if drop_per_ticker_tables:
+                    self.postgresql_connection.schema.drop_table(per_ticker_table_name)
+                    self.postgresql_connection.schema.apply(cursor, table_names=[per_ticker_table_name])
+            print(f"Migrated {per_ticker_table_name} into {self.table_name}.")
@@ -4,28 +4,50 @@ import datetime
 import pandas as pd  # type: ignore
 
 
-from .definitions import SQLOperation
+from .definitions import STOCK_HISTORY, StockHistoryLayout
 from .functions import make_ticker_sql_compatible, make_ticker_yfinance_compatible
 from .postgresql_connection import PostgreSQLConnection
 
 
 class Ticker:
-    def __init__(self, ticker: str, postgresql_connection: PostgreSQLConnection):
+    def __init__(
+        self,
+        ticker: str,
+        postgresql_connection: PostgreSQLConnection,
+        stock_history_layout: StockHistoryLayout = StockHistoryLayout.PER_TICKER,
+    ):
         self.ticker_symbol = make_ticker_sql_compatible(ticker)
         self.yfinance_ticker = make_ticker_yfinance_compatible(ticker)
-        self.table_name = f"{self.ticker_symbol}_stock_history"
+        self.stock_history_layout = stock_history_layout
+        if self.stock_history_layout == StockHistoryLayout.PARTITIONED:
+            self.table_name = STOCK_HISTORY  # Table is created once by StockHistoryTable.
+        else:
+            self.table_name = f"{self.ticker_symbol}_stock_history"
+        self.watermark_key = (self.table_name, self.ticker_symbol if self.stock_history_layout == StockHistoryLayout.PARTITIONED else "")
         self.price_column_name = f"{self.ticker_symbol}_price"
         self.shares_column_name = f"{self.ticker_symbol}_shares"
         self.postgresql_connection = postgresql_connection
         self.stock_history = pd.DataFrame()
         self.price: float | None = None
 
-        query = f"CREATE TABLE IF NOT EXISTS {self.table_name} (date DATE PRIMARY KEY,open NUMERIC(10, 2),high NUMERIC(10, 2),low NUMERIC(10, 2),close NUMERIC(10, 2),volume BIGINT)"
-        self.postgresql_connection.execute_query(query, operation=SQLOperation.COMMIT)
+        if self.stock_history_layout == StockHistoryLayout.PER_TICKER:  # Queued, created by the next schema apply or bulk_load.
+            self.postgresql_connection.schema.create_table(
+                self.table_name,
+                {
+                    "date": "DATE",
+                    "open": "NUMERIC(10, 2)",
+                    "high": "NUMERIC(10, 2)",
+                    "low": "NUMERIC(10, 2)",
+                    "close": "NUMERIC(10, 2)",
+                    "volume": "BIGINT",
+                },
+                primary_key=["date"],
+            )
 
     def get_stock_history_latest_date(self) -> datetime.datetime | None:
-        """Get most recent date from stock history. If no stock history, return None."""
+        """Get most recent date from stock history watermark. If no stock history, return None.
 
-        query = f"SELECT MAX(DATE) FROM {self.table_name}"
-        cursor = self.postgresql_connection.execute_query(query, operation=SQLOperation.EXECUTE)
-        return cursor.fetchone()[0]
+        To get the latest dates of many tickers, look up watermark_key in PipelineWatermarks.get_watermarks instead.
+        """
+
+        return self.postgresql_connection.watermarks.get_watermark(*self.watermark_key)
@@ -0,0 +1,121 @@
+import datetime
+from functools import lru_cache
+from pathlib import Path
+
+
+import numpy as np
+
+
+from .definitions import (
+    TRADING_CALENDAR_DIRECTORY,
+    TRADING_CALENDAR_END_YEARS_AHEAD,
+    TRADING_CALENDAR_NAME,
+    TRADING_CALENDAR_START_DATE,
+)
+
+
+ONE_DAY = np.timedelta64(1, "D")
+
+
+def to_datetime64(dates) -> np.ndarray:
+    """Convert a date, datetime, Timestamp, string or an array of them to datetime64[D]."""
+    if isinstance(dates, datetime.datetime):  # np.datetime64 rejects timezone-aware datetimes.
+        dates = dates.replace(tzinfo=None)
+    return np.asarray(dates, dtype="datetime64[D]")
+
+
+class TradingCalendar:
+    """Sessions of an exchange calendar as a sorted datetime64[D] array, saved to cache_directory.
+
+    pandas_market_calendars is only used when there is no saved array covering start_date to end_date. Lookups use
+    np.searchsorted, so they take O(log n) and accept single dates or arrays of dates.
+    """
+
+    def __init__(
+        self,
+        calendar_name: str = TRADING_CALENDAR_NAME,
+        start_date: str | datetime.date = TRADING_CALENDAR_START_DATE,
+        end_date: str | datetime.date | None = None,
+        cache_directory: Path = TRADING_CALENDAR_DIRECTORY,
+    ):
+        self.calendar_name = calendar_name
+        self.start_date = to_datetime64(start_date)
+        if end_date is None:
+            end_date = datetime.date(datetime.date.today().year + TRADING_CALENDAR_END_YEARS_AHEAD, 12, 31)
+        self.end_date = to_datetime64(end_date)
+        self.cache_file_path = Path(cache_directory, f"{calendar_name.lower()}_{self.start_date}_{self.end_date}.npy")
+        self.sessions = self._load_sessions(cache_directory)
+
+    def _load_sessions(self, cache_directory: Path) -> np.ndarray:
+        if self.cache_file_path.exists():
+            return np.load(self.cache_file_path)
+        import pandas_market_calendars as mcal  # Slow to import, and only needed when the sessions are not cached.
+
+        print(f"Load {self.calendar_name} sessions from {self.start_date} to {self.end_date}.")
+        valid_days = mcal.get_calendar(self.calendar_name).valid_days(start_date=str(self.start_date), end_date=str(self.end_date))
+        sessions = np.unique(valid_days.tz_localize(None).values.astype("datetime64[D]"))
+        cache_directory.mkdir(parents=True, exist_ok=True)
+        np.save(self.cache_file_path, sessions)
+        return sessions
+
+    def _check_range(self, dates: np.ndarray) -> None:
+        if np.any(dates < self.start_date) or np.any(dates > self.end_date):
+            raise NameError(f"dates must be between {self.start_date} and {self.end_date} of the {self.calendar_name} calendar.")
+
+    def is_trading_day(self, dates):
+        dates = to_datetime64(dates)
+        self._check_range(dates)
+        positions = np.searchsorted(self.sessions, dates)
+        is_session = self.sessions[np.minimum(positions, len(self.sessions) - 1)] == dates
+        return bool(is_session) if is_session.ndim == 0 else is_session
+
+    def previous_session(self, dates, inclusive: bool = False):
+        """Latest session before dates, or on or before dates if inclusive."""
+        if not inclusive:
+            return self.n_sessions_back(dates, 1)
+        dates = to_datetime64(dates)
+        self._check_range(dates)
+        return self._get_sessions(np.searchsorted(self.sessions, dates, side="right") - 1)
+
+    def next_session(self, dates, inclusive: bool = False):
+        """Earliest session after dates, or on or after dates if inclusive."""
+        dates = to_datetime64(dates)
+        self._check_range(dates)
+        positions = np.searchsorted(self.sessions, dates, side="left" if inclusive else "right")
+        if np.any(positions >= len(self.sessions)):
+            raise NameError(f"There is no {self.calendar_name} session after {dates.max()} in the calendar.")
+        return self.sessions[positions]
+
+    def n_sessions_back(self, dates, n: int):
+        """Session n >= 1 sessions before dates. If dates is not a session, the latest session before it is 1 session back."""
+        dates = to_datetime64(dates)
+        self._check_range(dates)
+        return self._get_sessions(np.searchsorted(self.sessions, dates) - n)
+
+    def _get_sessions(self, positions: np.ndarray):
+        if np.any(positions < 0):
+            raise NameError(f"There are not enough {self.calendar_name} sessions after {self.start_date} in the calendar.")
+        return self.sessions[positions]
+
+    def sessions_between(self, start_date, end_date) -> np.ndarray:
+        """Sessions from start_date to end_date, both included."""
+        start_date, end_date = to_datetime64(start_date), to_datetime64(end_date)
+        self._check_range(np.array([start_date, end_date]))
+        return self.sessions[np.searchsorted(self.sessions, start_date) : np.searchsorted(self.sessions, end_date, side="right")]
+
+    def get_missing_sessions(self, dates) -> np.ndarray:
+        """Sessions between the first and last of dates that are not in dates."""
+        dates = np.unique(to_datetime64(dates))
+        return np.setdiff1d(self.sessions_between(dates[0], dates[-1]), dates, assume_unique=True)
+
+    def get_non_sessions_between(self, start_date, end_date) -> np.ndarray:
+        """Days from start_date to end_date without a session, for chart range breaks."""
+        start_date, end_date = to_datetime64(start_date), to_datetime64(end_date)
+        days = np.arange(start_date, end_date + ONE_DAY, dtype="datetime64[D]")
+        return np.setdiff1d(days, self.sessions_between(start_date, end_date), assume_unique=True)
+
+
+@lru_cache(maxsize=None)
+def get_trading_calendar(calendar_name: str = TRADING_CALENDAR_NAME) -> TradingCalendar:
+    """Shared TradingCalendar of calendar_name with the default window."""
+    return TradingCalendar(calendar_name)
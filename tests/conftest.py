@@ -0,0 +1,76 @@
+import os
+from typing import Dict, List
+import uuid
+
+
+import psycopg2  # type: ignore
+import pytest
+
+
+from stock_data_pipeline.functions import get_database_parameters, get_engine_parameters
+from stock_data_pipeline.postgresql_connection import PostgreSQLConnection
+
+
+@pytest.fixture
+def postgresql_connection():
+    """PostgreSQLConnection to a scratch database, dropped afterwards. Skips unless POSTGRESQL_DB and POSTGRESQL_PASSWORD are set."""
+    if "POSTGRESQL_DB" not in os.environ or "POSTGRESQL_PASSWORD" not in os.environ:
+        pytest.skip("POSTGRESQL_DB and POSTGRESQL_PASSWORD are not set.")
+    database_parameters = get_database_parameters()
+    database_name = f"stock_data_pipeline_test_{uuid.uuid4().hex[:8]}"
+    try:
+        admin_connection = psycopg2.connect(**{**database_parameters, "dbname": "postgres"})
+    except psycopg2.OperationalError as error:
+        pytest.skip(f"PostgreSQL is not available: {error}")
+    admin_connection.autocommit = True
+    with admin_connection.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE {database_name}")
+    database_parameters["dbname"] = database_name
+    connection = PostgreSQLConnection(database_parameters, get_engine_parameters(database_parameters))
+    try:
+        yield connection
+    finally:
+        connection.close()
+        with admin_connection.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE {database_name}")
+        admin_connection.close()
+
+
+class StubHttpResponse:
+    def __init__(self, status_code: int, content: bytes, headers: Dict[str, str]):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class StubHttpSession:
+    """Stand-in for the requests.Session of HttpClient. Serves responses, keyed by URL, with an ETag of the body.
+
+    A request with a matching If-None-Match is answered with 304 Not Modified. requests records the (url, headers) of every GET.
+    """
+
+    def __init__(self):
+        self.responses: Dict[str, bytes] = {}
+        self.requests: List[tuple[str, Dict[str, str]]] = []
+
+    def get(self, url: str, headers: Dict[str, str] | None = None, timeout: float | None = None) -> StubHttpResponse:
+        headers = headers or {}
+        self.requests.append((url, headers))
+        if url not in self.responses:
+            return StubHttpResponse(404, b"", {})
+        etag = f'"{hash(self.responses[url])}"'
+        if headers.get("If-None-Match") == etag:
+            return StubHttpResponse(304, b"", {"ETag": etag})
+        return StubHttpResponse(200, self.responses[url], {"ETag": etag})
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def http_session():
+    return StubHttpSession()
@@ -0,0 +1,62 @@
+import datetime
+
+
+import pandas as pd  # type: ignore
+import pytest
+from yfinance.exceptions import YFPricesMissingError
+
+
+from stock_data_pipeline.backfill import StockHistoryBackfill
+from stock_data_pipeline.definitions import SQLOperation
+from stock_data_pipeline.load_yfinance_data import YFinance
+from stock_data_pipeline.ticker import Ticker
+
+
+@pytest.mark.parametrize(
+    "error, recorded",
+    [
+        (YFPricesMissingError("AAA", "", yahoo_reason="Data doesn't exist for startDate = 1704067200, endDate = 1706745600"), True),
+        (YFPricesMissingError("AAA", " (1d 2024-01-01 -> 2024-02-01)"), False),
+        (ConnectionError("Connection reset by peer"), False),
+    ],
+)
+def test_only_chunks_without_data_are_recorded_empty(postgresql_connection, monkeypatch, error, recorded):
+    def get_stock_data_single(self, ticker, resolution, date_range, raise_errors=False):
+        assert raise_errors
+        raise error
+
+    monkeypatch.setattr(YFinance, "get_stock_data_single", get_stock_data_single)
+    backfill = StockHistoryBackfill(postgresql_connection, max_workers=1)
+
+    statistics = backfill.run([Ticker("aaa", postgresql_connection)], datetime.date(2024, 1, 1), datetime.date(2024, 2, 1))
+
+    assert statistics["failed"] == (0 if recorded else 1)
+    expected_chunks = {("aaa_stock_history", "aaa", datetime.date(2024, 1, 1), datetime.date(2024, 2, 1))} if recorded else set()
+    assert backfill.get_completed_chunks() == expected_chunks
+
+
+def test_backfill_adds_primary_key_to_per_ticker_table_without_one(postgresql_connection, monkeypatch):
+    history = pd.DataFrame(
+        {"Open": [1.0, 2.0], "High": [1.0, 2.0], "Low": [1.0, 2.0], "Close": [1.0, 2.0], "Volume": [10, 20], "Dividends": 0.0, "Stock Splits": 0.0},
+        index=pd.DatetimeIndex(["2024-01-02", "2024-01-03"], name="Date").tz_localize("America/New_York"),
+    )
+    monkeypatch.setattr(YFinance, "get_stock_data_single", lambda self, ticker, resolution, date_range, raise_errors=False: history)
+    postgresql_connection.execute_query(
+        "CREATE TABLE aaa_stock_history (date DATE, open NUMERIC(10, 2), high NUMERIC(10, 2), low NUMERIC(10, 2), close NUMERIC(10, 2), volume BIGINT)",
+        SQLOperation.COMMIT,
+    )
+    postgresql_connection.execute_query("INSERT INTO aaa_stock_history VALUES ('2024-01-02', 1, 1, 1, 1, 10)", SQLOperation.COMMIT)
+
+    StockHistoryBackfill(postgresql_connection, max_workers=1).run(
+        [Ticker("aaa", postgresql_connection)], datetime.date(2024, 1, 1), datetime.date(2024, 2, 1)
+    )
+
+    dates = postgresql_connection.read_query("SELECT date FROM aaa_stock_history ORDER BY date")["date"]
+    assert [str(date) for date in dates] == ["2024-01-02", "2024-01-03"]
+
+
+def test_skip_existing_rows_needs_primary_key(postgresql_connection):
+    postgresql_connection.execute_query("CREATE TABLE prices (date DATE, price NUMERIC(10, 2))", SQLOperation.COMMIT)
+
+    with pytest.raises(NameError):
+        postgresql_connection.bulk_load(pd.DataFrame({"price": [1.0]}, index=pd.Index(["2024-01-02"], name="date")), "prices", skip_existing_rows=True)
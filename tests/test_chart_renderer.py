@@ -0,0 +1,76 @@
+from pathlib import Path
+from typing import List
+
+
+from plotly.graph_objects import Figure, Scatter
+import pytest
+
+
+from stock_data_pipeline import chart_renderer
+from stock_data_pipeline.chart_renderer import ChartRenderer
+
+
+class FakeKaleido:
+    """Stand-in for kaleido.Kaleido. write_fig writes the figure JSON instead of starting Chrome, and records the path."""
+
+    written: List[str] = []
+
+    def __init__(self, n: int = 1):
+        self.n = n
+
+    async def __aenter__(self) -> "FakeKaleido":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+    async def write_fig(self, figure: Figure, path: Path, opts: dict, cancel_on_error: bool = False) -> None:
+        FakeKaleido.written.append(Path(path).name)
+        Path(path).write_text(figure.to_json())
+
+
+@pytest.fixture(autouse=True)
+def fake_kaleido(monkeypatch):
+    FakeKaleido.written = []
+    monkeypatch.setattr(chart_renderer.kaleido, "Kaleido", FakeKaleido)
+
+
+def create_figure(prices: List[float]) -> Figure:
+    return Figure(Scatter(x=["2025-07-01", "2025-07-02", "2025-07-03"], y=prices))
+
+
+def render(tmp_path: Path, figures: dict, scale: float = 5) -> ChartRenderer:
+    renderer = ChartRenderer(cache_directory=Path(tmp_path, "charts"), scale=scale)
+    for file_name, figure in figures.items():
+        renderer.add(figure, Path(tmp_path, file_name))
+    renderer.render()
+    return renderer
+
+
+def test_unchanged_charts_are_skipped_and_changed_ones_rendered(tmp_path):
+    figures = {"xlk.jpeg": create_figure([1, 2, 3]), "xlf.jpeg": create_figure([4, 5, 6])}
+    assert render(tmp_path, figures).get_statistics()["rendered"] == 2
+
+    FakeKaleido.written = []
+    renderer = render(tmp_path, figures)
+    assert FakeKaleido.written == []
+    assert renderer.get_statistics()["skipped"] == 2
+
+    figures["xlf.jpeg"] = create_figure([4, 5, 7])
+    renderer = render(tmp_path, figures)
+    assert FakeKaleido.written == ["xlf.jpeg"]
+    assert renderer.skipped == [str(Path(tmp_path, "xlk.jpeg"))]
+
+
+def test_missing_files_and_new_options_are_rendered_again(tmp_path):
+    figures = {"xlk.jpeg": create_figure([1, 2, 3]), "xlf.jpeg": create_figure([4, 5, 6])}
+    render(tmp_path, figures)
+
+    FakeKaleido.written = []
+    Path(tmp_path, "xlk.jpeg").unlink()
+    render(tmp_path, figures)
+    assert FakeKaleido.written == ["xlk.jpeg"]
+
+    FakeKaleido.written = []
+    render(tmp_path, figures, scale=2)
+    assert sorted(FakeKaleido.written) == ["xlf.jpeg", "xlk.jpeg"]
@@ -0,0 +1,69 @@
+import datetime
+from pathlib import Path
+
+
+import pandas as pd  # type: ignore
+import pytest
+
+
+from benchmarks.stand_ins import SyntheticMarket
+from stock_data_pipeline import holdings_parser
+from stock_data_pipeline.holdings_parser import HoldingsParser, read_holdings_workbook
+
+
+@pytest.fixture(scope="module")
+def market() -> SyntheticMarket:
+    return SyntheticMarket(sector_count=2, tickers_per_sector=3, years=1, todays_date=datetime.datetime(2025, 7, 3))
+
+
+def write_workbooks(market: SyntheticMarket, directory: Path) -> dict:
+    file_paths = {}
+    for sector_symbol in market.get_sector_symbols():
+        file_paths[sector_symbol] = Path(directory, f"holdings-daily-us-en-{sector_symbol}.xlsx")
+        file_paths[sector_symbol].write_bytes(market.create_holdings_workbook(sector_symbol))
+    return file_paths
+
+
+def test_read_holdings_workbook(market, tmp_path):
+    file_path = write_workbooks(market, tmp_path)["xa"]
+
+    holdings = read_holdings_workbook(file_path)
+
+    assert list(holdings.columns) == ["ticker", "weight", "shares_held"]
+    assert list(holdings["ticker"]) == market.sectors["xa"]  # The cash row is removed.
+    assert holdings["weight"].sum() == pytest.approx(1, abs=1e-6)
+    assert list(holdings["shares_held"]) == list(market.shares_held[market.sectors["xa"]])
+
+
+def test_unchanged_workbooks_are_read_from_snapshots(market, tmp_path, monkeypatch):
+    file_paths = write_workbooks(market, tmp_path)
+    parser = HoldingsParser(cache_directory=Path(tmp_path, "snapshots"), max_workers=1)
+    holdings = parser.parse(file_paths)
+
+    def read_holdings_workbook(file_path: Path) -> pd.DataFrame:
+        raise AssertionError(f"{file_path} was parsed again.")
+
+    monkeypatch.setattr(holdings_parser, "read_holdings_workbook", read_holdings_workbook)
+    snapshot_holdings = HoldingsParser(cache_directory=Path(tmp_path, "snapshots"), max_workers=1)
+    cached_holdings = snapshot_holdings.parse(file_paths)
+
+    assert parser.get_statistics() == {"hits": 0, "misses": 2}
+    assert snapshot_holdings.get_statistics() == {"hits": 2, "misses": 0}
+    for sector_symbol in file_paths:
+        pd.testing.assert_frame_equal(cached_holdings[sector_symbol], holdings[sector_symbol])
+
+
+def test_changed_workbooks_and_snapshot_versions_are_parsed_again(market, tmp_path, monkeypatch):
+    file_paths = write_workbooks(market, tmp_path)
+    parser = HoldingsParser(cache_directory=Path(tmp_path, "snapshots"), max_workers=1)
+    parser.parse(file_paths)
+
+    changed_market = SyntheticMarket(sector_count=2, tickers_per_sector=3, years=1, todays_date=datetime.datetime(2025, 7, 7))
+    file_paths["xa"].write_bytes(changed_market.create_holdings_workbook("xa"))  # Same holdings, but new prices and date.
+    parser.parse(file_paths)
+    assert parser.get_statistics() == {"hits": 1, "misses": 3}
+
+    monkeypatch.setattr(holdings_parser, "HOLDINGS_SNAPSHOT_VERSION", holdings_parser.HOLDINGS_SNAPSHOT_VERSION + 1)
+    parser.parse(file_paths)
+    assert parser.get_statistics() == {"hits": 1, "misses": 5}
+    assert len(list(Path(tmp_path, "snapshots").iterdir())) == 5
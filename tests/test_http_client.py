@@ -0,0 +1,57 @@
+from pathlib import Path
+
+
+from stock_data_pipeline.http_client import HttpClient
+
+
+URL = "https://www.ssga.com/holdings-daily-us-en-xlk.xlsx"
+
+
+def create_http_client(cache_directory: Path, http_session) -> HttpClient:
+    http_client = HttpClient(cache_directory=cache_directory)
+    http_client.session = http_session
+    return http_client
+
+
+def test_not_modified_returns_the_stored_body(http_session, tmp_path):
+    http_session.responses[URL] = b"workbook"
+    http_client = create_http_client(tmp_path, http_session)
+
+    first_response = http_client.get(URL)
+    second_response = http_client.get(URL)
+
+    assert (first_response.status_code, first_response.content, first_response.downloaded_bytes) == (200, b"workbook", 8)
+    assert (second_response.status_code, second_response.content, second_response.downloaded_bytes) == (304, b"workbook", 0)
+    assert http_session.requests[0][1] == {}
+    assert http_session.requests[1][1]["If-None-Match"] is not None
+    assert http_client.get_statistics() == {"requests": 2, "not_modified": 1, "unchanged": 0}
+
+
+def test_acknowledged_body_is_unchanged_until_a_new_one_is_served(http_session, tmp_path):
+    http_session.responses[URL] = b"workbook"
+    http_client = create_http_client(tmp_path, http_session)
+    assert http_client.get(URL).changed
+
+    assert http_client.get(URL).changed  # Fetched, but not acknowledged as loaded.
+    http_client.acknowledge(URL)
+    assert not http_client.get(URL).changed
+    assert not create_http_client(tmp_path, http_session).get(URL).changed  # The acknowledgement is kept in index.json.
+
+    http_session.responses[URL] = b"new workbook"
+    response = http_client.get(URL)
+    assert response.changed
+    assert response.content == b"new workbook"
+    assert len(list(Path(tmp_path, "objects").iterdir())) == 1  # Only the last body is stored, the acknowledged one by its hash.
+
+
+def test_same_body_after_a_new_etag_is_unchanged(http_session, tmp_path):
+    http_session.responses[URL] = b"workbook"
+    http_client = create_http_client(tmp_path, http_session)
+    http_client.get(URL)
+    http_client.acknowledge(URL)
+    http_client.index[URL]["etag"] = '"expired"'  # E.g. the server's ETag changed, but the body did not.
+
+    response = http_client.get(URL)
+
+    assert response.status_code == 200
+    assert not response.changed
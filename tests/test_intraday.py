@@ -0,0 +1,74 @@
+import datetime
+from typing import List
+
+
+import pandas as pd  # type: ignore
+
+
+from stock_data_pipeline import intraday
+from stock_data_pipeline.definitions import SECTOR_SHARES_OUTSTANDING, SQLOperation
+from stock_data_pipeline.intraday import IntradaySectorPrices
+from stock_data_pipeline.sector_holdings import SectorHoldingsTable
+
+
+BAR_TIMES = ["2025-07-07 15:55"] + [f"2025-07-08 15:{minute}" for minute in range(40, 60, 5)]
+BARS = pd.DataFrame(
+    {"aaa": [100.0, 101.0, 102.0, 103.0, 104.0], "bbb": [10.0, 11.0, 12.0, 13.0, 14.0]},
+    index=pd.DatetimeIndex(BAR_TIMES).tz_localize("America/New_York"),
+)
+
+
+class FakeYFinance:
+    """Stand-in for YFinance. Serves the 5 minute BARS from the start of date_range, and records every date_range."""
+
+    date_ranges: List[list] = []
+
+    def get_stock_fine_resolution(self, tickers: List[str], resolution: str, date_range: list) -> pd.DataFrame:
+        FakeYFinance.date_ranges.append(date_range)
+        start = pd.Timestamp(date_range[0]).tz_localize("America/New_York")
+        end = pd.Timestamp(date_range[1]).tz_localize("America/New_York")
+        bars = BARS[(BARS.index >= start) & (BARS.index < end)][tickers]
+        return pd.concat({ticker: bars[[ticker]].set_axis(["Close"], axis=1) for ticker in tickers}, axis=1)
+
+
+class FakeClock:
+    """Exchange time of the intraday loop. sleep advances it instead of waiting."""
+
+    def __init__(self, now: datetime.datetime):
+        self.now = now
+
+    def get_exchange_time(self) -> datetime.datetime:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += datetime.timedelta(seconds=seconds)
+
+
+def test_run_polls_until_the_session_ends(postgresql_connection, monkeypatch):
+    sector_holdings_table = SectorHoldingsTable(postgresql_connection)
+    sector_holdings_table.create_table()
+    holdings = pd.DataFrame({"ticker": ["aaa", "bbb"], "weight": [0.9, 0.1], "shares_held": [2, 30]})
+    sector_holdings_table.append("xlk", datetime.datetime(2025, 7, 7), holdings)
+    postgresql_connection.execute_query(f"CREATE TABLE {SECTOR_SHARES_OUTSTANDING} (date DATE PRIMARY KEY, xlk BIGINT)", SQLOperation.COMMIT)
+    postgresql_connection.execute_query(f"INSERT INTO {SECTOR_SHARES_OUTSTANDING} VALUES ('2025-07-07', 10)", SQLOperation.COMMIT)
+    clock = FakeClock(datetime.datetime(2025, 7, 8, 15, 47))
+    FakeYFinance.date_ranges = []
+    monkeypatch.setattr(intraday, "YFinance", FakeYFinance)
+    monkeypatch.setattr(intraday.time, "sleep", clock.sleep)
+    monkeypatch.setattr(IntradaySectorPrices, "get_exchange_time", staticmethod(clock.get_exchange_time))
+
+    IntradaySectorPrices(postgresql_connection, ["xlk"], interval="5m").run(poll_seconds=300)
+
+    # Polls at 15:47, 15:52, 15:57 and 16:02, then 16:07 is after the session's last bar, which ends at 16:00.
+    assert [date_range[0] for date_range in FakeYFinance.date_ranges] == [
+        datetime.datetime(2025, 7, 7),  # The previous session, for the previous close of constituents without a bar.
+        datetime.datetime(2025, 7, 8, 15, 40),  # Then from the last bar applied.
+        datetime.datetime(2025, 7, 8, 15, 45),
+        datetime.datetime(2025, 7, 8, 15, 50),
+        datetime.datetime(2025, 7, 8, 15, 55),
+    ]
+    sector_prices = postgresql_connection.read_query(
+        "SELECT timestamp, price::FLOAT AS price FROM intraday_sector_prices WHERE sector = 'xlk' ORDER BY timestamp", index_col="timestamp"
+    )["price"]
+    assert list(sector_prices) == [(2 * aaa + 30 * bbb) / 10 for aaa, bbb in BARS.to_numpy()]
+    assert postgresql_connection.watermarks.get_watermark("intraday_sector_prices", "xlk") == datetime.datetime(2025, 7, 8, 15, 55)
@@ -0,0 +1,72 @@
+from typing import Any, Dict, List
+
+
+from stock_data_pipeline.pipeline_runner import PipelineRunner
+
+
+def add_stages(runner: PipelineRunner, calls: List[str], fail: str | None = None) -> None:
+    """a <- b <- c and a <- d, where each stage returns the results it received plus its name."""
+
+    def create_stage(name: str):
+        def stage(results: Dict[str, Any]) -> List[str]:
+            calls.append(name)
+            if name == fail:
+                raise RuntimeError(f"{name} failed.")
+            return sorted(result for dependency_results in results.values() for result in dependency_results) + [name]
+
+        return stage
+
+    runner.add_stage("a", create_stage("a"))
+    runner.add_stage("b", create_stage("b"), dependencies=["a"])
+    runner.add_stage("c", create_stage("c"), dependencies=["b"])
+    runner.add_stage("d", create_stage("d"), dependencies=["a"])
+
+
+def test_rerun_resumes_from_failed_stage(tmp_path):
+    calls: List[str] = []
+    runner = PipelineRunner("2025-07-03_1", runs_directory=tmp_path, max_workers=1)
+    add_stages(runner, calls, fail="c")
+    try:
+        runner.run()
+    except RuntimeError:
+        pass
+    assert "c" in calls and "c" not in runner.checkpoint
+
+    calls.clear()
+    runner = PipelineRunner("2025-07-03_1", runs_directory=tmp_path)
+    add_stages(runner, calls)
+    results = runner.run()
+
+    assert calls == ["c"]
+    assert results["c"] == ["a", "b", "c"]
+
+
+def test_run_stage_names_runs_their_dependencies_only(tmp_path):
+    calls: List[str] = []
+    runner = PipelineRunner("2025-07-03_1", runs_directory=tmp_path)
+    add_stages(runner, calls)
+
+    runner.run(["d"])
+    assert sorted(calls) == ["a", "d"]
+
+    calls.clear()
+    runner = PipelineRunner("2025-07-03_1", runs_directory=tmp_path)
+    add_stages(runner, calls)
+    runner.run(["c"])
+    assert calls == ["b", "c"]  # a is resumed from the checkpoint of the previous subcommand.
+
+
+def test_only_runs_of_earlier_dates_are_removed(tmp_path):
+    for run_id in ["2025-07-02_1", "2025-07-03_1_xlk", "2025-07-03_1"]:
+        PipelineRunner(run_id, runs_directory=tmp_path)
+
+    assert sorted(directory.name for directory in tmp_path.iterdir()) == ["2025-07-03_1", "2025-07-03_1_xlk"]
+
+    calls: List[str] = []
+    runner = PipelineRunner("2025-07-03_1_xlk", runs_directory=tmp_path)
+    add_stages(runner, calls)
+    runner.run(["a"])
+    PipelineRunner("2025-07-03_1_xlk", runs_directory=tmp_path, restart=True)
+
+    assert PipelineRunner("2025-07-03_1_xlk", runs_directory=tmp_path).checkpoint == {}
+    assert sorted(directory.name for directory in tmp_path.iterdir()) == ["2025-07-03_1", "2025-07-03_1_xlk"]
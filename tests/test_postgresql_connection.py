@@ -0,0 +1,43 @@
+import threading
+
+
+import psycopg2  # type: ignore
+import pytest
+
+
+from stock_data_pipeline.definitions import SQLOperation
+
+
+def test_execute_query_ends_read_transaction(postgresql_connection):
+    cursor = postgresql_connection.execute_query("SELECT generate_series(1, 3)", operation=SQLOperation.EXECUTE)
+
+    assert cursor.fetchall() == [(1,), (2,), (3,)]
+    assert postgresql_connection.connection.status == psycopg2.extensions.STATUS_READY
+
+
+def test_execute_query_stays_in_transaction_block(postgresql_connection):
+    postgresql_connection.execute_query("CREATE TABLE prices (price INT)", SQLOperation.COMMIT)
+    with pytest.raises(ValueError), postgresql_connection.transaction() as cursor:
+        cursor.execute("INSERT INTO prices VALUES (1)")
+        postgresql_connection.execute_query("SELECT COUNT(*) FROM prices", operation=SQLOperation.EXECUTE)
+        assert postgresql_connection.connection.status == psycopg2.extensions.STATUS_IN_TRANSACTION
+        raise ValueError  # Rolls back the insert, which the read did not commit.
+
+    assert postgresql_connection.execute_query("SELECT COUNT(*) FROM prices", operation=SQLOperation.EXECUTE).fetchone() == (0,)
+
+
+def test_thread_connection_returns_connection_to_pool(postgresql_connection):
+    checked_out = []
+
+    def run_stage():
+        with postgresql_connection.thread_connection():
+            postgresql_connection.execute_query("SELECT 1", operation=SQLOperation.EXECUTE)
+            checked_out.append(postgresql_connection.engine.pool.checkedout())
+
+    thread = threading.Thread(target=run_stage)
+    thread.start()
+    thread.join()
+
+    postgresql_connection.release()
+    assert checked_out == [1]
+    assert postgresql_connection.engine.pool.checkedout() == 0
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd  # type: ignore
+
+
+from stock_data_pipeline.relative_performance import calculate_relative_performance, create_sector_price_frame
+
+
+def test_relative_performance_matches_per_sector_percent_changes():
+    """Percent changes of every window and sector are those of the per-sector loop the charts were built with before."""
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2025-01-02", periods=60)
+    sector_histories = {sector_symbol: pd.Series(rng.uniform(50, 150, len(dates)), index=dates) for sector_symbol in ["xlb", "xlk", "xlf"]}
+    sector_histories["xle"] = sector_histories["xlb"].iloc[-10:] * 2  # Shorter than the 20 and 50 day windows.
+    windows = [5, 20, 50]
+
+    relative_performance = calculate_relative_performance(create_sector_price_frame(sector_histories), windows)
+
+    for window in windows:
+        for sector_symbol, sector_prices in sector_histories.items():
+            rows = relative_performance[(relative_performance["window"] == window) & (relative_performance["sector"] == sector_symbol)]
+            if len(sector_prices) < window:
+                assert rows.empty
+                continue
+            window_prices = sector_prices.iloc[-window:]
+            start_price = window_prices.iloc[0]
+            percent_changes = [(price - start_price) * 100 / start_price for price in window_prices]
+            assert list(rows["date"]) == list(window_prices.index)
+            assert np.allclose(rows["price"], window_prices)
+            assert np.allclose(rows["percent_change"], percent_changes, rtol=1e-12)
@@ -0,0 +1,96 @@
+from pathlib import Path
+
+
+import pytest
+
+
+from benchmarks.stand_ins import FakeS3Client
+from stock_data_pipeline import s3_cache
+from stock_data_pipeline.s3_cache import S3ObjectCache
+from stock_data_pipeline.s3_connection import S3Connection
+
+
+class CountingS3Client(FakeS3Client):
+    """FakeS3Client that counts downloads, so a cache hit can be told from a download."""
+
+    def __init__(self):
+        super().__init__()
+        self.downloads = 0
+
+    def download_file(self, Bucket, Key, Filename) -> None:
+        self.downloads += 1
+        super().download_file(Bucket, Key, Filename)
+
+
+class FakeTime:
+    """Stand-in for the time module of s3_cache, one second later on every call, so access times are ordered."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self) -> float:
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch):
+    monkeypatch.setattr(s3_cache, "time", FakeTime())
+
+
+def write_file(file_path: Path, content: bytes) -> Path:
+    file_path.write_bytes(content)
+    return file_path
+
+
+def test_least_recently_used_objects_are_evicted(tmp_path):
+    cache = S3ObjectCache(Path(tmp_path, "cache"), max_size_bytes=10)
+    cache.put("a.csv", '"a"', "", write_file(Path(tmp_path, "a.csv"), b"aaaa"))
+    cache.put("b.csv", '"b"', "", write_file(Path(tmp_path, "b.csv"), b"bbbb"))
+    cache.put("copy_of_a.csv", '"a"', "", Path(tmp_path, "a.csv"))  # Same content, stored once.
+    assert cache.get_statistics()["size_bytes"] == 8
+    assert cache.get("a.csv", '"a"') is not None  # b.csv is now the least recently used.
+
+    cache.put("c.csv", '"c"', "", write_file(Path(tmp_path, "c.csv"), b"cccc"))
+
+    assert cache.get("b.csv", '"b"') is None
+    assert cache.get("a.csv", '"a"').read_bytes() == b"aaaa"
+    assert cache.get("c.csv", '"c"').read_bytes() == b"cccc"
+    assert sorted(cache.index) == ["a.csv", "c.csv", "copy_of_a.csv"]
+    assert len(list(Path(tmp_path, "cache", "objects").iterdir())) == cache.get_statistics()["objects"] == 2
+
+
+def test_hits_and_misses_are_counted_and_the_index_is_reloaded(tmp_path):
+    cache = S3ObjectCache(Path(tmp_path, "cache"))
+    cache.put("a.csv", '"a"', "", write_file(Path(tmp_path, "a.csv"), b"aaaa"))
+
+    assert cache.get("a.csv", '"changed"') is None
+    assert cache.get("missing.csv", '"a"') is None
+    assert cache.get("a.csv", '"a"') is not None
+
+    assert cache.get_statistics() == {"hits": 1, "misses": 2, "objects": 1, "size_bytes": 4}
+    reloaded_cache = S3ObjectCache(Path(tmp_path, "cache"))
+    assert reloaded_cache.get("a.csv", '"a"').read_bytes() == b"aaaa"
+
+
+def test_download_file_reads_unchanged_objects_from_cache(tmp_path):
+    s3_connection = S3Connection(
+        tmp_path, tmp_path, "key", "secret", "bucket", "us-east-1", "user", cache=S3ObjectCache(Path(tmp_path, "cache"))
+    )
+    s3_client = CountingS3Client()
+    s3_connection.s3_connection = s3_client
+    s3_client.put_object(Bucket="bucket", Key="xlk_sector_history.csv", Body=b"date,aaa_price\n")
+    download_file_path = Path(tmp_path, "xlk_sector_history.csv")
+
+    s3_connection.download_file("xlk_sector_history.csv", download_file_path)
+    download_file_path.unlink()
+    s3_connection.download_file("xlk_sector_history.csv", download_file_path)  # Only a HEAD request, the ETag is unchanged.
+
+    assert s3_client.downloads == 1
+    assert download_file_path.read_bytes() == b"date,aaa_price\n"
+    s3_client.put_object(Bucket="bucket", Key="xlk_sector_history.csv", Body=b"date,aaa_price\n2025-07-03,101.00\n")
+    s3_connection.download_file("xlk_sector_history.csv", download_file_path)
+    assert s3_client.downloads == 2
+    assert download_file_path.read_bytes() == b"date,aaa_price\n2025-07-03,101.00\n"
+    assert s3_connection.cache.get_statistics()["hits"] == 1
+    assert s3_connection.cache.get_statistics()["misses"] == 2
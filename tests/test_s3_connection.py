@@ -0,0 +1,90 @@
+from pathlib import Path
+from typing import List
+
+
+import pandas as pd  # type: ignore
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+import pytest
+import sqlalchemy
+
+
+from benchmarks.stand_ins import FakeS3Client
+from stock_data_pipeline.definitions import FileFormat
+from stock_data_pipeline.s3_connection import S3Connection
+
+
+@pytest.fixture
+def s3_connection(tmp_path, monkeypatch) -> S3Connection:
+    s3_connection = S3Connection(tmp_path, tmp_path, "key", "secret", "bucket", "us-east-1", "user", file_format=FileFormat.PARQUET)
+    monkeypatch.setattr(s3_connection, "upload_file", lambda file_path, s3_file_name: None)
+    return s3_connection
+
+
+def test_parquet_column_types_follow_column_names(s3_connection, tmp_path):
+    df = pd.DataFrame(
+        {"aaa_price": [101.0, 102.0], "xlk_calculated_price": [250.0, None], "aaa_shares": [1200.0, 1300.0], "xlk": [10**9, 10**9 + 1]},
+        index=pd.Index(["2025-07-02", "2025-07-03"], name="date"),
+    )
+
+    s3_connection.upload_data_frame_parquet(df, "xlk_sector_history.parquet")
+
+    schema = pq.read_schema(Path(tmp_path, "xlk_sector_history.parquet"))
+    assert schema.field("date").type == pa.date32()
+    assert schema.field("aaa_price").type == pa.decimal128(10, 2)  # Only whole prices, still NUMERIC(10, 2).
+    assert schema.field("xlk_calculated_price").type == pa.decimal128(10, 2)
+    assert schema.field("aaa_shares").type == pa.int64()
+    assert schema.field("xlk").type == pa.int64()
+
+
+def test_fractional_share_counts_raise(s3_connection):
+    df = pd.DataFrame({"aaa_shares": [1200.5]}, index=pd.Index(["2025-07-03"], name="date"))
+
+    with pytest.raises(NameError):
+        s3_connection.upload_data_frame_parquet(df, "xlk_shares.parquet")
+
+
+def create_sector_history(dates) -> pd.DataFrame:
+    return pd.DataFrame({"aaa_price": [100.0 + position for position in range(len(dates))]}, index=pd.Index(dates, name="date"))
+
+
+@pytest.fixture
+def csv_s3_connection(tmp_path, postgresql_connection):
+    """S3Connection of CSV exports to an in-memory bucket, with xlk_sector_history exported until 2025-07-02, then 2025-07-03 inserted."""
+    s3_connection = S3Connection(tmp_path, tmp_path, "key", "secret", "bucket", "us-east-1", "user", write_local_copy=True)
+    s3_connection.s3_connection = FakeS3Client()
+    sector_history_dtypes = {"date": sqlalchemy.DATE, "aaa_price": sqlalchemy.types.Numeric(10, 2)}
+    postgresql_connection.bulk_load(create_sector_history(["2025-07-01", "2025-07-02"]), "xlk_sector_history", sector_history_dtypes)
+    s3_connection.upload_sql_table("xlk_sector_history", postgresql_connection)
+    postgresql_connection.bulk_load(create_sector_history(["2025-07-03"]), "xlk_sector_history", sector_history_dtypes)
+    return s3_connection
+
+
+def get_exported_dates(s3_connection: S3Connection) -> List[str]:
+    body = s3_connection.s3_connection.objects["xlk_sector_history.csv"].decode()
+    return [line.split(",")[0] for line in body.splitlines()[1:]]
+
+
+def test_append_sql_table_rows_appends_to_current_export(csv_s3_connection, postgresql_connection, monkeypatch):
+    monkeypatch.setattr(csv_s3_connection, "upload_sql_table", lambda *args: pytest.fail("Exported the whole table."))
+
+    csv_s3_connection.append_sql_table_rows("xlk_sector_history", postgresql_connection, "2025-07-03")
+
+    assert get_exported_dates(csv_s3_connection) == ["2025-07-01", "2025-07-02", "2025-07-03"]
+
+
+def test_append_sql_table_rows_exports_whole_table_if_local_export_is_stale(csv_s3_connection, postgresql_connection, tmp_path):
+    csv_file_path = Path(tmp_path, "xlk_sector_history.csv")
+    csv_file_path.write_text("".join(csv_file_path.read_text().splitlines(keepends=True)[:2]))  # Header and 2025-07-01 only.
+
+    csv_s3_connection.append_sql_table_rows("xlk_sector_history", postgresql_connection, "2025-07-03")
+
+    assert get_exported_dates(csv_s3_connection) == ["2025-07-01", "2025-07-02", "2025-07-03"]
+
+
+def test_append_sql_table_rows_exports_whole_table_if_s3_object_differs(csv_s3_connection, postgresql_connection):
+    csv_s3_connection.s3_connection.put_object("bucket", "xlk_sector_history.csv", b"date,aaa_price\n2025-07-01,100.00\n")
+
+    csv_s3_connection.append_sql_table_rows("xlk_sector_history", postgresql_connection, "2025-07-03")
+
+    assert get_exported_dates(csv_s3_connection) == ["2025-07-01", "2025-07-02", "2025-07-03"]
@@ -0,0 +1,66 @@
+from pathlib import Path
+import zlib
+
+
+import pytest
+
+
+from benchmarks.stand_ins import FakeS3Client
+from stock_data_pipeline.s3_stream import S3MultipartWriter, get_compressor
+
+
+def test_writes_are_uploaded_in_parts_of_part_size():
+    s3_client = FakeS3Client()
+
+    with S3MultipartWriter(s3_client, "bucket", "xlk_sector_history.csv", part_size=10) as writer:
+        writer.write(b"12345")
+        assert writer.upload_id is None  # Below part_size, nothing is uploaded yet.
+        writer.write("67890")
+        assert len(writer.parts) == 1
+        writer.write(b"abcdefghijk")
+        writer.write(b"xyz")
+
+    assert [part["PartNumber"] for part in writer.parts] == [1, 2, 3]
+    assert writer.bytes_written == writer.bytes_uploaded == 24
+    assert s3_client.objects["xlk_sector_history.csv"] == b"1234567890abcdefghijkxyz"
+    assert writer.etag.endswith('-3"')
+
+
+def test_objects_smaller_than_one_part_are_put_once():
+    s3_client = FakeS3Client()
+
+    with S3MultipartWriter(s3_client, "bucket", "xlk_shares.csv", part_size=10) as writer:
+        writer.write(b"12345")
+
+    assert writer.upload_id is None
+    assert s3_client.objects["xlk_shares.csv"] == b"12345"
+    assert s3_client.multipart_uploads == {}
+
+
+def test_exception_aborts_the_upload():
+    s3_client = FakeS3Client()
+
+    with pytest.raises(RuntimeError), S3MultipartWriter(s3_client, "bucket", "xlk_sector_history.csv", part_size=10) as writer:
+        writer.write(b"1234567890")
+        raise RuntimeError("Export failed.")
+
+    assert writer.upload_id is not None
+    assert s3_client.multipart_uploads == {}
+    assert "xlk_sector_history.csv" not in s3_client.objects
+
+
+def test_side_output_is_the_uncompressed_data(tmp_path):
+    s3_client = FakeS3Client()
+    side_output_path = Path(tmp_path, "xlk_sector_history.csv")
+    data = b"date,aaa_price\n" + b"".join(f"2025-07-{day:02},{100 + day}.00\n".encode() for day in range(1, 31))
+
+    with S3MultipartWriter(s3_client, "bucket", "xlk_sector_history.csv.gz", compression="gzip", part_size=64, side_output_path=side_output_path) as writer:
+        for line in data.splitlines(keepends=True):
+            writer.write(line)
+
+    assert side_output_path.read_bytes() == data
+    assert zlib.decompress(s3_client.objects["xlk_sector_history.csv.gz"], wbits=31) == data
+    assert writer.bytes_written == len(data)
+    assert writer.bytes_uploaded == len(s3_client.objects["xlk_sector_history.csv.gz"])
+    with pytest.raises(NameError):
+        get_compressor("zstd")
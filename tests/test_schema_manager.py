@@ -0,0 +1,40 @@
+import pandas as pd  # type: ignore
+import psycopg2  # type: ignore
+import pytest
+import sqlalchemy
+
+
+from stock_data_pipeline.definitions import PIPELINE_WATERMARKS
+
+
+prices_dtypes = {"date": sqlalchemy.types.Date, "price": sqlalchemy.types.Numeric(10, 2)}
+
+
+def create_prices(dates, prices) -> pd.DataFrame:
+    return pd.DataFrame({"price": prices}, index=pd.Index(dates, name="date"))
+
+
+def test_bulk_load_only_applies_ddl_of_its_table(postgresql_connection):
+    schema = postgresql_connection.schema
+    schema.create_table("other_stock_history", {"date": "DATE"}, primary_key=["date"])
+
+    postgresql_connection.bulk_load(create_prices(["2024-01-02"], [1.0]), "prices", data_types=prices_dtypes)
+
+    schema.invalidate()
+    assert schema.has_table("prices")
+    assert not schema.has_table("other_stock_history")
+    assert [table_name for table_name, _ in schema.pending_statements] == ["other_stock_history"]
+
+
+def test_ddl_of_rolled_back_bulk_load_is_queued_again(postgresql_connection):
+    schema = postgresql_connection.schema
+    schema.create_table("prices", {"date": "DATE", "price": "NUMERIC(10, 2)"}, primary_key=["date"])
+
+    with pytest.raises(psycopg2.Error):  # Duplicate primary key fails the COPY after CREATE TABLE ran.
+        postgresql_connection.bulk_load(create_prices(["2024-01-02", "2024-01-02"], [1.0, 2.0]), "prices", data_types=prices_dtypes)
+    assert [table_name for table_name, _ in schema.pending_statements] == ["prices", PIPELINE_WATERMARKS]
+
+    postgresql_connection.bulk_load(create_prices(["2024-01-02", "2024-01-03"], [1.0, 2.0]), "prices", data_types=prices_dtypes)
+
+    assert schema.pending_statements == []
+    assert len(postgresql_connection.read_query("SELECT * FROM prices")) == 2
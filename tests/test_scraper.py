@@ -0,0 +1,105 @@
+import pytest
+
+
+from stock_data_pipeline import scraper
+from stock_data_pipeline.http_client import HttpClient
+from stock_data_pipeline.scraper import HostRateLimiter, SectorScraper, TokenBucket
+from stock_data_pipeline.sector import Sector
+
+
+SHARES_OUTSTANDING_PAGE = b'<table><tr><td>Shares Outstanding</td><td class="data">1,234.56 M</td></tr></table>'
+
+
+class FakeClock:
+    """Stand-in for the time module of scraper. sleep advances monotonic instead of waiting, and is recorded in sleeps."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scraper, "time", clock)
+    return clock
+
+
+def test_token_bucket_blocks_until_refilled(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [0.5]
+
+    clock.now += 0.25  # Half a token.
+    bucket.acquire()
+    assert clock.sleeps == [0.5, 0.25]
+
+
+def test_token_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+
+    clock.now += 60
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [1.0]
+    with pytest.raises(NameError):
+        TokenBucket(rate=0, capacity=1)
+
+
+def test_host_rate_limiter_limits_each_host(clock):
+    rate_limiter = HostRateLimiter(rate=1, capacity=1)
+
+    rate_limiter.acquire("https://www.ssga.com/a")
+    rate_limiter.acquire("https://example.com/a")
+    assert clock.sleeps == []
+    rate_limiter.acquire("https://www.ssga.com/b")
+    assert clock.sleeps == [1.0]
+    assert sorted(rate_limiter.buckets) == ["example.com", "www.ssga.com"]
+
+
+def test_acknowledged_sector_is_unchanged_and_its_workbook_is_written(clock, http_session, tmp_path):
+    sector = Sector("xlk", None, None, tmp_path)
+    sector.portfolio_holdings_file_path = tmp_path / "holdings-daily-us-en-xlk.xlsx"
+    http_session.responses = {sector.url_shares_outstanding: SHARES_OUTSTANDING_PAGE, sector.url_xlsx: b"workbook"}
+    http_client = HttpClient(cache_directory=tmp_path / "http")
+    http_client.session = http_session
+    sector_scraper = SectorScraper(max_workers=1, http_client=http_client)
+
+    assert sector_scraper.scrape([sector]) == {"xlk": "1,234.56 M"}
+    assert sector_scraper.unchanged_sectors == []
+    sector.portfolio_holdings_file_path.unlink()
+    assert sector_scraper.scrape([sector]) == {"xlk": "1,234.56 M"}
+    assert sector_scraper.unchanged_sectors == []  # Fetched, but not acknowledged as loaded.
+    assert sector.portfolio_holdings_file_path.read_bytes() == b"workbook"  # Written from the stored body of the 304.
+
+    sector_scraper.acknowledge(sector)
+    sector.portfolio_holdings_file_path.unlink()
+    sector_scraper.scrape([sector])
+    assert sector_scraper.unchanged_sectors == ["xlk"]
+    assert sector.portfolio_holdings_file_path.read_bytes() == b"workbook"
+
+    http_session.responses[sector.url_xlsx] = b"new workbook"
+    sector_scraper.scrape([sector])
+    assert sector_scraper.unchanged_sectors == []
+    assert sector.portfolio_holdings_file_path.read_bytes() == b"new workbook"
+    assert [headers.get("If-None-Match") is not None for url, headers in http_session.requests if url == sector.url_xlsx] == [
+        False,
+        True,
+        True,
+        True,
+    ]
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+
+from stock_data_pipeline.definitions import SECTOR_SHARES_OUTSTANDING, SQLOperation, StockHistoryLayout
+from stock_data_pipeline.sector import Sector
+from stock_data_pipeline.sector_index import SectorIndexEngine
+from stock_data_pipeline.ticker import Ticker
+
+
+def create_sector(postgresql_connection, tmp_path: Path) -> Sector:
+    """xlk sector of aaa and bbb. 2025-01-03 is a half-cent tie, 2025-01-06 has no bbb price."""
+    for query in [
+        f"CREATE TABLE {SECTOR_SHARES_OUTSTANDING} (date DATE PRIMARY KEY, xlk BIGINT)",
+        "CREATE TABLE xlk_shares (date DATE PRIMARY KEY, aaa_shares BIGINT, bbb_shares BIGINT)",
+        "CREATE TABLE xlk_sector_history (date DATE PRIMARY KEY, aaa_price NUMERIC(10, 2), bbb_price NUMERIC(10, 2), xlk_calculated_price NUMERIC(10, 2))",
+        f"INSERT INTO {SECTOR_SHARES_OUTSTANDING} VALUES ('2025-01-02', 3), ('2025-01-03', 8), ('2025-01-06', 3)",
+        "INSERT INTO xlk_shares VALUES ('2025-01-02', 2, 5), ('2025-01-03', 1, 0), ('2025-01-06', 2, 5)",
+        "INSERT INTO xlk_sector_history VALUES ('2025-01-02', 101.37, 12.01, NULL), ('2025-01-03', 1.00, 3.00, NULL), ('2025-01-06', 99.99, NULL, NULL)",
+    ]:
+        postgresql_connection.execute_query(query, SQLOperation.COMMIT)
+    sector = Sector("xlk", postgresql_connection, None, tmp_path)
+    for ticker in ["aaa", "bbb"]:
+        sector.add_ticker(Ticker(ticker, postgresql_connection, stock_history_layout=StockHistoryLayout.PARTITIONED))
+    return sector
+
+
+def test_calculate_sector_price_vectorized(postgresql_connection, tmp_path):
+    sector = create_sector(postgresql_connection, tmp_path)
+    expected_unrounded_sector_prices = [(101.37 * 2 + 12.01 * 5) / 3, (1.00 * 1 + 3.00 * 0) / 8, np.nan]
+
+    sector_prices = sector.calculate_sector_price_vectorized()
+
+    dates, price_matrix, shares_matrix, shares_outstanding_vector, _ = sector._get_sector_price_matrices()
+    unrounded_sector_prices = pd.Series((price_matrix * shares_matrix).sum(axis=1) / shares_outstanding_vector, index=dates)
+    assert list(unrounded_sector_prices.index) == list(pd.to_datetime(["2025-01-02", "2025-01-03", "2025-01-06"]))
+    assert np.allclose(unrounded_sector_prices, expected_unrounded_sector_prices, rtol=1e-12, atol=0, equal_nan=True)
+    assert sector_prices["2025-01-02"] == 87.6
+    assert np.isnan(sector_prices["2025-01-06"])
+    written_sector_prices = postgresql_connection.read_query(
+        "SELECT date, xlk_calculated_price::FLOAT AS price FROM xlk_sector_history ORDER BY date", index_col="date", parse_dates=["date"]
+    )["price"]
+    assert np.array_equal(written_sector_prices.to_numpy(), sector_prices.to_numpy(), equal_nan=True)
+
+
+def test_calculate_sector_price_vectorized_for_date(postgresql_connection, tmp_path):
+    sector = create_sector(postgresql_connection, tmp_path)
+
+    sector_prices = sector.calculate_sector_price_vectorized(date="2025-01-02")
+
+    assert list(sector_prices.index) == [pd.Timestamp("2025-01-02")]
+    written_sector_prices = postgresql_connection.read_query(
+        "SELECT date, xlk_calculated_price::FLOAT AS price FROM xlk_sector_history ORDER BY date", index_col="date", parse_dates=["date"]
+    )["price"]
+    assert written_sector_prices.iloc[0] == 87.6
+    assert written_sector_prices.iloc[1:].isna().all()
+
+
+def test_sector_index_engine_matches_calculate_sector_price_vectorized(postgresql_connection, tmp_path):
+    sector = create_sector(postgresql_connection, tmp_path)
+    dates, price_matrix, shares_matrix, shares_outstanding_vector, _ = sector._get_sector_price_matrices()
+
+    sector_prices = sector.calculate_sector_price_vectorized()
+
+    for date, prices, shares, shares_outstanding in zip(dates, price_matrix, shares_matrix, shares_outstanding_vector):
+        holdings = pd.DataFrame({"sector": "xlk", "ticker": ["aaa", "bbb"], "shares": shares})
+        engine = SectorIndexEngine(["aaa", "bbb"], ["xlk"], holdings, pd.Series({"xlk": shares_outstanding}))
+        engine.append_prices(pd.DataFrame([prices], index=[date], columns=["aaa", "bbb"]))
+        assert np.array_equal(engine.get_sector_prices()["xlk"].to_numpy(), [sector_prices[date]], equal_nan=True)
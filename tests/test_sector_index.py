@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd  # type: ignore
+import pytest
+
+
+from stock_data_pipeline.sector_index import SectorIndexEngine
+
+
+TICKERS = [f"t{position}" for position in range(40)]
+SECTOR_SYMBOLS = ["xlb", "xlk", "xlf", "xle"]
+
+
+@pytest.fixture
+def market():
+    """Holdings with every ticker in one sector and some in a second one, shares outstanding, and 30 bars of prices."""
+    rng = np.random.default_rng(0)
+    holdings = pd.DataFrame(
+        [(SECTOR_SYMBOLS[position % 4], ticker, float(rng.integers(1, 1000))) for position, ticker in enumerate(TICKERS)]
+        + [(SECTOR_SYMBOLS[(position + 1) % 4], TICKERS[position], 50.0) for position in range(0, len(TICKERS), 7)],
+        columns=["sector", "ticker", "shares"],
+    )
+    shares_outstanding = pd.Series(rng.integers(10**4, 10**5, len(SECTOR_SYMBOLS)).astype(float), index=SECTOR_SYMBOLS)
+    prices = pd.DataFrame(
+        rng.uniform(10, 500, (30, len(TICKERS))), index=pd.date_range("2025-07-03 09:30", periods=30, freq="5min"), columns=TICKERS
+    )
+    prices.iloc[0, 5] = np.nan  # No price yet, so t5's sector has no price on the first bar.
+    prices.iloc[10:20, 7] = np.nan  # No bars, so t7 keeps its previous close.
+    return holdings, shares_outstanding, prices
+
+
+def get_dense_sector_prices(holdings: pd.DataFrame, shares_outstanding: pd.Series, prices: pd.DataFrame) -> np.ndarray:
+    """Date x sector prices from a dense sector x ticker holdings matrix. A missing price of a constituent gives no sector price."""
+    holdings_matrix = (
+        holdings.pivot_table(index="sector", columns="ticker", values="shares", aggfunc="sum")
+        .reindex(index=SECTOR_SYMBOLS, columns=TICKERS)
+        .fillna(0)
+        .to_numpy()
+    )
+    price_matrix = prices.to_numpy()
+    missing = np.isnan(price_matrix)
+    values = np.where(missing, 0, price_matrix) @ holdings_matrix.T
+    values[(missing.astype(float) @ (holdings_matrix.T != 0)) > 0] = np.nan
+    return values / shares_outstanding.to_numpy()
+
+
+def get_unrounded_sector_prices(engine: SectorIndexEngine) -> np.ndarray:
+    return (engine.values[:, : engine.date_count] / engine.shares_outstanding[:, np.newaxis]).T
+
+
+def test_append_prices_carries_missing_prices_forward(market):
+    holdings, shares_outstanding, prices = market
+    engine = SectorIndexEngine(TICKERS, SECTOR_SYMBOLS, holdings, shares_outstanding)
+
+    engine.append_prices(prices.iloc[:12])
+    engine.append_prices(prices.iloc[12:])
+
+    expected_sector_prices = get_dense_sector_prices(holdings, shares_outstanding, prices.ffill())
+    assert np.isnan(expected_sector_prices[0]).any()
+    assert np.allclose(get_unrounded_sector_prices(engine), expected_sector_prices, rtol=1e-12, equal_nan=True)
+    sector_prices = engine.get_sector_prices(prices.index[5], prices.index[7])
+    assert list(sector_prices.index) == list(prices.index[5:8])
+    assert list(sector_prices.columns) == SECTOR_SYMBOLS
+
+
+def test_update_prices_matches_dense_reference(market):
+    holdings, shares_outstanding, prices = market
+    engine = SectorIndexEngine(TICKERS, SECTOR_SYMBOLS, holdings, shares_outstanding)
+    engine.append_prices(prices)
+    expected_prices = prices.ffill()
+    rng = np.random.default_rng(1)
+    for _ in range(100):
+        date = prices.index[rng.integers(len(prices))]
+        tickers = list(rng.choice(TICKERS, rng.integers(1, 5), replace=False))
+        new_prices = rng.uniform(10, 500, len(tickers))
+        new_prices[rng.random(len(tickers)) < 0.2] = np.nan  # A NaN price cannot be subtracted out of the sector value.
+        engine.update_prices(date, pd.Series(new_prices, index=tickers))
+        expected_prices.loc[date, tickers] = new_prices
+
+    expected_sector_prices = get_dense_sector_prices(holdings, shares_outstanding, expected_prices)
+    assert np.allclose(get_unrounded_sector_prices(engine), expected_sector_prices, rtol=1e-9, equal_nan=True)
+    sector_prices = engine.calculate()
+    assert np.allclose(get_unrounded_sector_prices(engine), expected_sector_prices, rtol=1e-12, equal_nan=True)
+    assert np.array_equal(sector_prices.to_numpy(), np.round(get_unrounded_sector_prices(engine), 2), equal_nan=True)
+
+
+def test_update_prices_ignores_unknown_tickers_and_unknown_dates_raise(market):
+    holdings, shares_outstanding, prices = market
+    engine = SectorIndexEngine(TICKERS, SECTOR_SYMBOLS, holdings, shares_outstanding)
+    engine.append_prices(prices)
+    values = engine.values[:, : engine.date_count].copy()
+
+    engine.update_prices(prices.index[3], pd.Series({"unknown": 1.0, "t1": prices.iloc[3, 1]}))
+
+    assert np.array_equal(engine.values[:, : engine.date_count], values, equal_nan=True)
+    with pytest.raises(NameError):
+        engine.update_prices(prices.index[3] + pd.Timedelta(minutes=1), pd.Series({"t1": 1.0}))
+    with pytest.raises(NameError):
+        engine.append_prices(prices.iloc[-1:])
+
+
+def test_contributions_add_up_to_sector_moves(market):
+    holdings, shares_outstanding, prices = market
+    engine = SectorIndexEngine(TICKERS, SECTOR_SYMBOLS, holdings, shares_outstanding)
+    engine.append_prices(prices)
+
+    contributions = engine.get_contributions(prices.index[20], prices.index[25])
+
+    sector_moves = (engine.values[:, 25] - engine.values[:, 20]) / engine.shares_outstanding
+    assert np.allclose(contributions.groupby("sector")["contribution"].sum().reindex(SECTOR_SYMBOLS).to_numpy(), sector_moves)
@@ -0,0 +1,69 @@
+import sys
+
+
+import numpy as np
+import pytest
+
+
+from stock_data_pipeline.trading_calendar import TradingCalendar
+
+
+@pytest.fixture(scope="module")
+def calendar(tmp_path_factory):
+    return TradingCalendar("NYSE", "2024-01-01", "2025-12-31", tmp_path_factory.mktemp("trading_calendar"))
+
+
+def dates(*date_strings: str) -> np.ndarray:
+    return np.array(date_strings, dtype="datetime64[D]")
+
+
+def test_is_trading_day(calendar):
+    assert calendar.is_trading_day("2025-07-03")
+    assert not calendar.is_trading_day("2025-07-04")  # Independence Day.
+    assert not calendar.is_trading_day("2025-07-05")  # Saturday.
+    assert not calendar.is_trading_day("2025-01-09")  # National Day of Mourning for President Carter.
+    holidays = ["2024-12-25", "2025-01-01", "2025-01-20", "2025-04-18", "2025-11-27"]
+    assert not calendar.is_trading_day(holidays).any()
+    assert list(calendar.is_trading_day(["2025-11-26", "2025-11-27", "2025-11-28"])) == [True, False, True]
+    with pytest.raises(NameError):
+        calendar.is_trading_day("2023-12-29")
+
+
+def test_previous_session(calendar):
+    assert calendar.previous_session("2025-07-07") == np.datetime64("2025-07-03")  # Monday after Independence Day.
+    assert calendar.previous_session("2025-07-05") == np.datetime64("2025-07-03")
+    assert calendar.previous_session("2025-07-03") == np.datetime64("2025-07-02")
+    assert calendar.previous_session("2025-07-03", inclusive=True) == np.datetime64("2025-07-03")
+    assert calendar.previous_session("2025-07-06", inclusive=True) == np.datetime64("2025-07-03")
+    assert np.array_equal(calendar.previous_session(["2025-01-02", "2025-01-21"]), dates("2024-12-31", "2025-01-17"))
+    with pytest.raises(NameError):
+        calendar.previous_session("2024-01-02")  # The first session of the calendar.
+
+
+def test_n_sessions_back(calendar):
+    assert calendar.n_sessions_back("2025-07-07", 1) == np.datetime64("2025-07-03")
+    assert calendar.n_sessions_back("2025-07-07", 3) == np.datetime64("2025-07-01")
+    assert calendar.n_sessions_back("2025-07-05", 1) == np.datetime64("2025-07-03")  # Not a session, so the latest one is 1 back.
+    assert calendar.n_sessions_back("2025-04-21", 2) == np.datetime64("2025-04-16")  # Over Good Friday and the weekend.
+
+
+def test_sessions_between(calendar):
+    assert np.array_equal(calendar.sessions_between("2025-07-02", "2025-07-08"), dates("2025-07-02", "2025-07-03", "2025-07-07", "2025-07-08"))
+    assert np.array_equal(calendar.sessions_between("2025-07-04", "2025-07-06"), dates())
+    assert len(calendar.sessions_between("2025-01-01", "2025-12-31")) == 250
+
+
+def test_get_missing_sessions(calendar):
+    missing_sessions = calendar.get_missing_sessions(["2025-07-08", "2025-07-01", "2025-07-03", "2025-07-03"])
+
+    assert np.array_equal(missing_sessions, dates("2025-07-02", "2025-07-07"))
+    assert np.array_equal(calendar.get_missing_sessions(["2025-07-03", "2025-07-07"]), dates())
+    assert np.array_equal(calendar.get_non_sessions_between("2025-07-03", "2025-07-07"), dates("2025-07-04", "2025-07-05", "2025-07-06"))
+
+
+def test_sessions_are_read_from_the_cache(calendar, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pandas_market_calendars", None)  # Importing it would fail.
+
+    cached_calendar = TradingCalendar("NYSE", "2024-01-01", "2025-12-31", calendar.cache_file_path.parent)
+
+    assert np.array_equal(cached_calendar.sessions, calendar.sessions)